@@ -7,11 +7,21 @@ from flask_jwt_extended import JWTManager
 
 from app.database import db
 from app.config import get_config
+from app.utils.tile_cache import tile_cache
+from app.services.image_service import image_pipeline
+from app.services.ai_cache import ai_cache
+from app.services.ai_client import ai_client
+from app.services.ai_gateway import ai_gateway
+from app.services.text_classifier import local_classifier
+from app.services.green_catalog import green_catalog
+from app.services.task_pool import task_pool
+from app.utils.file_upload import UploadRequest
 
 
 def create_app(config_name=None):
     """Application factory pattern"""
     app = Flask(__name__)
+    app.request_class = UploadRequest
     
     # Load configuration
     if config_name is None:
@@ -28,6 +38,14 @@ def create_app(config_name=None):
     
     # Initialize extensions
     db.init_app(app)
+    tile_cache.configure(max_entries=app.config['TILE_CACHE_SIZE'], ttl=app.config['TILE_CACHE_TTL'])
+    image_pipeline.init_app(app)
+    ai_cache.init_app(app)
+    ai_client.init_app(app)
+    ai_gateway.init_app(app)
+    local_classifier.init_app(app)
+    green_catalog.init_app(app)
+    task_pool.init_app(app)
     migrate = Migrate(app, db)
     jwt = JWTManager(app)
     
@@ -47,13 +65,10 @@ def create_app(config_name=None):
     
     # Register error handlers
     register_error_handlers(app)
-    
-    # Serve uploaded files
-    @app.route('/uploads/<path:filename>')
-    def serve_upload(filename):
-        from flask import send_from_directory
-        upload_folder = app.config.get('UPLOAD_FOLDER', os.path.join(os.path.dirname(__file__), '..', 'uploads'))
-        return send_from_directory(upload_folder, filename)
+
+    # Register CLI commands
+    from app.commands import register_commands
+    register_commands(app)
     
     # Health check endpoint
     @app.route('/api/health')
@@ -91,6 +106,7 @@ def register_blueprints(app):
     from app.routes.comments import comments_bp
     from app.routes.tags import tags_bp
     from app.routes.profile import profile_bp
+    from app.routes.uploads import uploads_bp
 
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(reports_bp, url_prefix='/api/reports')
@@ -99,6 +115,7 @@ def register_blueprints(app):
     app.register_blueprint(comments_bp, url_prefix='/api/comments')
     app.register_blueprint(tags_bp, url_prefix='/api/tags')
     app.register_blueprint(profile_bp)
+    app.register_blueprint(uploads_bp, url_prefix='/uploads')
 
 
 def register_error_handlers(app):
@@ -120,6 +137,10 @@ def register_error_handlers(app):
     def forbidden(error):
         return jsonify({'error': 'Forbidden'}), 403
     
+    @app.errorhandler(413)
+    def request_entity_too_large(error):
+        return jsonify({'error': 'File too large', 'message': error.description}), 413
+    
     @app.errorhandler(500)
     def internal_error(error):
         db.session.rollback()
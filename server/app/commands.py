@@ -0,0 +1,149 @@
+from datetime import timedelta
+
+import signal
+
+import click
+from flask import current_app
+
+from app.models.counters import reconcile_counters
+from app.models.grid import rebuild_grid
+from app.models.stored_file import prune_stored_files
+
+
+def register_commands(app):
+    """Register CLI commands"""
+
+    @app.cli.command('reconcile-counters')
+    def reconcile_counters_command():
+        """Recompute denormalized counter columns from source rows"""
+        rows = reconcile_counters()
+        click.echo(f'Reconciled counters on {rows} rows')
+
+    @app.cli.command('rebuild-grid')
+    def rebuild_grid_command():
+        """Rebuild the map grid rollups from the reports table"""
+        cells = rebuild_grid()
+        click.echo(f'Rebuilt {cells} grid cells')
+
+    @app.cli.command('prune-uploads')
+    @click.option('--grace-hours', default=24, show_default=True,
+                  help='Keep unreferenced uploads at least this long')
+    def prune_uploads_command(grace_hours):
+        """Delete stored uploads no report references any more"""
+        removed = prune_stored_files(current_app.config['UPLOAD_FOLDER'], timedelta(hours=grace_hours))
+        click.echo(f'Removed {removed} unreferenced uploads')
+
+    @app.cli.command('prune-ai-cache')
+    def prune_ai_cache_command():
+        """Delete expired and excess AI cache entries"""
+        from app.database import db
+        from app.models.ai_cache import AICacheEntry
+        with db.engine.begin() as connection:
+            removed = AICacheEntry.prune(connection, current_app.config['AI_CACHE_DB_MAX_ENTRIES'])
+        click.echo(f'Removed {removed} AI cache entries')
+
+    @app.cli.command('train-classifier')
+    @click.option('--min-confidence', default=0.75, show_default=True,
+                  help='Only learn from reports the LLM categorized at least this confidently')
+    @click.option('--output', help='Model file (default AI_LOCAL_MODEL_PATH)')
+    def train_classifier_command(min_confidence, output):
+        """Train the local fallback classifier from reports the LLM categorized"""
+        from app.models.report import Report
+        from app.services.text_classifier import TextClassifier
+
+        # Reports without a model were categorized by a fallback, possibly this classifier
+        rows = Report.query.with_entities(Report.title, Report.description, Report.ai_category)\
+                           .filter(Report.ai_processed.is_(True), Report.ai_category.isnot(None),
+                                   Report.ai_model.isnot(None), Report.ai_confidence >= min_confidence).all()
+        try:
+            model = TextClassifier.train([f'{title}. {description}' for title, description, _ in rows],
+                                         [category for _, _, category in rows])
+        except ValueError as e:
+            raise click.ClickException(str(e))
+
+        path = output or current_app.config['AI_LOCAL_MODEL_PATH']
+        model.save(path)
+        click.echo(f'Trained on {len(rows)} reports across {len(model.classes)} categories; '
+                   f'saved {len(model.deltas)} features to {path}')
+
+    @app.cli.command('ai-worker')
+    @click.option('--concurrency', type=int, help='Jobs analyzed at once (default AI_WORKER_CONCURRENCY)')
+    @click.option('--once', is_flag=True, help='Exit once the queue is drained')
+    def ai_worker_command(concurrency, once):
+        """Process queued AI analysis jobs"""
+        from app.services.ai_worker import AIWorker
+        worker = AIWorker(current_app._get_current_object(), concurrency=concurrency)
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda signum, frame: worker.stop())
+        click.echo(f'AI worker {worker.worker_id} started with {worker.concurrency} slots')
+        processed = worker.run(once=once)
+        click.echo(f'Processed {processed} AI jobs')
+
+    @app.cli.command('ai-backfill')
+    @click.option('--model', help='Only reports analyzed with this model')
+    @click.option('--prompt-version', help='Only reports analyzed with these prompt versions, e.g. "advice:1,classify:1"')
+    @click.option('--unprocessed-only', is_flag=True, help='Only reports that were never analyzed')
+    @click.option('--since', type=click.DateTime(), help='Only reports created at or after this time')
+    @click.option('--until', type=click.DateTime(), help='Only reports created before this time')
+    @click.option('--concurrency', type=int, help='Reports analyzed at once (default AI_WORKER_CONCURRENCY)')
+    @click.option('--batch-size', default=100, show_default=True, help='Reports per commit and checkpoint')
+    @click.option('--limit', type=int, help='Stop after this many reports')
+    @click.option('--checkpoint', help='Checkpoint file (default instance/ai_backfill.json)')
+    @click.option('--restart', is_flag=True, help='Ignore the checkpoint and start from the first report')
+    def ai_backfill_command(model, prompt_version, unprocessed_only, since, until, concurrency,
+                            batch_size, limit, checkpoint, restart):
+        """Re-analyze reports that are unprocessed or were analyzed by another model or prompt.
+
+        Without filters every report not analyzed by the current model with
+        the current prompts is a candidate. Progress is checkpointed after
+        every batch; running the command again with the same filters resumes.
+        """
+        from app.services.ai_backfill import AIBackfill
+        from app.services.ai_gateway import AIUnavailable
+        from app.services.ai_service import AIService
+
+        if AIService().client is None:
+            raise click.ClickException('AI client is not configured; set GROQ_API_KEY')
+
+        backfill = AIBackfill(current_app._get_current_object(), concurrency=concurrency, batch_size=batch_size,
+                              checkpoint_path=checkpoint, model=model, prompt_version=prompt_version,
+                              since=since, until=until, unprocessed_only=unprocessed_only, limit=limit)
+        previous = {signum: signal.signal(signum, lambda signum, frame: backfill.stop())
+                    for signum in (signal.SIGTERM, signal.SIGINT)}
+
+        def report_progress(stats):
+            attempted = stats['updated'] + stats['failed']
+            click.echo(f"Through report {stats['last_id']}: {stats['updated']} updated, {stats['failed']} failed "
+                       f"({stats['failed'] / attempted:.1%} errors); "
+                       f"{stats['processed'] / max(stats['elapsed'], 0.001):.1f} reports/s this run")
+
+        try:
+            stats = backfill.run(restart=restart, progress=report_progress)
+        except AIUnavailable as e:
+            raise click.ClickException(str(e))
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        click.echo(f"Backfill done through report {stats['last_id']}: {stats['processed']} reports this run, "
+                   f"{stats['updated']} updated and {stats['failed']} failed in total")
+
+    @app.cli.command('refill-task-pools')
+    @click.option('--category', help='Only this category (default GREEN_TASK_POOL_CATEGORIES)')
+    @click.option('--difficulty', type=click.Choice(['easy', 'medium', 'hard']), help='Only this difficulty')
+    def refill_task_pools_command(category, difficulty):
+        """Top up green task pools that are below their low-water mark"""
+        from app.services.ai_service import AIService
+        from app.services.task_pool import task_pool
+
+        ai_service = AIService()
+        if ai_service.client is None:
+            raise click.ClickException('AI client is not configured; set GROQ_API_KEY')
+
+        pools = [pool for pool in task_pool.levels()
+                 if (not category or pool[0] == category.lower()) and (not difficulty or pool[1] == difficulty)]
+        added = task_pool.refill(ai_service, pools=pools)
+        for (pool_category, pool_difficulty), count in added.items():
+            click.echo(f'{pool_category}/{pool_difficulty}: added {count} tasks')
+        levels = task_pool.levels()
+        click.echo(f'Refilled {len(added)} pools; fresh tasks per pool: '
+                   + ', '.join(f'{c}/{d}={levels[(c, d)]}' for c, d in pools))
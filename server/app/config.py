@@ -11,18 +11,113 @@ class Config:
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
     
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'uploads'))
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024
+    # Uploads stream into this directory before being moved into place; it is
+    # never served, and defaults to "<UPLOAD_FOLDER>.incoming" beside it
+    UPLOAD_TEMP_FOLDER = os.environ.get('UPLOAD_TEMP_FOLDER')
+    # Per-file limit, checked while the upload streams in; whole requests may
+    # add form fields and multipart framing on top of one file
+    MAX_FILE_SIZE = int(os.environ.get('MAX_FILE_SIZE', str(5 * 1024 * 1024)))
+    MAX_CONTENT_LENGTH = MAX_FILE_SIZE + 256 * 1024
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+
+    # Upload names are unique per file, so responses never need revalidating
+    UPLOADS_CACHE_MAX_AGE = int(os.environ.get('UPLOADS_CACHE_MAX_AGE', str(365 * 24 * 3600)))
+    # Hand file delivery to the front proxy: an internal nginx location prefix
+    # for X-Accel-Redirect, or USE_X_SENDFILE for Apache/lighttpd X-Sendfile
+    UPLOADS_ACCEL_REDIRECT = os.environ.get('UPLOADS_ACCEL_REDIRECT')
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE', 'false').lower() == 'true'
+
+    # Image derivative pipeline; 0 workers renders inline in the request
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', '2'))
+    IMAGE_VARIANT_WIDTHS = tuple(int(width) for width in os.environ.get('IMAGE_VARIANT_WIDTHS', '320,640,1280').split(','))
+    IMAGE_QUALITY = int(os.environ.get('IMAGE_QUALITY', '82'))
     
     GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
     GROQ_MODEL = os.environ.get('GROQ_MODEL', 'llama-3.1-70b-versatile')
     GROQ_TEMPERATURE = float(os.environ.get('GROQ_TEMPERATURE', '0.7'))
     GROQ_MAX_TOKENS = int(os.environ.get('GROQ_MAX_TOKENS', '500'))
+    # Shared keep-alive connection pool for LLM calls (seconds for timeouts;
+    # reads are bounded by AI_CALL_TIMEOUT)
+    GROQ_CONNECT_TIMEOUT = float(os.environ.get('GROQ_CONNECT_TIMEOUT', '5'))
+    # Client retries would multiply AI_CALL_TIMEOUT per call; failed report
+    # analyses are retried by the job queue instead
+    GROQ_MAX_RETRIES = int(os.environ.get('GROQ_MAX_RETRIES', '0'))
+    GROQ_MAX_CONNECTIONS = int(os.environ.get('GROQ_MAX_CONNECTIONS', '20'))
+    GROQ_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('GROQ_MAX_KEEPALIVE_CONNECTIONS', '10'))
+    GROQ_KEEPALIVE_EXPIRY = float(os.environ.get('GROQ_KEEPALIVE_EXPIRY', '60'))
+
+    # Guard rails for every LLM call, per process: a wall-clock deadline in
+    # seconds for the whole call or stream, a cap on concurrent calls (waiting at most AI_QUEUE_TIMEOUT for a slot)
+    # and a circuit breaker that opens after consecutive provider failures
+    # and probes again after AI_BREAKER_RESET_TIMEOUT seconds
+    AI_CALL_TIMEOUT = float(os.environ.get('AI_CALL_TIMEOUT', '15'))
+    AI_MAX_CONCURRENT_CALLS = int(os.environ.get('AI_MAX_CONCURRENT_CALLS', '8'))
+    AI_QUEUE_TIMEOUT = float(os.environ.get('AI_QUEUE_TIMEOUT', '0.5'))
+    AI_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('AI_BREAKER_FAILURE_THRESHOLD', '5'))
+    AI_BREAKER_RESET_TIMEOUT = float(os.environ.get('AI_BREAKER_RESET_TIMEOUT', '30'))
+
+    # Background AI analysis (flask ai-worker); retries back off exponentially
+    # from AI_JOB_BACKOFF_BASE seconds, and jobs locked longer than
+    # AI_JOB_TIMEOUT seconds are assumed abandoned and requeued
+    AI_WORKER_CONCURRENCY = int(os.environ.get('AI_WORKER_CONCURRENCY', '4'))
+    AI_WORKER_POLL_INTERVAL = float(os.environ.get('AI_WORKER_POLL_INTERVAL', '1.0'))
+    AI_JOB_MAX_ATTEMPTS = int(os.environ.get('AI_JOB_MAX_ATTEMPTS', '5'))
+    AI_JOB_BACKOFF_BASE = int(os.environ.get('AI_JOB_BACKOFF_BASE', '5'))
+    AI_JOB_BACKOFF_MAX = int(os.environ.get('AI_JOB_BACKOFF_MAX', '600'))
+    AI_JOB_TIMEOUT = int(os.environ.get('AI_JOB_TIMEOUT', '300'))
+
+    # LLM result cache: per-process LRU entries, plus a shared table capped
+    # at AI_CACHE_DB_MAX_ENTRIES; both expire after AI_CACHE_TTL seconds
+    AI_CACHE_ENABLED = os.environ.get('AI_CACHE_ENABLED', 'true').lower() == 'true'
+    AI_CACHE_SIZE = int(os.environ.get('AI_CACHE_SIZE', '1024'))
+    AI_CACHE_TTL = int(os.environ.get('AI_CACHE_TTL', str(7 * 24 * 3600)))
+    AI_CACHE_DB_MAX_ENTRIES = int(os.environ.get('AI_CACHE_DB_MAX_ENTRIES', '50000'))
+
+    # POST /api/ai/categorize-batch: texts per request, and the estimated
+    # prompt tokens and items packed into each LLM call
+    AI_BATCH_MAX_TEXTS = int(os.environ.get('AI_BATCH_MAX_TEXTS', '500'))
+    AI_BATCH_TOKEN_BUDGET = int(os.environ.get('AI_BATCH_TOKEN_BUDGET', '3000'))
+    AI_BATCH_MAX_ITEMS_PER_PROMPT = int(os.environ.get('AI_BATCH_MAX_ITEMS_PER_PROMPT', '50'))
+
+    # Ask for a report's category and advice in one LLM call; replies that
+    # fail validation fall back to separate classification and advice calls
+    AI_COMBINED_ANALYSIS = os.environ.get('AI_COMBINED_ANALYSIS', 'true').lower() == 'true'
+
+    # Local fallback classifier trained by `flask train-classifier`; when
+    # AI_LOCAL_SKIP_LLM_CONFIDENCE is set, local predictions at least that
+    # confident are used without calling the LLM
+    AI_LOCAL_MODEL_PATH = os.environ.get('AI_LOCAL_MODEL_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'instance', 'text_classifier.json.gz'))
+    AI_LOCAL_SKIP_LLM_CONFIDENCE = float(os.environ['AI_LOCAL_SKIP_LLM_CONFIDENCE']) if os.environ.get('AI_LOCAL_SKIP_LLM_CONFIDENCE') else None
+
+    # Optional JSON file of extra green actions and fallback tasks, in the
+    # same format as app/data/green_catalog.json
+    GREEN_CATALOG_PATH = os.environ.get('GREEN_CATALOG_PATH')
+
+    # Pre-generated task pools per category and difficulty. The AI worker
+    # checks them every GREEN_TASK_REFILL_INTERVAL seconds (0 disables) and
+    # tops up pools with fewer than GREEN_TASK_POOL_LOW_WATER fresh tasks to
+    # GREEN_TASK_POOL_SIZE; a task stops being fresh after
+    # GREEN_TASK_MAX_SERVES requests
+    GREEN_TASK_POOL_ENABLED = os.environ.get('GREEN_TASK_POOL_ENABLED', 'true').lower() == 'true'
+    GREEN_TASK_POOL_CATEGORIES = os.environ.get('GREEN_TASK_POOL_CATEGORIES', 'general,energy,water,waste').split(',')
+    GREEN_TASK_POOL_SIZE = int(os.environ.get('GREEN_TASK_POOL_SIZE', '20'))
+    GREEN_TASK_POOL_LOW_WATER = int(os.environ.get('GREEN_TASK_POOL_LOW_WATER', '5'))
+    GREEN_TASK_MAX_SERVES = int(os.environ.get('GREEN_TASK_MAX_SERVES', '50'))
+    GREEN_TASK_REFILL_INTERVAL = float(os.environ.get('GREEN_TASK_REFILL_INTERVAL', '300'))
     
     FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
     CORS_ORIGINS = [FRONTEND_URL, 'http://localhost:5173', 'http://127.0.0.1:5173', 'http://localhost:5174', 'http://localhost:5175', 'http://127.0.0.1:5175']
     
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+
+    # Map tiles: clusters below this zoom, individual points from it on
+    TILE_POINTS_MIN_ZOOM = int(os.environ.get('TILE_POINTS_MIN_ZOOM', '13'))
+    TILE_MAX_POINTS = int(os.environ.get('TILE_MAX_POINTS', '1000'))
+    TILE_CACHE_SIZE = int(os.environ.get('TILE_CACHE_SIZE', '2048'))
+    TILE_CACHE_TTL = int(os.environ.get('TILE_CACHE_TTL', '60'))
+
+    # Deepest reply level accepted and returned in comment threads (top level is 0)
+    COMMENT_MAX_DEPTH = int(os.environ.get('COMMENT_MAX_DEPTH', '5'))
     
     APP_NAME = 'EarthLens API'
     VERSION = '1.0.0'
@@ -49,6 +144,7 @@ class TestingConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///test.db'
     WTF_CSRF_ENABLED = False
+    IMAGE_WORKERS = 0
     LOG_LEVEL = 'DEBUG'
 
 
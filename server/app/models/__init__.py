@@ -2,5 +2,14 @@ from .user import User
 from .report import Report
 from .comment import Comment
 from .tag import Tag
+from .grid import ReportGridCell
+from .cache_version import CacheVersion
+from .stored_file import StoredFile
+from .ai_job import AIJob
+from .ai_cache import AICacheEntry
+from .green_task import GreenTask
+from . import counters  # registers counter maintenance listeners
+from . import search  # registers full-text index DDL
 
-__all__ = ['User', 'Report', 'Comment', 'Tag']
\ No newline at end of file
+__all__ = ['User', 'Report', 'Comment', 'Tag', 'ReportGridCell', 'CacheVersion', 'StoredFile', 'AIJob', 'AICacheEntry',
+           'GreenTask']
\ No newline at end of file
@@ -0,0 +1,55 @@
+from datetime import datetime
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.database import db
+
+
+class AICacheEntry(db.Model):
+    """Shared tier of the AI result cache, keyed by a hash of the prompt inputs"""
+    __tablename__ = 'ai_cache_entries'
+
+    key = db.Column(db.String(64), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # classify, advice, ...
+    model = db.Column(db.String(100), nullable=False)
+    prompt_version = db.Column(db.Integer, nullable=False)
+    value = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    @classmethod
+    def lookup(cls, connection, key):
+        """Return the cached value for a key, or None if missing or expired"""
+        table = cls.__table__
+        return connection.execute(
+            select(table.c.value).where(table.c.key == key, table.c.expires_at > datetime.utcnow())
+        ).scalar()
+
+    @classmethod
+    def store(cls, connection, key, kind, model, prompt_version, value, expires_at):
+        table = cls.__table__
+        dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+        now = datetime.utcnow()
+        statement = dialect.insert(table).values(
+            key=key, kind=kind, model=model, prompt_version=prompt_version,
+            value=value, created_at=now, expires_at=expires_at
+        )
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={'value': value, 'created_at': now, 'expires_at': expires_at}
+        ))
+
+    @classmethod
+    def prune(cls, connection, max_entries):
+        """Delete expired entries, then the oldest ones beyond ``max_entries``"""
+        table = cls.__table__
+        removed = connection.execute(delete(table).where(table.c.expires_at <= datetime.utcnow())).rowcount
+        excess = connection.execute(select(func.count()).select_from(table)).scalar() - max_entries
+        if excess > 0:
+            oldest = select(table.c.key).order_by(table.c.created_at).limit(excess).scalar_subquery()
+            removed += connection.execute(delete(table).where(table.c.key.in_(oldest))).rowcount
+        return removed
+
+    def __repr__(self):
+        return f'<AICacheEntry {self.kind} {self.key[:12]}>'
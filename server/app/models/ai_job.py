@@ -0,0 +1,115 @@
+"""Durable queue of AI analysis work.
+
+Rows are claimed by ``flask ai-worker`` processes with a conditional UPDATE,
+so any number of workers can poll the same table. Failed attempts are
+retried with exponential backoff until ``max_attempts`` is reached, and
+jobs whose worker died mid-run are requeued once their lock goes stale.
+"""
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from app.database import db, BaseModel
+
+# Claimed first: higher numbers win, then the oldest due job
+SEVERITY_PRIORITY = {'critical': 100, 'high': 50, 'medium': 10, 'low': 0}
+
+
+class AIJob(BaseModel):
+    __tablename__ = 'ai_jobs'
+    __table_args__ = (
+        db.Index('ix_ai_jobs_claim', 'status', 'priority', 'run_at'),
+    )
+
+    report_id = db.Column(db.Integer, db.ForeignKey('reports.id', ondelete='CASCADE'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Not claimed before this
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+    report = db.relationship('Report', backref=db.backref('ai_jobs', lazy='dynamic', cascade='all, delete-orphan',
+                                                          passive_deletes=True))
+
+    @classmethod
+    def enqueue(cls, report, max_attempts=5):
+        """Queue analysis of a report and mark it pending; the caller commits"""
+        report.ai_status = 'pending'
+        job = cls(report=report, priority=SEVERITY_PRIORITY.get(report.severity, 0), max_attempts=max_attempts)
+        db.session.add(job)
+        return job
+
+    @classmethod
+    def claim(cls, worker_id, limit=1):
+        """Lock up to ``limit`` due jobs for one worker, most urgent first"""
+        now = datetime.utcnow()
+        candidates = db.session.query(cls.id).filter(cls.status == 'queued', cls.run_at <= now)\
+                               .order_by(cls.priority.desc(), cls.run_at, cls.id)\
+                               .limit(limit * 2).with_for_update(skip_locked=True).all()
+        claimed = []
+        for (job_id,) in candidates:
+            # Another worker may have taken the row since it was read
+            result = db.session.execute(
+                update(cls).where(cls.id == job_id, cls.status == 'queued')
+                .values(status='running', locked_by=worker_id, locked_at=now, attempts=cls.attempts + 1)
+            )
+            if result.rowcount:
+                claimed.append(job_id)
+                if len(claimed) == limit:
+                    break
+        db.session.commit()
+        return claimed
+
+    @classmethod
+    def requeue_stale(cls, timeout):
+        """Return jobs locked longer than ``timeout`` seconds to the queue"""
+        cutoff = datetime.utcnow() - timedelta(seconds=timeout)
+        result = db.session.execute(
+            update(cls).where(cls.status == 'running', cls.locked_at < cutoff)
+            .values(status='queued', locked_by=None, locked_at=None, run_at=datetime.utcnow())
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def complete(self):
+        self.status = 'done'
+        self.finished_at = datetime.utcnow()
+        self.locked_by = None
+        self.last_error = None
+        self.report.ai_status = 'done'
+
+    def fail(self, error, backoff_base=5, backoff_max=600):
+        """Schedule a retry with jittered exponential backoff, or give up"""
+        self.last_error = str(error)[:2000]
+        self.locked_by = None
+        if self.attempts >= self.max_attempts:
+            self.status = 'failed'
+            self.finished_at = datetime.utcnow()
+            self.report.ai_status = 'failed'
+            return
+        delay = min(backoff_max, backoff_base * 2 ** (self.attempts - 1))
+        self.status = 'queued'
+        self.run_at = datetime.utcnow() + timedelta(seconds=delay * random.uniform(0.8, 1.2))
+        self.report.ai_status = 'pending'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'report_id': self.report_id,
+            'status': self.status,
+            'priority': self.priority,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<AIJob {self.id} report={self.report_id} {self.status}>'
@@ -0,0 +1,116 @@
+"""Version counters behind HTTP validators.
+
+Each scope names a slice of data that read endpoints serialize: ``reports``
+(public feeds), ``report:<id>`` (one report and its comments), ``users``
+(author details shown anywhere), ``user:<id>`` (one user's profile) and
+``tags``. A flush that changes rows records the affected scopes, and they
+are bumped right after the transaction commits, in a short transaction of
+their own: bumping inside it would make every writer queue on the row lock
+of the shared ``reports`` and ``users`` scopes until its commit. An ETag
+built from the versions therefore changes as soon as the data behind it
+may have, give or take that short window.
+"""
+import logging
+from datetime import datetime
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.database import db
+from app.models.user import User
+from app.models.report import Report
+from app.models.comment import Comment
+from app.models.tag import Tag
+
+logger = logging.getLogger(__name__)
+
+# Bumped by maintenance commands that rewrite rows outside the ORM
+GLOBAL_SCOPE = '*'
+# session.info key of the scopes changed in the current transaction
+PENDING_SCOPES_KEY = 'cache_version_scopes'
+
+
+class CacheVersion(db.Model):
+    """Monotonic change counter for one cache scope"""
+    __tablename__ = 'cache_versions'
+
+    scope = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CacheVersion {self.scope}: {self.version}>'
+
+
+def bump_versions(connection, scopes):
+    """Increment the counters of the given scopes, creating missing ones"""
+    table = CacheVersion.__table__
+    dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+    now = datetime.utcnow()
+    # A fixed order keeps concurrent writers from deadlocking on the rows
+    for scope in sorted(scopes):
+        statement = dialect.insert(table).values(scope=scope, version=1, updated_at=now)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.scope],
+            set_={'version': table.c.version + 1, 'updated_at': now}
+        ))
+
+
+def get_versions(scopes):
+    """Return {scope: (version, updated_at)}, with (0, None) for untouched scopes"""
+    table = CacheVersion.__table__
+    rows = db.session.execute(
+        select(table.c.scope, table.c.version, table.c.updated_at).where(table.c.scope.in_(scopes))
+    )
+    versions = {scope: (0, None) for scope in scopes}
+    versions.update({row.scope: (row.version, row.updated_at) for row in rows})
+    return versions
+
+
+def _scopes_for(obj, deleted=False):
+    if isinstance(obj, Report):
+        scopes = {'reports', f'report:{obj.id}', f'user:{obj.user_id}'}
+        if deleted or inspect(obj).attrs.tags.history.has_changes():
+            scopes.add('tags')
+        return scopes
+    if isinstance(obj, Comment):
+        return {'reports', f'report:{obj.report_id}', f'user:{obj.user_id}'}
+    if isinstance(obj, User):
+        return {'users', f'user:{obj.id}'}
+    if isinstance(obj, Tag):
+        return {'tags'}
+    return set()
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_changed_scopes(session, flush_context):
+    scopes = set()
+    for obj in session.new:
+        scopes |= _scopes_for(obj)
+    for obj in session.deleted:
+        scopes |= _scopes_for(obj, deleted=True)
+    for obj in session.dirty:
+        if session.is_modified(obj):
+            scopes |= _scopes_for(obj)
+
+    if scopes:
+        session.info.setdefault(PENDING_SCOPES_KEY, set()).update(scopes)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_committed_scopes(session):
+    scopes = session.info.pop(PENDING_SCOPES_KEY, None)
+    if not scopes:
+        return
+    try:
+        with session.get_bind().begin() as connection:
+            bump_versions(connection, scopes)
+    except Exception as e:
+        # The data is committed either way; stale validators expire with the next bump
+        logger.warning(f"Cache version bump failed for {len(scopes)} scopes: {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_scopes(session):
+    session.info.pop(PENDING_SCOPES_KEY, None)
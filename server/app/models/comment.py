@@ -1,19 +1,42 @@
+from sqlalchemy import event, select
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+
 from app.database import db, BaseModel
 
+# Zero-padded ids make materialized paths sort in thread order as strings;
+# '/' sorts just before '0', so a subtree is the range [path + '/', path + '0').
+PATH_SEGMENT_WIDTH = 10
+PATH_SEPARATOR = '/'
+
 
 class Comment(BaseModel):
     __tablename__ = 'comments'
+    __table_args__ = (
+        db.Index('ix_comments_report_parent_created', 'report_id', 'parent_id', 'created_at'),
+        db.Index('ix_comments_parent_created', 'parent_id', 'created_at'),
+        db.Index('ix_comments_user_created', 'user_id', 'created_at'),
+        db.Index('ix_comments_root_path', 'root_id', 'path'),
+    )
     
     content = db.Column(db.Text, nullable=False)
     is_edited = db.Column(db.Boolean, default=False)
+    replies_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
     
     # Foreign keys
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     report_id = db.Column(db.Integer, db.ForeignKey('reports.id'), nullable=False)
     parent_id = db.Column(db.Integer, db.ForeignKey('comments.id'))  # For nested comments
+
+    # Thread position, filled in on insert: top-level comment id, nesting depth
+    # and the chain of padded ids from the root down to this comment
+    root_id = db.Column(db.Integer, db.ForeignKey('comments.id'))
+    depth = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    path = db.Column(db.String(255))
     
     # Relationships
-    replies = db.relationship('Comment', backref=db.backref('parent', remote_side='Comment.id'), lazy='dynamic')
+    replies = db.relationship('Comment', backref=db.backref('parent', remote_side='Comment.id'),
+                              lazy='dynamic', foreign_keys=[parent_id])
     
     def __init__(self, content, user_id, report_id, parent_id=None):
         self.content = content
@@ -21,7 +44,7 @@ class Comment(BaseModel):
         self.report_id = report_id
         self.parent_id = parent_id
     
-    def to_dict(self, include_author=True, include_replies=False):
+    def to_dict(self, include_author=True, include_replies=False, max_depth=None):
         """Convert comment to dictionary"""
         data = {
             'id': self.id,
@@ -30,9 +53,10 @@ class Comment(BaseModel):
             'user_id': self.user_id,
             'report_id': self.report_id,
             'parent_id': self.parent_id,
+            'depth': self.depth,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'replies_count': self.replies.count()
+            'replies_count': self.replies_count
         }
         
         if include_author and hasattr(self, 'author'):
@@ -44,7 +68,8 @@ class Comment(BaseModel):
             }
         
         if include_replies:
-            data['replies'] = [reply.to_dict(include_author=True) for reply in self.replies.order_by('created_at')]
+            data['replies'] = []
+            build_comment_tree(self.get_descendants(max_depth), nodes={self.id: data})
         
         return data
     
@@ -54,15 +79,90 @@ class Comment(BaseModel):
         self.is_edited = True
         self.save()
     
+    def get_descendants(self, max_depth=None):
+        """Get every reply below this comment in thread order, in one query"""
+        query = Comment.query.options(joinedload(Comment.author)).filter(
+            Comment.root_id == self.root_id,
+            Comment.path > self.path + PATH_SEPARATOR,
+            Comment.path < self.path + '0'
+        )
+        if max_depth is not None:
+            query = query.filter(Comment.depth <= max_depth)
+        return query.order_by(Comment.path).all()
+
     @classmethod
-    def get_by_report(cls, report_id, include_replies=True):
-        """Get comments for a report"""
-        if include_replies:
-            return cls.query.filter_by(report_id=report_id, parent_id=None)\
-                           .order_by(cls.created_at.desc()).all()
-        else:
-            return cls.query.filter_by(report_id=report_id)\
-                           .order_by(cls.created_at.desc()).all()
+    def get_thread_page(cls, report_id, page=1, per_page=20, include_replies=True, max_depth=None):
+        """Get a page of top-level threads for a report, newest first.
+
+        The root ids come from one index scan and every comment of those
+        threads from one query ordered by path, so the reply trees are built
+        in memory without a query per comment.
+        """
+        root_ids = [row.id for row in db.session.query(cls.id)
+                    .filter(cls.report_id == report_id, cls.parent_id.is_(None))
+                    .order_by(cls.created_at.desc(), cls.id.desc())
+                    .limit(per_page + 1)
+                    .offset((page - 1) * per_page)]
+        has_next = len(root_ids) > per_page
+        root_ids = root_ids[:per_page]
+
+        threads = []
+        if root_ids:
+            query = cls.query.options(joinedload(cls.author))
+            if include_replies:
+                query = query.filter(cls.root_id.in_(root_ids))
+                if max_depth is not None:
+                    query = query.filter(cls.depth <= max_depth)
+            else:
+                query = query.filter(cls.id.in_(root_ids))
+            roots = {node['id']: node for node in build_comment_tree(query.order_by(cls.path))}
+            threads = [roots[root_id] for root_id in root_ids if root_id in roots]
+
+        return threads, {'page': page, 'per_page': per_page, 'has_next': has_next}
     
     def __repr__(self):
-        return f'<Comment {self.id} by User {self.user_id}>'
\ No newline at end of file
+        return f'<Comment {self.id} by User {self.user_id}>'
+
+
+def build_comment_tree(comments, nodes=None):
+    """Nest comments ordered by path under their parents.
+
+    ``nodes`` maps ids of already serialized comments to their dictionaries;
+    comments whose parent is not among them are returned as the top level.
+    """
+    nodes = {} if nodes is None else nodes
+    top_level = []
+    for comment in comments:
+        node = comment.to_dict(include_author=True)
+        node['replies'] = []
+        nodes[comment.id] = node
+        parent = nodes.get(comment.parent_id)
+        (parent['replies'] if parent is not None else top_level).append(node)
+    return top_level
+
+
+def comment_path(parent_path, comment_id):
+    """Materialized path of a comment below a parent path"""
+    segment = str(comment_id).zfill(PATH_SEGMENT_WIDTH)
+    return f'{parent_path}{PATH_SEPARATOR}{segment}' if parent_path else segment
+
+
+@event.listens_for(Comment, 'after_insert')
+def _set_thread_position(mapper, connection, target):
+    """Record root, depth and path once the new comment has its id"""
+    table = Comment.__table__
+    root_id, depth, path = target.id, 0, comment_path(None, target.id)
+    if target.parent_id is not None:
+        parent = connection.execute(
+            select(table.c.root_id, table.c.depth, table.c.path).where(table.c.id == target.parent_id)
+        ).first()
+        if parent is not None:
+            root_id, depth, path = parent.root_id, parent.depth + 1, comment_path(parent.path, target.id)
+
+    connection.execute(
+        table.update().where(table.c.id == target.id)
+        .values(root_id=root_id, depth=depth, path=path, updated_at=table.c.updated_at)
+    )
+    set_committed_value(target, 'root_id', root_id)
+    set_committed_value(target, 'depth', depth)
+    set_committed_value(target, 'path', path)
@@ -0,0 +1,159 @@
+"""Denormalized counter maintenance.
+
+``User.reports_count``, ``User.comments_count``, ``Report.comments_count``,
+``Comment.replies_count`` and ``Tag.reports_count`` are kept in step with
+the rows they count. Deltas are collected from the unit of work and applied
+as relative ``UPDATE ... SET n = n + delta`` statements inside the same
+flush, so they commit or roll back together with the change that caused them.
+"""
+from collections import defaultdict
+
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.database import db
+from app.models.user import User
+from app.models.report import Report, report_tags
+from app.models.comment import Comment
+from app.models.tag import Tag
+from app.models.cache_version import bump_versions, GLOBAL_SCOPE
+
+
+def _column_change(obj, key):
+    """Return (old, new) for a changed column attribute, or None"""
+    history = inspect(obj).attrs[key].history
+    if not history.has_changes() or not history.deleted:
+        return None
+    old = history.deleted[0]
+    new = history.added[0] if history.added else None
+    return (old, new) if old != new else None
+
+
+@event.listens_for(Session, 'before_flush')
+def _remember_deleted_report_tags(session, flush_context, instances):
+    # The tag links of a deleted report are removed by the flush itself, so
+    # read them while the collection can still be loaded.
+    deleted_tags = session.info.setdefault('deleted_report_tags', {})
+    for obj in session.deleted:
+        if isinstance(obj, Report):
+            deleted_tags[obj.id] = [tag.id for tag in obj.tags if tag.id is not None]
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_counter_deltas(session, flush_context):
+    deltas = defaultdict(lambda: defaultdict(int))
+    deleted_tags = session.info.pop('deleted_report_tags', {})
+
+    for obj in session.new:
+        if isinstance(obj, Report):
+            deltas[(User, obj.user_id)]['reports_count'] += 1
+            for tag in inspect(obj).attrs.tags.history.added:
+                deltas[(Tag, tag.id)]['reports_count'] += 1
+        elif isinstance(obj, Comment):
+            deltas[(User, obj.user_id)]['comments_count'] += 1
+            deltas[(Report, obj.report_id)]['comments_count'] += 1
+            if obj.parent_id:
+                deltas[(Comment, obj.parent_id)]['replies_count'] += 1
+
+    for obj in session.deleted:
+        if isinstance(obj, Report):
+            deltas[(User, obj.user_id)]['reports_count'] -= 1
+            for tag_id in deleted_tags.get(obj.id, []):
+                deltas[(Tag, tag_id)]['reports_count'] -= 1
+        elif isinstance(obj, Comment):
+            deltas[(User, obj.user_id)]['comments_count'] -= 1
+            deltas[(Report, obj.report_id)]['comments_count'] -= 1
+            if obj.parent_id:
+                deltas[(Comment, obj.parent_id)]['replies_count'] -= 1
+
+    for obj in session.dirty:
+        if obj in session.deleted:
+            continue
+        if isinstance(obj, Report):
+            moved = _column_change(obj, 'user_id')
+            if moved:
+                deltas[(User, moved[0])]['reports_count'] -= 1
+                deltas[(User, moved[1])]['reports_count'] += 1
+            tag_history = inspect(obj).attrs.tags.history
+            for tag in tag_history.added:
+                deltas[(Tag, tag.id)]['reports_count'] += 1
+            for tag in tag_history.deleted:
+                deltas[(Tag, tag.id)]['reports_count'] -= 1
+        elif isinstance(obj, Comment):
+            for key, model, column in (('user_id', User, 'comments_count'),
+                                       ('report_id', Report, 'comments_count'),
+                                       ('parent_id', Comment, 'replies_count')):
+                moved = _column_change(obj, key)
+                if moved:
+                    if moved[0] is not None:
+                        deltas[(model, moved[0])][column] -= 1
+                    if moved[1] is not None:
+                        deltas[(model, moved[1])][column] += 1
+
+    connection = session.connection()
+    for (model, row_id), columns in deltas.items():
+        columns = {column: amount for column, amount in columns.items() if amount}
+        if row_id is None or not columns:
+            continue
+
+        table = model.__table__
+        values = {column: table.c[column] + amount for column, amount in columns.items()}
+        # Counter bumps are not content edits; keep updated_at unchanged
+        values['updated_at'] = table.c.updated_at
+        connection.execute(update(table).where(table.c.id == row_id).values(**values))
+
+        # Keep already-loaded instances consistent with the row
+        instance = session.identity_map.get(inspect(model).identity_key_from_primary_key((row_id,)))
+        if instance is not None:
+            state = inspect(instance)
+            for column, amount in columns.items():
+                if column in state.dict:
+                    set_committed_value(instance, column, (state.dict[column] or 0) + amount)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_tags(session):
+    session.info.pop('deleted_report_tags', None)
+
+
+def reconcile_counters():
+    """Recompute every denormalized counter from the source rows in bulk"""
+    reports = Report.__table__
+    comments = Comment.__table__
+    users = User.__table__
+    tags = Tag.__table__
+    replies = aliased(Comment.__table__)
+
+    statements = [
+        update(users).values(
+            reports_count=select(func.count(reports.c.id))
+                .where(reports.c.user_id == users.c.id).scalar_subquery(),
+            comments_count=select(func.count(comments.c.id))
+                .where(comments.c.user_id == users.c.id).scalar_subquery(),
+            updated_at=users.c.updated_at
+        ),
+        update(reports).values(
+            comments_count=select(func.count(comments.c.id))
+                .where(comments.c.report_id == reports.c.id).scalar_subquery(),
+            updated_at=reports.c.updated_at
+        ),
+        update(comments).values(
+            replies_count=select(func.count(replies.c.id))
+                .where(replies.c.parent_id == comments.c.id).scalar_subquery(),
+            updated_at=comments.c.updated_at
+        ),
+        update(tags).values(
+            reports_count=select(func.count(report_tags.c.report_id))
+                .where(report_tags.c.tag_id == tags.c.id).scalar_subquery(),
+            updated_at=tags.c.updated_at
+        )
+    ]
+
+    rows = 0
+    for statement in statements:
+        rows += db.session.execute(statement).rowcount
+    # Counters rewritten behind the ORM invalidate every cached response
+    bump_versions(db.session.connection(), [GLOBAL_SCOPE])
+    db.session.commit()
+    return rows
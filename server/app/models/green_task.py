@@ -0,0 +1,109 @@
+"""Pre-generated green tasks served by ``/api/ai/generate-task``.
+
+Each (category, difficulty) pool is rotated: a request gets the task
+served least recently, so reads never wait on the LLM. Tasks count as
+fresh until they have been served ``max_serves`` times; the refill job in
+``app.services.task_pool`` tops up pools whose fresh tasks run low.
+"""
+from datetime import datetime
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.database import db, BaseModel
+
+
+class GreenTask(BaseModel):
+    __tablename__ = 'green_tasks'
+    __table_args__ = (
+        db.UniqueConstraint('category', 'difficulty', 'title_key', name='uq_green_tasks_title'),
+        db.Index('ix_green_tasks_rotation', 'category', 'difficulty', 'last_served_at'),
+    )
+
+    category = db.Column(db.String(50), nullable=False)
+    difficulty = db.Column(db.String(10), nullable=False)  # easy, medium, hard
+    title = db.Column(db.String(200), nullable=False)
+    title_key = db.Column(db.String(200), nullable=False)  # Normalized title used to spot duplicates
+    task = db.Column(db.JSON, nullable=False)  # Payload returned to clients
+    model = db.Column(db.String(100))
+    prompt_version = db.Column(db.Integer)
+    served_count = db.Column(db.Integer, nullable=False, default=0)
+    last_served_at = db.Column(db.DateTime)
+
+    @classmethod
+    def serve(cls, category, difficulty=None):
+        """Return the least recently served task of a pool and mark it served, or None if the pool is empty.
+
+        Runs in its own transaction on a dedicated connection, so the
+        caller's session is neither committed nor rolled back.
+        """
+        table = cls.__table__
+        query = select(table.c.id, table.c.last_served_at).where(table.c.category == category)
+        if difficulty:
+            query = query.where(table.c.difficulty == difficulty)
+        query = query.order_by(table.c.last_served_at.asc().nullsfirst(), table.c.id)\
+                     .limit(3).with_for_update(skip_locked=True)
+
+        with db.engine.begin() as connection:
+            for task_id, last_served_at in connection.execute(query).all():
+                # Another request may have served the row since it was read
+                unchanged = table.c.last_served_at.is_(None) if last_served_at is None \
+                    else table.c.last_served_at == last_served_at
+                result = connection.execute(
+                    update(table).where(table.c.id == task_id, unchanged)
+                    .values(served_count=table.c.served_count + 1, last_served_at=datetime.utcnow())
+                )
+                if result.rowcount:
+                    return connection.execute(select(table.c.task).where(table.c.id == task_id)).scalar()
+        return None
+
+    @classmethod
+    def add(cls, category, difficulty, title, title_key, task, model=None, prompt_version=None):
+        """Insert a task unless its pool already has one with the same title key; returns whether it was added.
+
+        A refill running concurrently may have inserted the same title, so
+        the conflict is skipped instead of failing the caller's transaction.
+        """
+        connection = db.session.connection()
+        dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+        return connection.execute(
+            dialect.insert(cls.__table__).values(
+                category=category, difficulty=difficulty, title=title, title_key=title_key, task=task,
+                model=model, prompt_version=prompt_version, served_count=0
+            ).on_conflict_do_nothing(index_elements=['category', 'difficulty', 'title_key'])
+        ).rowcount == 1
+
+    @classmethod
+    def fresh_counts(cls, max_serves):
+        """{(category, difficulty): number of tasks served fewer than ``max_serves`` times}"""
+        rows = db.session.query(cls.category, cls.difficulty, func.count(cls.id))\
+                         .filter(cls.served_count < max_serves)\
+                         .group_by(cls.category, cls.difficulty).all()
+        return {(category, difficulty): count for category, difficulty, count in rows}
+
+    @classmethod
+    def titles(cls, category, difficulty):
+        """(title, title_key) of every task in a pool, oldest first"""
+        return db.session.query(cls.title, cls.title_key).filter_by(category=category, difficulty=difficulty)\
+                         .order_by(cls.id).all()
+
+    @classmethod
+    def retire(cls, category, difficulty, max_serves):
+        """Delete a pool's tasks that have been served ``max_serves`` times; the caller commits"""
+        return cls.query.filter(cls.category == category, cls.difficulty == difficulty,
+                                cls.served_count >= max_serves).delete(synchronize_session=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'category': self.category,
+            'difficulty': self.difficulty,
+            'title': self.title,
+            'task': self.task,
+            'served_count': self.served_count,
+            'last_served_at': self.last_served_at.isoformat() if self.last_served_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+    def __repr__(self):
+        return f'<GreenTask {self.category}/{self.difficulty} {self.title}>'
@@ -0,0 +1,259 @@
+"""Map grid rollups.
+
+Every public, active report with coordinates is counted in one geohash cell
+per precision from 1 to ``GRID_MAX_PRECISION``. A flush that adds, removes
+or changes reports applies the difference to each affected cell as a
+relative upsert, like the denormalized counters, so map tiles only ever
+read this table and concurrent writers never lose each other's updates.
+``flask rebuild-grid`` recomputes the whole table from ``reports``.
+"""
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import Integer, String, case, cast, event, func, inspect, literal, null, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
+
+from app.database import db
+from app.models.report import Report
+from app.utils.geo import GRID_MAX_PRECISION
+from app.utils.tile_cache import tile_cache
+
+# Report attributes that change which cell a report counts towards, or how
+TRACKED_ATTRIBUTES = ('geohash', 'latitude', 'longitude', 'is_public', 'status', 'severity', 'ai_category')
+
+
+class ReportGridCell(db.Model):
+    """Aggregates of public, active reports within one geohash cell"""
+    __tablename__ = 'report_grid_cells'
+
+    cell = db.Column(db.String(GRID_MAX_PRECISION), primary_key=True)
+    reports_count = db.Column(db.Integer, nullable=False, default=0)
+    latitude_sum = db.Column(db.Float, nullable=False, default=0.0)
+    longitude_sum = db.Column(db.Float, nullable=False, default=0.0)
+    severity_counts = db.Column(db.JSON, nullable=False, default=dict)
+    category_counts = db.Column(db.JSON, nullable=False, default=dict)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    @property
+    def top_category(self):
+        if not self.category_counts:
+            return None
+        return max(self.category_counts.items(), key=lambda item: (item[1], item[0]))[0]
+
+    def to_dict(self):
+        """Convert cell aggregate to a map cluster"""
+        return {
+            'cell': self.cell,
+            'count': self.reports_count,
+            'centroid': {
+                'latitude': self.latitude_sum / self.reports_count,
+                'longitude': self.longitude_sum / self.reports_count
+            },
+            'severity': self.severity_counts,
+            'top_category': self.top_category
+        }
+
+    def __repr__(self):
+        return f'<ReportGridCell {self.cell}: {self.reports_count}>'
+
+
+def _empty_aggregate():
+    return {
+        'reports_count': 0,
+        'latitude_sum': 0.0,
+        'longitude_sum': 0.0,
+        'severity_counts': Counter(),
+        'category_counts': Counter()
+    }
+
+
+def _add_report_rows(aggregate, rows):
+    """Fold (severity, ai_category, count, lat_sum, lng_sum) rows into an aggregate"""
+    for severity, category, count, latitude_sum, longitude_sum in rows:
+        aggregate['reports_count'] += count
+        aggregate['latitude_sum'] += latitude_sum or 0.0
+        aggregate['longitude_sum'] += longitude_sum or 0.0
+        aggregate['severity_counts'][severity or 'medium'] += count
+        if category:
+            aggregate['category_counts'][category] += count
+    return aggregate
+
+
+def _write_cell(connection, cell, aggregate):
+    connection.execute(ReportGridCell.__table__.insert().values(
+        cell=cell,
+        reports_count=aggregate['reports_count'],
+        latitude_sum=aggregate['latitude_sum'],
+        longitude_sum=aggregate['longitude_sum'],
+        severity_counts=dict(aggregate['severity_counts']),
+        category_counts=dict(aggregate['category_counts']),
+        updated_at=datetime.utcnow()
+    ))
+
+
+def _visible_reports_filter(reports):
+    return (reports.c.geohash.isnot(None), reports.c.is_public == True, reports.c.status == 'active')
+
+
+def _increment_counts(column, amounts, dialect_name):
+    """SQL adding ``amounts`` to the keys of a JSON counts column, dropping keys that reach zero"""
+    if not amounts:
+        return column
+    current = cast(column, JSONB) if dialect_name == 'postgresql' else column
+    pairs = []
+    for key, amount in amounts.items():
+        if dialect_name == 'postgresql':
+            stored = cast(current.op('->>')(key), Integer)
+        else:
+            stored = func.json_extract(column, f'$."{key}"')
+        total = func.coalesce(stored, 0) + amount
+        # A null value removes the key when the patch is merged in
+        pairs += [cast(literal(key), String), case((total == 0, null()), else_=total)]
+
+    if dialect_name == 'postgresql':
+        return cast(func.jsonb_strip_nulls(current.op('||')(func.jsonb_build_object(*pairs))), column.type)
+    return func.json_patch(column, func.json_object(*pairs))
+
+
+def apply_cell_deltas(connection, deltas):
+    """Add per-cell aggregate deltas to the grid and drop cells left empty.
+
+    Each cell is one ``INSERT ... ON CONFLICT DO UPDATE`` of relative
+    amounts, so concurrent writers add up instead of overwriting each other.
+    Cells are written in a fixed order to keep row locks from deadlocking.
+    """
+    table = ReportGridCell.__table__
+    dialect_name = connection.dialect.name
+    dialect = postgresql if dialect_name == 'postgresql' else sqlite
+    now = datetime.utcnow()
+    for cell in sorted(deltas):
+        delta = deltas[cell]
+        severity = {key: amount for key, amount in delta['severity_counts'].items() if amount}
+        categories = {key: amount for key, amount in delta['category_counts'].items() if amount}
+        statement = dialect.insert(table).values(
+            cell=cell,
+            reports_count=delta['reports_count'],
+            latitude_sum=delta['latitude_sum'],
+            longitude_sum=delta['longitude_sum'],
+            severity_counts=severity,
+            category_counts=categories,
+            updated_at=now
+        )
+        connection.execute(statement.on_conflict_do_update(index_elements=['cell'], set_={
+            'reports_count': table.c.reports_count + statement.excluded.reports_count,
+            'latitude_sum': table.c.latitude_sum + statement.excluded.latitude_sum,
+            'longitude_sum': table.c.longitude_sum + statement.excluded.longitude_sum,
+            'severity_counts': _increment_counts(table.c.severity_counts, severity, dialect_name),
+            'category_counts': _increment_counts(table.c.category_counts, categories, dialect_name),
+            'updated_at': now
+        }))
+    if deltas:
+        connection.execute(table.delete().where(table.c.cell.in_(sorted(deltas)), table.c.reports_count <= 0))
+
+
+def _add_contribution(deltas, contribution, sign):
+    """Count one report's (geohash, latitude, longitude, severity, category) in every enclosing cell"""
+    geohash, latitude, longitude, severity, category = contribution
+    for precision in range(1, GRID_MAX_PRECISION + 1):
+        delta = deltas.setdefault(geohash[:precision], _empty_aggregate())
+        _add_report_rows(delta, [(severity, category, sign, sign * float(latitude or 0.0),
+                                  sign * float(longitude or 0.0))])
+
+
+def rebuild_grid():
+    """Rebuild every grid rollup from the reports table"""
+    reports = Report.__table__
+    finest = func.substr(reports.c.geohash, 1, GRID_MAX_PRECISION)
+    rows = db.session.execute(
+        select(finest, reports.c.severity, reports.c.ai_category, func.count(),
+               func.sum(reports.c.latitude), func.sum(reports.c.longitude))
+        .where(*_visible_reports_filter(reports))
+        .group_by(finest, reports.c.severity, reports.c.ai_category)
+    )
+
+    aggregates = {}
+    for cell, *values in rows:
+        for precision in range(1, GRID_MAX_PRECISION + 1):
+            aggregate = aggregates.setdefault(cell[:precision], _empty_aggregate())
+            _add_report_rows(aggregate, [values])
+
+    connection = db.session.connection()
+    connection.execute(ReportGridCell.__table__.delete())
+    for cell, aggregate in aggregates.items():
+        _write_cell(connection, cell, aggregate)
+    db.session.commit()
+    tile_cache.clear()
+    return len(aggregates)
+
+
+def _contribution(values):
+    """What a report with these attribute values adds to the grid, or None if it is not shown"""
+    if not values['geohash'] or values['is_public'] is not True or values['status'] != 'active':
+        return None
+    return (values['geohash'], values['latitude'], values['longitude'], values['severity'], values['ai_category'])
+
+
+@event.listens_for(Session, 'before_flush')
+def _remember_stored_grid_values(session, flush_context, instances):
+    # Attributes expired by a commit keep no old value in their history, so
+    # read what the changed reports count as now, locking their rows
+    ids = [obj.id for obj in session.deleted if isinstance(obj, Report)]
+    ids += [obj.id for obj in session.dirty if isinstance(obj, Report) and obj.id is not None
+            and any(inspect(obj).attrs[key].history.has_changes() for key in TRACKED_ATTRIBUTES)]
+    stored = session.info.setdefault('grid_stored_values', {})
+    if ids:
+        reports = Report.__table__
+        rows = session.connection().execute(
+            select(reports.c.id, *(reports.c[key] for key in TRACKED_ATTRIBUTES))
+            .where(reports.c.id.in_(ids)).with_for_update()
+        )
+        for row in rows:
+            stored[row.id] = {key: row._mapping[key] for key in TRACKED_ATTRIBUTES}
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_grid_deltas(session, flush_context):
+    deltas = {}
+    points = session.info.setdefault('tile_points', set())
+    stored = session.info.pop('grid_stored_values', {})
+
+    def change(old, new):
+        if old == new:
+            return
+        for values, sign in ((old, -1), (new, 1)):
+            contribution = _contribution(values) if values else None
+            if contribution:
+                _add_contribution(deltas, contribution, sign)
+                points.add((float(contribution[1]), float(contribution[2])))
+
+    for obj in session.new:
+        if isinstance(obj, Report):
+            change(None, {key: getattr(obj, key) for key in TRACKED_ATTRIBUTES})
+    for obj in session.deleted:
+        if isinstance(obj, Report):
+            change(stored.get(obj.id), None)
+    for obj in session.dirty:
+        if isinstance(obj, Report) and obj not in session.deleted and obj.id in stored:
+            change(stored[obj.id], {key: getattr(obj, key) for key in TRACKED_ATTRIBUTES})
+
+    # Keep only cells whose aggregates actually moved
+    deltas = {cell: delta for cell, delta in deltas.items()
+              if delta['reports_count'] or any(delta['severity_counts'].values())
+              or any(delta['category_counts'].values()) or delta['latitude_sum'] or delta['longitude_sum']}
+    if deltas:
+        apply_cell_deltas(session.connection(), deltas)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_tiles(session):
+    points = session.info.pop('tile_points', None)
+    if points:
+        tile_cache.invalidate_points(points)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_tile_points(session):
+    session.info.pop('tile_points', None)
+    session.info.pop('grid_stored_values', None)
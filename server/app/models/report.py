@@ -1,23 +1,49 @@
+import math
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import joinedload, selectinload
 from app.database import db, BaseModel
+from app.utils.geo import encode_geohash, bounding_box, cells_for_radius, EARTH_RADIUS_KM, GEOHASH_RANGE_END
 from datetime import datetime
 
 
+def haversine_km_sql(latitude, longitude, lat_column, lng_column):
+    """SQL expression for the great-circle distance in kilometres from a point to a row's coordinates"""
+    phi = math.radians(latitude)
+    half_d_phi = (func.radians(lat_column) - phi) / 2
+    half_d_lambda = (func.radians(lng_column) - math.radians(longitude)) / 2
+    a = func.sin(half_d_phi) * func.sin(half_d_phi) + \
+        math.cos(phi) * func.cos(func.radians(lat_column)) * func.sin(half_d_lambda) * func.sin(half_d_lambda)
+    return 2 * EARTH_RADIUS_KM * func.asin(func.sqrt(a))
+
+
 # Association table for many-to-many relationship between reports and tags
 report_tags = db.Table('report_tags',
     db.Column('report_id', db.Integer, db.ForeignKey('reports.id'), primary_key=True),
-    db.Column('tag_id', db.Integer, db.ForeignKey('tags.id'), primary_key=True)
+    db.Column('tag_id', db.Integer, db.ForeignKey('tags.id'), primary_key=True),
+    db.Index('ix_report_tags_tag_id', 'tag_id')
 )
 
 
 class Report(BaseModel):
     __tablename__ = 'reports'
+    __table_args__ = (
+        db.Index('ix_reports_public_status_created', 'is_public', 'status', 'created_at', 'id'),
+        db.Index('ix_reports_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_reports_user_category', 'user_id', 'ai_category'),
+        db.Index('ix_reports_lat_lng', 'latitude', 'longitude'),
+        db.Index('ix_reports_geohash', 'geohash'),
+        db.Index('ix_reports_image_url', 'image_url'),
+    )
 
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
     location = db.Column(db.String(200))
     latitude = db.Column(db.Float)
     longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12))  # Derived from latitude/longitude on write
     image_url = db.Column(db.String(500))
+    image_variants = db.Column(db.JSON)  # Resized/WebP copies, set by the image pipeline
     is_public = db.Column(db.Boolean, default=True)
     status = db.Column(db.String(50), default='active')  # active, resolved, archived
     severity = db.Column(db.String(20), default='medium')  # low, medium, high, critical
@@ -28,6 +54,13 @@ class Report(BaseModel):
     ai_advice = db.Column(db.Text)
     ai_processed = db.Column(db.Boolean, default=False)
     ai_processed_at = db.Column(db.DateTime)
+    ai_status = db.Column(db.String(20))  # pending, running, done, failed; None if never queued
+    ai_input_hash = db.Column(db.String(64))  # Inputs the stored analysis was produced from
+    ai_model = db.Column(db.String(100))  # LLM behind the stored category; None for fallback results
+    ai_prompt_version = db.Column(db.String(50))
+
+    # Denormalized counter, maintained on write by app.models.counters
+    comments_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
 
     # Foreign keys
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -58,6 +91,7 @@ class Report(BaseModel):
             'latitude': self.latitude,
             'longitude': self.longitude,
             'image_url': self.image_url,
+            'image_variants': self.image_variants,
             'is_public': self.is_public,
             'status': self.status,
             'severity': self.severity,
@@ -66,10 +100,13 @@ class Report(BaseModel):
             'ai_advice': self.ai_advice,
             'ai_processed': self.ai_processed,
             'ai_processed_at': self.ai_processed_at.isoformat() if self.ai_processed_at else None,
+            'ai_status': self.ai_status,
+            'ai_model': self.ai_model,
+            'ai_prompt_version': self.ai_prompt_version,
             'user_id': self.user_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'comments_count': self.comments.count(),
+            'comments_count': self.comments_count,
             'tags': [tag.to_dict() for tag in self.tags]
         }
 
@@ -77,10 +114,25 @@ class Report(BaseModel):
             data['author'] = self.author.to_dict()
 
         if include_comments:
-            data['comments'] = [comment.to_dict() for comment in self.comments.order_by('created_at')]
+            from app.models.comment import Comment
+            data['comments'], _ = Comment.get_thread_page(self.id)
 
         return data
 
+    @classmethod
+    def to_dict_many(cls, reports, include_author=True):
+        """Serialize a page of reports loaded with ``list_options()``.
+
+        All counts are denormalized columns, so serialization issues no
+        further queries once authors and tags are eager loaded.
+        """
+        return [report.to_dict(include_author=include_author) for report in reports]
+
+    @classmethod
+    def list_options(cls):
+        """Loader options that eager load everything list serialization touches"""
+        return (joinedload(cls.author), selectinload(cls.tags))
+
     def add_tag(self, tag):
         """Add a tag to this report"""
         if tag not in self.tags:
@@ -91,10 +143,15 @@ class Report(BaseModel):
         if tag in self.tags:
             self.tags.remove(tag)
 
-    def mark_ai_processed(self, category=None, confidence=None, advice=None):
+    def mark_ai_processed(self, category=None, confidence=None, advice=None, input_hash=None,
+                          model=None, prompt_version=None):
         """Mark report as processed by AI"""
         self.ai_processed = True
         self.ai_processed_at = datetime.utcnow()
+        self.ai_status = 'done'
+        self.ai_input_hash = input_hash
+        self.ai_model = model
+        self.ai_prompt_version = prompt_version
         if category:
             self.ai_category = category
         if confidence is not None:
@@ -102,39 +159,100 @@ class Report(BaseModel):
         if advice:
             self.ai_advice = advice
 
+    @classmethod
+    def record_image_variants(cls, image_url, variants):
+        """Attach processed image variants to every report still showing the image"""
+        reports = cls.query.filter_by(image_url=image_url).all()
+        for report in reports:
+            report.image_variants = variants
+        db.session.commit()
+        return len(reports)
+
+    @classmethod
+    def public_reports_query(cls, status='active'):
+        """Base query for public reports with list relations eager loaded"""
+        return cls.query.options(*cls.list_options())\
+                        .filter_by(is_public=True, status=status)
+
+    @classmethod
+    def user_reports_query(cls, user_id, public_only=False):
+        """Base query for a user's reports with list relations eager loaded"""
+        query = cls.query.options(*cls.list_options()).filter_by(user_id=user_id)
+        if public_only:
+            query = query.filter_by(is_public=True, status='active')
+        return query
+
     @classmethod
     def get_public_reports(cls, limit=20, offset=0, status='active'):
         """Get public reports with pagination"""
-        return cls.query.filter_by(is_public=True, status=status)\
-                        .order_by(cls.created_at.desc())\
-                        .limit(limit)\
-                        .offset(offset)\
-                        .all()
+        return cls.public_reports_query(status)\
+                  .order_by(cls.created_at.desc(), cls.id.desc())\
+                  .limit(limit)\
+                  .offset(offset)\
+                  .all()
 
     @classmethod
     def get_by_user(cls, user_id, limit=20, offset=0):
         """Get reports by user"""
-        return cls.query.filter_by(user_id=user_id)\
-                        .order_by(cls.created_at.desc())\
-                        .limit(limit)\
-                        .offset(offset)\
-                        .all()
+        return cls.user_reports_query(user_id)\
+                  .order_by(cls.created_at.desc(), cls.id.desc())\
+                  .limit(limit)\
+                  .offset(offset)\
+                  .all()
 
     @classmethod
-    def get_by_location(cls, latitude, longitude, radius_km=10):
-        """Get reports within a radius of given coordinates"""
-        # Simple bounding box calculation (for more accuracy, use PostGIS)
-        lat_range = radius_km / 111.0  # Rough conversion
-        import math
-        lat_radians = math.radians(latitude)
-        lng_range = radius_km / (111.0 * max(abs(math.cos(lat_radians)), 0.01))
-        
-        return cls.query.filter(
-            cls.latitude.between(latitude - lat_range, latitude + lat_range),
-            cls.longitude.between(longitude - lng_range, longitude + lng_range),
+    def get_by_location(cls, latitude, longitude, radius_km=10, limit=50, after=None):
+        """Get public reports within a radius, nearest first.
+
+        Candidates are limited by the indexed geohash prefixes and the
+        latitude/longitude bounding box covering the circle; the haversine
+        distance, its ordering and the cursor are evaluated in SQL so only
+        one page of rows is read. Returns a list of (report, distance_km)
+        pairs and whether more results follow. ``after`` is the
+        (distance_km, id) key of the last result already seen.
+        """
+        cell_filters = [
+            db.and_(cls.geohash >= cell, cls.geohash < cell + GEOHASH_RANGE_END)
+            for cell in cells_for_radius(latitude, longitude, radius_km)
+        ]
+        box_filters = [
+            db.and_(cls.latitude.between(min_lat, max_lat), cls.longitude.between(min_lng, max_lng))
+            for min_lat, min_lng, max_lat, max_lng in bounding_box(latitude, longitude, radius_km)
+        ]
+        distance = haversine_km_sql(latitude, longitude, cls.latitude, cls.longitude).label('distance_km')
+        query = db.session.query(cls.id, distance).filter(
+            db.or_(*cell_filters),
+            db.or_(*box_filters),
             cls.is_public == True,
-            cls.status == 'active'
-        ).all()
+            cls.status == 'active',
+            distance <= radius_km
+        )
+        if after is not None:
+            after_distance, after_id = after
+            query = query.filter(db.or_(distance > after_distance,
+                                        db.and_(distance == after_distance, cls.id > after_id)))
+        matches = query.order_by(distance, cls.id).limit(limit + 1).all()
+
+        has_more = len(matches) > limit
+        matches = matches[:limit]
+
+        reports = {
+            report.id: report
+            for report in cls.query.options(*cls.list_options())
+                                   .filter(cls.id.in_([report_id for report_id, _ in matches]))
+        } if matches else {}
+
+        return [(reports[report_id], distance_km) for report_id, distance_km in matches], has_more
 
     def __repr__(self):
-        return f'<Report {self.title}>'
\ No newline at end of file
+        return f'<Report {self.title}>'
+
+
+@event.listens_for(Report, 'before_insert')
+@event.listens_for(Report, 'before_update')
+def _sync_geohash(mapper, connection, target):
+    """Keep the geohash cell in step with the coordinates"""
+    if target.latitude is not None and target.longitude is not None:
+        target.geohash = encode_geohash(float(target.latitude), float(target.longitude))
+    else:
+        target.geohash = None
@@ -0,0 +1,128 @@
+"""Full-text search over report titles and descriptions.
+
+SQLite uses an external-content FTS5 table kept in sync by triggers;
+PostgreSQL uses a generated, GIN-indexed ``tsvector`` column. Both are
+created alongside the ``reports`` table, so the index follows every insert,
+update and delete without application code.
+"""
+import html
+import re
+
+from sqlalchemy import DDL, event, text
+
+from app.database import db
+from app.models.report import Report
+
+# Private-use markers survive the database untouched and are swapped for
+# <mark> tags after the snippet text has been HTML-escaped.
+HIGHLIGHT_START = '\ue000'
+HIGHLIGHT_END = '\ue001'
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5("
+    "title, description, content='reports', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS reports_fts_ai AFTER INSERT ON reports BEGIN "
+    "INSERT INTO reports_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS reports_fts_ad AFTER DELETE ON reports BEGIN "
+    "INSERT INTO reports_fts(reports_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS reports_fts_au AFTER UPDATE OF title, description ON reports BEGIN "
+    "INSERT INTO reports_fts(reports_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO reports_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+]
+
+POSTGRES_DDL = [
+    "ALTER TABLE reports ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_reports_search_vector ON reports USING GIN (search_vector)",
+]
+
+for statement in SQLITE_DDL:
+    event.listen(Report.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+for statement in POSTGRES_DDL:
+    event.listen(Report.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+event.listen(Report.__table__, 'before_drop',
+             DDL('DROP TABLE IF EXISTS reports_fts').execute_if(dialect='sqlite'))
+
+
+def _fts5_query(query):
+    """Turn free text into an FTS5 expression matching all terms, the last as a prefix"""
+    terms = re.findall(r'\w+', query, re.UNICODE)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def highlight(snippet):
+    """HTML-escape a snippet and wrap matched terms in <mark> tags"""
+    if snippet is None:
+        return None
+    escaped = html.escape(snippet, quote=False)
+    return escaped.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+
+
+def _search_sqlite(query, status, limit, offset):
+    match = _fts5_query(query)
+    if match is None:
+        return []
+    return db.session.execute(text(
+        "SELECT reports.id, -bm25(reports_fts, 10.0, 1.0) AS score, "
+        "snippet(reports_fts, 0, :start, :end, '…', 12) AS title, "
+        "snippet(reports_fts, 1, :start, :end, '…', 24) AS description "
+        "FROM reports_fts JOIN reports ON reports.id = reports_fts.rowid "
+        "WHERE reports_fts MATCH :match AND reports.is_public = 1 AND reports.status = :status "
+        "ORDER BY bm25(reports_fts, 10.0, 1.0), reports.id DESC "
+        "LIMIT :limit OFFSET :offset"
+    ), {
+        'match': match, 'status': status, 'limit': limit, 'offset': offset,
+        'start': HIGHLIGHT_START, 'end': HIGHLIGHT_END
+    }).fetchall()
+
+
+def _search_postgres(query, status, limit, offset):
+    options = f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}'
+    # Rank and paginate first so ts_headline only runs on the returned page
+    return db.session.execute(text(
+        "SELECT page.id, page.score, "
+        "ts_headline('english', reports.title, page.query, :title_options) AS title, "
+        "ts_headline('english', reports.description, page.query, :description_options) AS description "
+        "FROM (SELECT reports.id, ts_rank_cd(reports.search_vector, query) AS score, query "
+        "      FROM reports, websearch_to_tsquery('english', :query) AS query "
+        "      WHERE reports.search_vector @@ query AND reports.is_public AND reports.status = :status "
+        "      ORDER BY score DESC, reports.id DESC LIMIT :limit OFFSET :offset) AS page "
+        "JOIN reports ON reports.id = page.id "
+        "ORDER BY page.score DESC, page.id DESC"
+    ), {
+        'query': query, 'status': status, 'limit': limit, 'offset': offset,
+        'title_options': f'{options}, HighlightAll=true',
+        'description_options': f'{options}, MaxWords=35, MinWords=15'
+    }).fetchall()
+
+
+def search_reports(query, status='active', limit=20, offset=0):
+    """Rank public reports matching free text.
+
+    Returns (report, score, highlights) tuples, best match first.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        rows = _search_postgres(query, status, limit, offset)
+    else:
+        rows = _search_sqlite(query, status, limit, offset)
+
+    if not rows:
+        return []
+
+    reports = {
+        report.id: report
+        for report in Report.query.options(*Report.list_options())
+                                  .filter(Report.id.in_([row.id for row in rows]))
+    }
+    return [
+        (reports[row.id], row.score, {'title': highlight(row.title), 'description': highlight(row.description)})
+        for row in rows if row.id in reports
+    ]
@@ -0,0 +1,166 @@
+"""Content-addressed upload storage.
+
+Uploads are stored once per SHA-256 of their bytes under sharded
+``ab/cd/<sha256>.<ext>`` paths. ``ref_count`` tracks how many reports point
+at each file and is maintained on flush like the other denormalized
+counters; unreferenced files are removed by ``prune_stored_files``.
+"""
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, inspect, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.database import db
+from app.models.report import Report
+
+STORED_URL_PATTERN = re.compile(r'^/uploads/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.\w+$')
+# A stored upload or one of its derivatives
+CONTENT_NAME_PATTERN = re.compile(r'^([0-9a-f]{64})[.-]')
+
+
+def stored_file_sha(url):
+    """Return the SHA-256 a content-addressed upload URL points at, or None"""
+    match = STORED_URL_PATTERN.match(url or '')
+    return match.group(1) if match else None
+
+
+class StoredFile(db.Model):
+    """One stored upload and the number of reports referencing it"""
+    __tablename__ = 'stored_files'
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    path = db.Column(db.String(255), nullable=False)  # Relative to UPLOAD_FOLDER
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    variants = db.Column(db.JSON)  # Derivatives rendered by the image pipeline
+    uploaded_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Latest upload
+
+    @property
+    def url(self):
+        return f'/uploads/{self.path}'
+
+    @classmethod
+    def register(cls, sha256, path, size):
+        """Record an upload; returns the row and whether this call created it.
+
+        Re-uploading an unreferenced file restarts its grace period.
+        """
+        table = cls.__table__
+        now = datetime.utcnow()
+        connection = db.session.connection()
+        dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+        created = connection.execute(
+            dialect.insert(table)
+            .values(sha256=sha256, path=path, size=size, ref_count=0, uploaded_at=now)
+            .on_conflict_do_nothing(index_elements=['sha256'])
+        ).rowcount == 1
+        if not created:
+            connection.execute(
+                update(table).where(table.c.sha256 == sha256, table.c.ref_count <= 0).values(uploaded_at=now)
+            )
+        return db.session.get(cls, sha256), created
+
+    @classmethod
+    def record_variants(cls, image_url, variants):
+        """Store rendered derivatives for reuse by later uploads of the same content"""
+        sha256 = stored_file_sha(image_url)
+        stored = db.session.get(cls, sha256) if sha256 else None
+        if stored is not None:
+            stored.variants = variants
+        return Report.record_image_variants(image_url, variants)
+
+    def __repr__(self):
+        return f'<StoredFile {self.path}: {self.ref_count} refs>'
+
+
+def prune_stored_files(upload_folder, grace=timedelta(days=1)):
+    """Delete unreferenced uploads older than the grace period, with their derivatives.
+
+    Files left on disk without a row, by an upload whose transaction rolled
+    back, are deleted once they are older than the grace period too.
+    """
+    cutoff = datetime.utcnow() - grace
+    removed = 0
+    candidates = db.session.query(StoredFile.sha256, StoredFile.path)\
+                           .filter(StoredFile.ref_count <= 0, StoredFile.uploaded_at < cutoff).all()
+    for sha256, path in candidates:
+        # Claim the row first so a file referenced or re-uploaded meanwhile is kept
+        claimed = db.session.execute(
+            StoredFile.__table__.delete()
+            .where(StoredFile.sha256 == sha256, StoredFile.ref_count <= 0, StoredFile.uploaded_at < cutoff)
+        ).rowcount
+        db.session.commit()
+        if not claimed:
+            continue
+
+        _remove_content(os.path.join(upload_folder, os.path.dirname(path)), sha256)
+        removed += 1
+
+    for directory, sha256 in _orphaned_content(upload_folder, time.time() - grace.total_seconds()):
+        _remove_content(directory, sha256)
+        removed += 1
+    return removed
+
+
+def _remove_content(directory, sha256):
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.startswith(sha256):
+                os.unlink(os.path.join(directory, name))
+
+
+def _orphaned_content(upload_folder, cutoff):
+    """(directory, sha256) of stored content last written before ``cutoff`` (epoch seconds) that has no row"""
+    # Uploads of existing content touch the file, so a recent mtime marks a
+    # row that may still be committing
+    found = {}
+    for directory, _, names in os.walk(upload_folder):
+        for name in names:
+            match = CONTENT_NAME_PATTERN.match(name)
+            if match and os.path.getmtime(os.path.join(directory, name)) < cutoff:
+                found.setdefault(match.group(1), directory)
+    if not found:
+        return []
+    known = set()
+    shas = list(found)
+    for start in range(0, len(shas), 500):
+        known.update(sha for sha, in db.session.query(StoredFile.sha256)
+                     .filter(StoredFile.sha256.in_(shas[start:start + 500])))
+    db.session.rollback()
+    return [(directory, sha256) for sha256, directory in found.items() if sha256 not in known]
+
+
+@event.listens_for(Session, 'after_flush')
+def _count_file_references(session, flush_context):
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Report):
+            deltas[stored_file_sha(obj.image_url)] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Report):
+            deltas[stored_file_sha(obj.image_url)] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, Report) and obj not in session.deleted:
+            history = inspect(obj).attrs.image_url.history
+            if history.has_changes():
+                for url in history.deleted:
+                    deltas[stored_file_sha(url)] -= 1
+                for url in history.added:
+                    deltas[stored_file_sha(url)] += 1
+
+    table = StoredFile.__table__
+    connection = session.connection()
+    for sha256, amount in deltas.items():
+        if sha256 and amount:
+            connection.execute(
+                update(table).where(table.c.sha256 == sha256).values(ref_count=table.c.ref_count + amount)
+            )
+            instance = session.identity_map.get(inspect(StoredFile).identity_key_from_primary_key((sha256,)))
+            if instance is not None and 'ref_count' in inspect(instance).dict:
+                set_committed_value(instance, 'ref_count', instance.ref_count + amount)
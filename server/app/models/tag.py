@@ -3,11 +3,16 @@ from app.database import db, BaseModel
 
 class Tag(BaseModel):
     __tablename__ = 'tags'
+    __table_args__ = (
+        db.Index('ix_tags_active_name', 'is_active', 'name'),
+        db.Index('ix_tags_reports_count', 'reports_count'),
+    )
     
     name = db.Column(db.String(50), unique=True, nullable=False)
     description = db.Column(db.String(200))
     color = db.Column(db.String(7), default='#007bff')  # Hex color code
     is_active = db.Column(db.Boolean, default=True)
+    reports_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
     
     def __init__(self, name, description=None, color='#007bff'):
         self.name = name.lower().strip()  # Normalize tag names
@@ -22,7 +27,7 @@ class Tag(BaseModel):
             'description': self.description,
             'color': self.color,
             'is_active': self.is_active,
-            'reports_count': self.reports.count(),
+            'reports_count': self.reports_count,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
     
@@ -41,12 +46,8 @@ class Tag(BaseModel):
     @classmethod
     def get_popular_tags(cls, limit=10):
         """Get most popular tags by report count"""
-        from app.models.report import report_tags
-        
-        return db.session.query(cls)\
-                        .join(report_tags)\
-                        .group_by(cls.id)\
-                        .order_by(db.func.count(report_tags.c.report_id).desc())\
+        return cls.query.filter(cls.reports_count > 0)\
+                        .order_by(cls.reports_count.desc(), cls.id)\
                         .limit(limit)\
                         .all()
     
@@ -14,6 +14,10 @@ class User(BaseModel):
     avatar_url = db.Column(db.String(500))
     is_active = db.Column(db.Boolean, default=True)
     is_verified = db.Column(db.Boolean, default=False)
+
+    # Denormalized counters, maintained on write by app.models.counters
+    reports_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    comments_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
     
     reports = db.relationship('Report', backref='author', lazy='dynamic', cascade='all, delete-orphan')
     comments = db.relationship('Comment', backref='author', lazy='dynamic', cascade='all, delete-orphan')
@@ -45,8 +49,8 @@ class User(BaseModel):
             'avatar_url': self.avatar_url,
             'is_verified': self.is_verified,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'reports_count': self.reports.count(),
-            'comments_count': self.comments.count()
+            'reports_count': self.reports_count,
+            'comments_count': self.comments_count
         }
 
         if include_email or include_sensitive:
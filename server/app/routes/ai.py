@@ -1,13 +1,48 @@
-from flask import Blueprint, request, jsonify
+import json
+
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from marshmallow import ValidationError
 
 from app.models.report import Report
 from app.services.ai_service import AIService
+from app.services.ai_cache import ai_cache
+from app.services.ai_gateway import ai_gateway
+from app.services.green_catalog import green_catalog
 from app.middleware.auth import auth_required
 
 ai_bp = Blueprint('ai', __name__)
 
 
+def _sse(event, data):
+    """One Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _event_stream(start, events, **context):
+    """Stream service events as SSE; ``context`` is echoed in the first and last message.
+
+    Clients should close the connection after the ``done`` event, otherwise
+    EventSource reconnects and starts a new generation.
+    """
+    def generate():
+        # Sent before the model is called so headers and a first byte go out at once
+        yield _sse('start', dict(start, **context))
+        try:
+            for event, data in events:
+                if event == 'token':
+                    yield _sse('token', {'text': data})
+                else:
+                    yield _sse(event, dict(data, **context))
+        except Exception as e:
+            yield _sse('error', {'error': 'Stream failed', 'message': str(e)})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Stop reverse proxies from buffering the stream
+        'X-Accel-Buffering': 'no'
+    })
+
+
 @ai_bp.route('/analyze-report/<int:report_id>', methods=['POST'])
 @auth_required
 def analyze_report(report_id, current_user):
@@ -20,6 +55,20 @@ def analyze_report(report_id, current_user):
             return jsonify({'error': 'Permission denied'}), 403
 
         ai_service = AIService()
+
+        # Nothing the analysis depends on changed since it was stored
+        if request.args.get('force', 'false').lower() != 'true' and ai_service.is_analysis_current(report):
+            return jsonify({
+                'message': 'Report analysis is up to date',
+                'analysis': {
+                    'category': report.ai_category,
+                    'confidence': report.ai_confidence,
+                    'advice': report.ai_advice
+                },
+                'cached': True,
+                'report': report.to_dict()
+            }), 200
+
         result = ai_service.analyze_report(report)
         
         if result:
@@ -27,13 +76,17 @@ def analyze_report(report_id, current_user):
             report.mark_ai_processed(
                 category=result.get('category'),
                 confidence=result.get('confidence'),
-                advice=result.get('advice')
+                advice=result.get('advice'),
+                input_hash=result.pop('input_hash', None),
+                model=result.pop('model', None),
+                prompt_version=result.pop('prompt_version', None)
             )
             report.save()
             
             return jsonify({
                 'message': 'Report analyzed successfully',
                 'analysis': result,
+                'cached': False,
                 'report': report.to_dict()
             }), 200
         else:
@@ -45,19 +98,36 @@ def analyze_report(report_id, current_user):
 
 @ai_bp.route('/green-advice', methods=['GET'])
 def get_green_advice():
-    """Get AI-generated green advice and actions"""
+    """Get green actions for a category from the catalog"""
     try:
         category = request.args.get('category', 'general')
         location = request.args.get('location')
+        advice = green_catalog.get().advice(category, request.args.get('difficulty'))
 
-        ai_service = AIService()
-        advice = ai_service.generate_green_advice(category=category, location=location)
+        # The body only varies with the query string, so the catalog entry identifies it
+        if request.if_none_match.contains(advice.etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = current_app.response_class(advice.body(category, location), mimetype='application/json')
+        response.set_etag(advice.etag)
+        response.headers['Cache-Control'] = 'public, max-age=300'
+        return response
 
-        return jsonify({
-            'advice': advice,
-            'category': category,
-            'location': location
-        }), 200
+    except Exception as e:
+        return jsonify({'error': 'Failed to generate advice', 'message': str(e)}), 500
+
+
+@ai_bp.route('/green-advice/stream', methods=['GET'])
+def stream_green_advice():
+    """Stream AI advice for an environmental issue as Server-Sent Events"""
+    try:
+        category = request.args.get('category', 'general')
+        title = request.args.get('title', '')
+        description = request.args.get('description', '')
+        location = request.args.get('location')
+
+        events = AIService().stream_advice(category, title, description, location)
+        return _event_stream({'kind': 'advice'}, events, category=category, location=location)
 
     except Exception as e:
         return jsonify({'error': 'Failed to generate advice', 'message': str(e)}), 500
@@ -93,6 +163,25 @@ def generate_task():
         return jsonify({'error': 'Failed to generate task', 'message': str(e)}), 500
 
 
+@ai_bp.route('/generate-task/stream', methods=['GET', 'POST'])
+def stream_generate_task():
+    """Stream a new AI-powered green task as Server-Sent Events"""
+    try:
+        if request.method == 'GET':
+            params = request.args
+        else:
+            params = request.get_json(silent=True) or {}
+        category = params.get('category', 'general')
+        difficulty = params.get('difficulty')
+        location = params.get('location')
+
+        events = AIService().stream_green_task(category=category, difficulty=difficulty, location=location)
+        return _event_stream({'kind': 'task'}, events, category=category, difficulty=difficulty, location=location)
+
+    except Exception as e:
+        return jsonify({'error': 'Failed to generate task', 'message': str(e)}), 500
+
+
 @ai_bp.route('/categorize-text', methods=['POST'])
 @auth_required
 def categorize_text(current_user):
@@ -117,17 +206,62 @@ def categorize_text(current_user):
         return jsonify({'error': 'Failed to categorize text', 'message': str(e)}), 500
 
 
+@ai_bp.route('/categorize-batch', methods=['POST'])
+@auth_required
+def categorize_batch(current_user):
+    """Categorize many environmental texts in as few AI calls as possible"""
+    try:
+        json_data = request.get_json(silent=True) or {}
+        texts = json_data.get('texts')
+        max_texts = current_app.config['AI_BATCH_MAX_TEXTS']
+        if not isinstance(texts, list) or not texts:
+            return jsonify({'error': 'Texts are required'}), 400
+        if len(texts) > max_texts:
+            return jsonify({'error': f'At most {max_texts} texts per request'}), 400
+        if not all(isinstance(text, str) and text.strip() for text in texts):
+            return jsonify({'error': 'Every text must be a non-empty string'}), 400
+
+        ai_service = AIService()
+        results, prompts = ai_service.categorize_batch(
+            texts,
+            token_budget=current_app.config['AI_BATCH_TOKEN_BUDGET'],
+            max_items_per_prompt=current_app.config['AI_BATCH_MAX_ITEMS_PER_PROMPT']
+        )
+
+        return jsonify({
+            'results': [dict(result, index=index, text=text)
+                        for index, (text, result) in enumerate(zip(texts, results))],
+            'total': len(results),
+            'ai_calls': prompts
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': 'Failed to categorize texts', 'message': str(e)}), 500
+
+
 @ai_bp.route('/health', methods=['GET'])
 def health_check():
     """Health check for AI service"""
     try:
         ai_service = AIService()
         is_healthy = ai_service.health_check()
+        gateway = ai_gateway.status()
+
+        # With the breaker open requests are still answered from fallbacks
+        if is_healthy and gateway['breaker']['state'] != 'closed':
+            status, message = 'degraded', 'AI provider failing; serving fallback results'
+        elif is_healthy:
+            status, message = 'healthy', 'AI service is running'
+        else:
+            status, message = 'unhealthy', 'AI service unavailable'
         
         return jsonify({
-            'status': 'healthy' if is_healthy else 'unhealthy',
+            'status': status,
             'service': 'ai',
-            'message': 'AI service is running' if is_healthy else 'AI service unavailable'
+            'message': message,
+            'breaker': gateway['breaker'],
+            'concurrency': gateway['concurrency'],
+            'cache': ai_cache.get_stats()
         }), 200 if is_healthy else 503
 
     except Exception as e:
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from marshmallow import ValidationError
 
 from app.database import db
@@ -36,6 +36,8 @@ def create_comment(current_user):
             parent_comment = Comment.query.get_or_404(data['parent_id'])
             if parent_comment.report_id != data['report_id']:
                 return jsonify({'error': 'Parent comment not in same report'}), 400
+            if parent_comment.depth >= current_app.config['COMMENT_MAX_DEPTH']:
+                return jsonify({'error': 'Maximum reply depth reached'}), 400
 
         # Create comment
         comment = Comment(
@@ -65,7 +67,8 @@ def get_comment(comment_id):
         comment = Comment.query.get_or_404(comment_id)
         
         return jsonify({
-            'comment': comment.to_dict(include_author=True, include_replies=True)
+            'comment': comment.to_dict(include_author=True, include_replies=True,
+                                       max_depth=current_app.config['COMMENT_MAX_DEPTH'])
         }), 200
 
     except Exception as e:
@@ -127,7 +130,7 @@ def delete_comment(comment_id, current_user):
 
 @comments_bp.route('/report/<int:report_id>', methods=['GET'])
 def get_report_comments(report_id):
-    """Get all comments for a report"""
+    """Get a page of comment threads for a report"""
     try:
         report = Report.query.get_or_404(report_id)
         
@@ -136,13 +139,19 @@ def get_report_comments(report_id):
             return jsonify({'error': 'Report not found'}), 404
 
         include_replies = request.args.get('include_replies', 'true').lower() == 'true'
-        comments = Comment.get_by_report(report_id, include_replies=include_replies)
+        threads, pagination = Comment.get_thread_page(
+            report_id,
+            page=max(request.args.get('page', 1, type=int), 1),
+            per_page=min(max(request.args.get('per_page', 20, type=int), 1), 100),
+            include_replies=include_replies,
+            max_depth=current_app.config['COMMENT_MAX_DEPTH']
+        )
         
         return jsonify({
-            'comments': [comment.to_dict(include_author=True, include_replies=include_replies) 
-                        for comment in comments],
+            'comments': threads,
             'report_id': report_id,
-            'total_comments': report.comments.count()
+            'total_comments': report.comments_count,
+            'pagination': pagination
         }), 200
 
     except Exception as e:
@@ -6,6 +6,7 @@ from app.models.report import Report
 from app.models.comment import Comment
 from app.schemas.user import user_update_schema
 from app.database import db
+from app.utils.http_cache import ConditionalGet
 from sqlalchemy import func
 
 profile_bp = Blueprint('profile', __name__, url_prefix='/api/profile')
@@ -16,9 +17,14 @@ profile_bp = Blueprint('profile', __name__, url_prefix='/api/profile')
 def get_profile(current_user):
     """Get user's profile, impact, and activity summary"""
     try:
+        cache = ConditionalGet([f'user:{current_user.id}'], cache_control='private, no-cache',
+                               user_id=current_user.id)
+        if cache.is_fresh():
+            return cache.not_modified()
+
         # Basic stats
-        reports_count = Report.query.filter_by(user_id=current_user.id).count()
-        comments_count = Comment.query.filter_by(user_id=current_user.id).count()
+        reports_count = current_user.reports_count
+        comments_count = current_user.comments_count
         public_reports_count = Report.query.filter_by(user_id=current_user.id, is_public=True).count()
 
         # Top category (most reported AI classification)
@@ -86,7 +92,7 @@ def get_profile(current_user):
             }
         }
 
-        return jsonify({'profile': profile_data}), 200
+        return cache.apply(jsonify({'profile': profile_data})), 200
 
     except Exception as e:
         import traceback
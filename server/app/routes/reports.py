@@ -1,12 +1,24 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from marshmallow import ValidationError
+from werkzeug.exceptions import RequestEntityTooLarge
 
 from app.database import db
 from app.models.report import Report
 from app.models.tag import Tag
+from app.models.comment import Comment
+from app.models.search import search_reports
+from app.models.stored_file import StoredFile
+from app.models.ai_job import AIJob
 from app.schemas.report import ReportCreateSchema, ReportUpdateSchema
 from app.middleware.auth import auth_required, optional_auth
-from app.services.ai_service import AIService
+from app.services.tile_service import build_tile
+from app.services.image_service import image_pipeline
+from app.utils.tile_cache import tile_cache
+from app.utils.http_cache import ConditionalGet
+from app.utils.file_upload import save_uploaded_file
+from app.utils.pagination import (
+    keyset_paginate, encode_distance_cursor, decode_distance_cursor, InvalidCursorError
+)
 
 reports_bp = Blueprint('reports', __name__)
 
@@ -15,29 +27,52 @@ report_create_schema = ReportCreateSchema()
 report_update_schema = ReportUpdateSchema()
 
 
+def paginate_reports(query):
+    """Paginate a report query by page number, or by keyset cursor when ?cursor= is given"""
+    per_page = min(request.args.get('per_page', 20, type=int), 100)
+    cursor = request.args.get('cursor')
+
+    if cursor is not None:
+        reports, pagination = keyset_paginate(query, Report, cursor, per_page)
+        if request.args.get('include_total', 'false').lower() == 'true':
+            pagination['total'] = query.order_by(None).count()
+        return reports, pagination
+
+    page = request.args.get('page', 1, type=int)
+    total = query.order_by(None).count()
+    reports = query.order_by(Report.created_at.desc(), Report.id.desc())\
+                   .limit(per_page)\
+                   .offset((page - 1) * per_page)\
+                   .all()
+
+    return reports, {
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': (total + per_page - 1) // per_page
+    }
+
+
 @reports_bp.route('', methods=['GET'])
 @optional_auth
 def get_reports(current_user=None):
-    """Get all public reports with pagination"""
+    """Get all public reports with page or cursor pagination"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 20, type=int), 100)
+        cache = ConditionalGet(['reports', 'users', 'tags'])
+        if cache.is_fresh():
+            return cache.not_modified()
+
         status = request.args.get('status', 'active')
-        
-        offset = (page - 1) * per_page
-        
-        reports = Report.get_public_reports(limit=per_page, offset=offset, status=status)
-        
-        return jsonify({
-            'reports': [report.to_dict(include_author=True) for report in reports],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': Report.query.filter_by(is_public=True, status=status).count(),
-                'pages': (Report.query.filter_by(is_public=True, status=status).count() + per_page - 1) // per_page
-            }
-        }), 200
 
+        reports, pagination = paginate_reports(Report.public_reports_query(status))
+
+        return cache.apply(jsonify({
+            'reports': Report.to_dict_many(reports, include_author=True),
+            'pagination': pagination
+        })), 200
+
+    except InvalidCursorError as e:
+        return jsonify({'error': 'Invalid cursor', 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'error': 'Failed to get reports', 'message': str(e)}), 500
 
@@ -47,6 +82,9 @@ def get_reports(current_user=None):
 def create_report(current_user):
     """Create a new report"""
     try:
+        image_url = None
+        upload = stored_file = None
+
         # Handle multipart form data (for file uploads)
         if request.content_type and 'multipart/form-data' in request.content_type:
             # Handle multipart form data (for file uploads)
@@ -59,13 +97,18 @@ def create_report(current_user):
             severity = request.form.get('severity', 'medium')
             tags = request.form.get('tags', '').split(',') if request.form.get('tags') else []
 
-            # Handle file upload
-            image_url = None
+            # Handle file upload; the image is already on disk and hashed, and
+            # content that is already stored is reused without writing it again
             if 'image' in request.files:
                 file = request.files['image']
                 if file and file.filename:
-                    from app.utils.file_upload import upload_file
-                    image_url = upload_file(file)
+                    upload, message = save_uploaded_file(
+                        file, current_app.config['UPLOAD_FOLDER'], current_app.config['MAX_FILE_SIZE']
+                    )
+                    if not upload:
+                        return jsonify({'error': 'Invalid image', 'message': message}), 400
+                    image_url = upload['url']
+                    stored_file, _ = StoredFile.register(upload['sha256'], upload['filename'], upload['size'])
 
             data = {
                 'title': title,
@@ -96,9 +139,18 @@ def create_report(current_user):
             is_public=data.get('is_public', True),
             severity=data.get('severity', 'medium')
         )
+        if stored_file is not None and stored_file.variants:
+            report.image_variants = stored_file.variants
 
+        # Queue AI analysis for the worker; clients poll ai_status
+        AIJob.enqueue(report, max_attempts=current_app.config['AI_JOB_MAX_ATTEMPTS'])
         report.save()
 
+        # Resize, strip and convert a photo off the request path until its
+        # stored file has variants, so a failed run is retried by the next upload
+        if stored_file is not None and not stored_file.variants:
+            image_pipeline.submit(upload['filename'])
+
         # Add tags if provided
         if 'tags' in data and data['tags']:
             for tag_name in data['tags']:
@@ -106,20 +158,6 @@ def create_report(current_user):
                 report.add_tag(tag)
             db.session.commit()
 
-        # Process with AI if enabled
-        try:
-            ai_service = AIService()
-            ai_result = ai_service.analyze_report(report)
-            if ai_result:
-                report.mark_ai_processed(
-                    category=ai_result.get('category'),
-                    confidence=ai_result.get('confidence'),
-                    advice=ai_result.get('advice')
-                )
-                db.session.commit()
-        except Exception as ai_error:
-            # AI processing failed, but report creation succeeded
-            pass
 
         return jsonify({
             'message': 'Report created successfully',
@@ -128,6 +166,8 @@ def create_report(current_user):
 
     except ValidationError as err:
         return jsonify({'error': 'Validation failed', 'details': err.messages}), 400
+    except RequestEntityTooLarge as e:
+        return jsonify({'error': 'File too large', 'message': e.description}), 413
     except Exception as e:
         print(f"Error creating report: {str(e)}")  # Debug logging
         import traceback
@@ -147,9 +187,24 @@ def get_report(report_id, current_user=None):
         if not report.is_public and (not current_user or current_user.id != report.user_id):
             return jsonify({'error': 'Report not found'}), 404
 
-        return jsonify({
-            'report': report.to_dict(include_author=True, include_comments=True)
-        }), 200
+        # The embedded author's counters change with user:<id>, not users
+        scopes = [f'report:{report.id}', f'user:{report.user_id}', 'users', 'tags']
+        if report.is_public:
+            cache = ConditionalGet(scopes)
+        else:
+            cache = ConditionalGet(scopes, cache_control='private, no-cache', user_id=current_user.id)
+        if cache.is_fresh():
+            return cache.not_modified()
+
+        data = report.to_dict(include_author=True)
+        data['comments'], data['comments_pagination'] = Comment.get_thread_page(
+            report.id,
+            page=max(request.args.get('comments_page', 1, type=int), 1),
+            per_page=min(max(request.args.get('comments_per_page', 20, type=int), 1), 100),
+            max_depth=current_app.config['COMMENT_MAX_DEPTH']
+        )
+
+        return cache.apply(jsonify({'report': data})), 200
 
     except Exception as e:
         return jsonify({'error': 'Failed to get report', 'message': str(e)}), 500
@@ -227,30 +282,19 @@ def delete_report(report_id, current_user):
 def get_user_reports(user_id, current_user=None):
     """Get reports by a specific user"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 20, type=int), 100)
-
-        offset = (page - 1) * per_page
-
         # If viewing own reports, show all; otherwise show only public
-        if current_user and current_user.id == user_id:
-            reports = Report.get_by_user(user_id, limit=per_page, offset=offset)
-            total = Report.query.filter_by(user_id=user_id).count()
-        else:
-            reports = Report.query.filter_by(user_id=user_id, is_public=True, status='active')\
-                                  .order_by(Report.created_at.desc())\
-                                  .limit(per_page).offset(offset).all()
-            total = Report.query.filter_by(user_id=user_id, is_public=True, status='active').count()
+        own_reports = current_user is not None and current_user.id == user_id
+        query = Report.user_reports_query(user_id, public_only=not own_reports)
+
+        reports, pagination = paginate_reports(query)
 
         return jsonify({
-            'reports': [report.to_dict(include_author=True) for report in reports],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total
-            }
+            'reports': Report.to_dict_many(reports, include_author=True),
+            'pagination': pagination
         }), 200
 
+    except InvalidCursorError as e:
+        return jsonify({'error': 'Invalid cursor', 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'error': 'Failed to get user reports', 'message': str(e)}), 500
 
@@ -260,46 +304,110 @@ def get_user_reports(user_id, current_user=None):
 def get_my_reports(current_user):
     """Get current user's reports"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 20, type=int), 100)
-
-        offset = (page - 1) * per_page
-
-        reports = Report.query.filter_by(user_id=current_user.id)\
-                              .order_by(Report.created_at.desc())\
-                              .limit(per_page).offset(offset).all()
-        total = Report.query.filter_by(user_id=current_user.id).count()
+        reports, pagination = paginate_reports(Report.user_reports_query(current_user.id))
 
         return jsonify({
-            'reports': [report.to_dict(include_author=True) for report in reports],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': total
-            }
+            'reports': Report.to_dict_many(reports, include_author=True),
+            'pagination': pagination
         }), 200
 
+    except InvalidCursorError as e:
+        return jsonify({'error': 'Invalid cursor', 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'error': 'Failed to get my reports', 'message': str(e)}), 500
 
 
 @reports_bp.route('/nearby', methods=['GET'])
 def get_nearby_reports():
-    """Get reports near a location"""
+    """Get public reports near a location, nearest first"""
     try:
         latitude = request.args.get('lat', type=float)
         longitude = request.args.get('lng', type=float)
-        radius = request.args.get('radius', 10, type=float)
-        
-        if not latitude or not longitude:
+        radius = min(request.args.get('radius', 10, type=float), 500)
+        limit = min(request.args.get('limit', 50, type=int), 200)
+        cursor = request.args.get('cursor')
+
+        if latitude is None or longitude is None:
             return jsonify({'error': 'Latitude and longitude are required'}), 400
+        if not -90 <= latitude <= 90 or not -180 <= longitude <= 180 or radius <= 0 or limit < 1:
+            return jsonify({'error': 'Invalid location parameters'}), 400
+
+        after = decode_distance_cursor(cursor) if cursor else None
+        results, has_more = Report.get_by_location(latitude, longitude, radius, limit=limit, after=after)
+
+        reports = Report.to_dict_many([report for report, _ in results], include_author=True)
+        for data, (_, distance) in zip(reports, results):
+            data['distance_km'] = round(distance, 3)
+
+        last_report, last_distance = results[-1] if results else (None, None)
 
-        reports = Report.get_by_location(latitude, longitude, radius)
-        
         return jsonify({
-            'reports': [report.to_dict(include_author=True) for report in reports],
-            'location': {'latitude': latitude, 'longitude': longitude, 'radius': radius}
+            'reports': reports,
+            'location': {'latitude': latitude, 'longitude': longitude, 'radius': radius},
+            'pagination': {
+                'limit': limit,
+                'has_next': has_more,
+                'next_cursor': encode_distance_cursor(last_distance, last_report.id) if has_more else None
+            }
         }), 200
 
+    except InvalidCursorError as e:
+        return jsonify({'error': 'Invalid cursor', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': 'Failed to get nearby reports', 'message': str(e)}), 500
+
+
+@reports_bp.route('/search', methods=['GET'])
+def search_public_reports():
+    """Full-text search over public reports, best match first"""
+    try:
+        query = request.args.get('q', '').strip()
+        status = request.args.get('status', 'active')
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+
+        if not query:
+            return jsonify({'error': 'Search query is required'}), 400
+        if len(query) > 200:
+            return jsonify({'error': 'Search query is too long'}), 400
+
+        results = search_reports(query, status=status, limit=per_page + 1, offset=(page - 1) * per_page)
+        has_next = len(results) > per_page
+        results = results[:per_page]
+
+        reports = Report.to_dict_many([report for report, _, _ in results], include_author=True)
+        for data, (_, score, highlights) in zip(reports, results):
+            data['score'] = round(float(score), 6)
+            data['highlights'] = highlights
+
+        return jsonify({
+            'reports': reports,
+            'query': query,
+            'pagination': {'page': page, 'per_page': per_page, 'has_next': has_next}
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': 'Failed to search reports', 'message': str(e)}), 500
+
+
+@reports_bp.route('/tiles/<int:z>/<int:x>/<int:y>', methods=['GET'])
+def get_report_tile(z, x, y):
+    """Get clustered report aggregates, or points at high zoom, for a map tile"""
+    try:
+        if z > 22 or x >= 1 << z or y >= 1 << z:
+            return jsonify({'error': 'Invalid tile coordinates'}), 400
+
+        body = tile_cache.get((z, x, y))
+        if body is None:
+            tile = build_tile(
+                z, x, y,
+                points_min_zoom=current_app.config.get('TILE_POINTS_MIN_ZOOM', 13),
+                max_points=current_app.config.get('TILE_MAX_POINTS', 1000)
+            )
+            body = current_app.json.dumps(tile)
+            tile_cache.set((z, x, y), body)
+
+        return current_app.response_class(body, mimetype='application/json'), 200
+
     except Exception as e:
-        return jsonify({'error': 'Failed to get nearby reports', 'message': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': 'Failed to get tile', 'message': str(e)}), 500
@@ -5,6 +5,7 @@ from app.database import db
 from app.models.tag import Tag
 from app.schemas.tag import TagCreateSchema, TagUpdateSchema
 from app.middleware.auth import auth_required
+from app.utils.http_cache import ConditionalGet
 
 tags_bp = Blueprint('tags', __name__)
 
@@ -47,13 +48,17 @@ def get_tags():
 def get_popular_tags():
     """Get most popular tags"""
     try:
+        cache = ConditionalGet(['tags'], cache_control='public, max-age=60')
+        if cache.is_fresh():
+            return cache.not_modified()
+
         limit = min(request.args.get('limit', 20, type=int), 50)
         
         tags = Tag.get_popular_tags(limit=limit)
         
-        return jsonify({
+        return cache.apply(jsonify({
             'tags': [tag.to_dict() for tag in tags]
-        }), 200
+        })), 200
 
     except Exception as e:
         return jsonify({'error': 'Failed to get popular tags', 'message': str(e)}), 500
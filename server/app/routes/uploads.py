@@ -0,0 +1,52 @@
+import mimetypes
+import os
+from urllib.parse import quote
+
+from flask import Blueprint, current_app, abort, request, send_from_directory
+from werkzeug.security import safe_join
+
+from app.services.image_service import SAVE_FORMATS, variant_name
+
+uploads_bp = Blueprint('uploads', __name__)
+
+
+def _accepts_webp():
+    """Whether the client lists WebP explicitly; */* alone is not taken as support"""
+    return any(value == 'image/webp' and quality > 0 for value, quality in request.accept_mimetypes)
+
+
+@uploads_bp.route('/<path:filename>', methods=['GET'])
+def serve_upload(filename):
+    """Serve an uploaded file with immutable caching, byte ranges and WebP negotiation"""
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    max_age = current_app.config['UPLOADS_CACHE_MAX_AGE']
+    accel_prefix = current_app.config.get('UPLOADS_ACCEL_REDIRECT')
+
+    # Image derivatives have a WebP sibling that is sent to clients that take
+    # it; originals never do, but every response for these types varies on
+    # Accept so caches never depend on when the sibling appeared
+    negotiated = filename.rsplit('.', 1)[-1].lower() in SAVE_FORMATS
+    if negotiated and _accepts_webp():
+        webp_path = safe_join(upload_folder, variant_name(filename, ext='webp'))
+        if webp_path is not None and os.path.isfile(webp_path):
+            filename = variant_name(filename, ext='webp')
+
+    if accel_prefix:
+        # The proxy streams the file, including ranges and validators
+        path = safe_join(upload_folder, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        response = current_app.response_class(
+            mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        )
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{quote(filename)}"
+    else:
+        # Conditional send_file answers Range and If-None-Match itself, and
+        # emits X-Sendfile instead of the body when USE_X_SENDFILE is set
+        response = send_from_directory(upload_folder, filename, max_age=max_age, conditional=True)
+        response.headers.setdefault('Accept-Ranges', 'bytes')
+
+    response.headers['Cache-Control'] = f'public, max-age={max_age}, immutable'
+    if negotiated:
+        response.vary.add('Accept')
+    return response
@@ -92,9 +92,9 @@ def get_user_stats(user_id, current_user=None):
         user = User.query.get_or_404(user_id)
         
         stats = {
-            'reports_count': user.reports.count(),
+            'reports_count': user.reports_count,
             'public_reports_count': user.reports.filter_by(is_public=True).count(),
-            'comments_count': user.comments.count(),
+            'comments_count': user.comments_count,
             'member_since': user.created_at.isoformat() if user.created_at else None
         }
         
@@ -0,0 +1,168 @@
+"""Bulk re-analysis of existing reports.
+
+``flask ai-backfill`` walks candidate reports in primary-key order, one
+batch at a time: the batch is read with a keyset query, analyzed on a
+bounded thread pool and written back in a single commit, after which the
+last report id is saved to a checkpoint file. An interrupted run picks
+up after the last committed batch as long as it is started with the same
+filters.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy import or_, select
+
+from app.database import db
+from app.models.report import Report
+from app.services.ai_gateway import AIUnavailable, ai_gateway
+from app.services.ai_service import AIService, prompt_version_label
+
+logger = logging.getLogger(__name__)
+
+# Columns the analysis reads; worker threads get plain snapshots, not ORM objects
+SNAPSHOT_COLUMNS = (Report.id, Report.title, Report.description, Report.location, Report.image_url)
+
+
+class AIBackfill:
+    """Re-analyzes reports that are unprocessed or were analyzed by another model or prompt"""
+
+    def __init__(self, app, concurrency=None, batch_size=100, checkpoint_path=None, model=None,
+                 prompt_version=None, since=None, until=None, unprocessed_only=False, limit=None):
+        self.app = app
+        self.concurrency = concurrency or app.config['AI_WORKER_CONCURRENCY']
+        self.batch_size = batch_size
+        self.checkpoint_path = checkpoint_path or os.path.join(app.instance_path, 'ai_backfill.json')
+        self.filters = {
+            'model': model,
+            'prompt_version': prompt_version,
+            'since': since.isoformat() if since else None,
+            'until': until.isoformat() if until else None,
+            'unprocessed_only': unprocessed_only
+        }
+        self.since, self.until = since, until
+        self.limit = limit
+        self.stats = {'updated': 0, 'failed': 0, 'last_id': 0, 'processed': 0, 'elapsed': 0.0}
+        self._stopping = threading.Event()
+
+    def stop(self):
+        """Finish the current batch and return from ``run``"""
+        self._stopping.set()
+
+    def candidates(self, after_id, current_model):
+        """Query for the next batch of candidate snapshots after ``after_id``"""
+        query = select(*SNAPSHOT_COLUMNS).where(Report.id > after_id)
+        if self.filters['unprocessed_only']:
+            query = query.where(Report.ai_processed.isnot(True))
+        if self.filters['model']:
+            query = query.where(Report.ai_model == self.filters['model'])
+        if self.filters['prompt_version']:
+            query = query.where(Report.ai_prompt_version == self.filters['prompt_version'])
+        if not any(self.filters[name] for name in ('unprocessed_only', 'model', 'prompt_version')):
+            # Everything not analyzed by the current model with the current prompts
+            query = query.where(or_(
+                Report.ai_processed.isnot(True),
+                Report.ai_model.is_(None), Report.ai_model != current_model,
+                Report.ai_prompt_version.is_(None), Report.ai_prompt_version != prompt_version_label()
+            ))
+        if self.since:
+            query = query.where(Report.created_at >= self.since)
+        if self.until:
+            query = query.where(Report.created_at < self.until)
+        return query.order_by(Report.id).limit(self.batch_size)
+
+    def run(self, restart=False, progress=None):
+        """Process batches until no candidates are left, ``limit`` is reached or ``stop`` is called.
+
+        ``progress`` is called with the stats after every batch: ``updated``,
+        ``failed`` and ``last_id`` count from the first run of a resumed
+        backfill, ``processed`` and ``elapsed`` from the start of this one.
+        Raises ``AIUnavailable`` when the AI circuit breaker opens.
+        """
+        checkpoint = None if restart else self._read_checkpoint()
+        if checkpoint:
+            self.stats.update({key: checkpoint[key] for key in ('updated', 'failed', 'last_id')})
+        started = time.monotonic()
+        current_model = AIService().model
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='ai-backfill') as executor:
+            while not self._stopping.is_set() and (self.limit is None or self.stats['processed'] < self.limit):
+                rows = db.session.execute(self.candidates(self.stats['last_id'], current_model)).all()
+                db.session.rollback()
+                if self.limit is not None:
+                    rows = rows[:self.limit - self.stats['processed']]
+                if not rows:
+                    break
+
+                snapshots = [SimpleNamespace(**row._mapping) for row in rows]
+                updated = self._apply(snapshots, list(executor.map(self._analyze, snapshots)))
+                if ai_gateway.breaker.to_dict()['state'] == 'open':
+                    # Failures in this batch may be the outage; leave them for the resumed run
+                    raise AIUnavailable(f'AI circuit breaker opened; {updated} reports of the last batch '
+                                        f'were stored, resume to continue after report {self.stats["last_id"]}')
+
+                self.stats['processed'] += len(rows)
+                self.stats['updated'] += updated
+                self.stats['failed'] += len(rows) - updated
+                self.stats['last_id'] = rows[-1].id
+                self.stats['elapsed'] = time.monotonic() - started
+                self._write_checkpoint()
+                if progress:
+                    progress(dict(self.stats))
+        return self.stats
+
+    def _analyze(self, snapshot):
+        """LLM analysis of one report, or None when the LLM could not produce one"""
+        with self.app.app_context():
+            result = AIService().analyze_report(snapshot)
+        # A fallback result would overwrite a real analysis with a guess
+        if not result or not result.get('model'):
+            logger.warning(f'AI backfill could not analyze report {snapshot.id}')
+            return None
+        return result
+
+    def _apply(self, snapshots, results):
+        """Store a batch of results in one transaction; returns the number stored"""
+        analyzed = {snapshot.id: result for snapshot, result in zip(snapshots, results) if result}
+        reports = Report.query.filter(Report.id.in_(analyzed)).all()
+        for report in reports:
+            result = analyzed[report.id]
+            report.mark_ai_processed(
+                category=result.get('category'),
+                confidence=result.get('confidence'),
+                advice=result.get('advice'),
+                input_hash=result.get('input_hash'),
+                model=result.get('model'),
+                prompt_version=result.get('prompt_version')
+            )
+        db.session.commit()
+        return len(reports)
+
+    def _read_checkpoint(self):
+        """The saved checkpoint, if it was written by a run with the same filters"""
+        if not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path, encoding='utf-8') as handle:
+            checkpoint = json.load(handle)
+        if checkpoint.get('filters') != self.filters:
+            logger.info('AI backfill filters changed; starting from the first report')
+            return None
+        return checkpoint
+
+    def _write_checkpoint(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.checkpoint_path)), exist_ok=True)
+        temp_path = f'{self.checkpoint_path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as handle:
+            json.dump({
+                'filters': self.filters,
+                'last_id': self.stats['last_id'],
+                'updated': self.stats['updated'],
+                'failed': self.stats['failed'],
+                'saved_at': datetime.utcnow().isoformat()
+            }, handle)
+        os.replace(temp_path, self.checkpoint_path)
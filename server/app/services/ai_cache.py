@@ -0,0 +1,169 @@
+"""Two-tier cache for LLM results.
+
+A per-process LRU answers repeated prompts without any I/O; the
+``ai_cache_entries`` table shares results between workers and restarts.
+Keys hash the normalized prompt inputs together with the model and the
+prompt version, so changing either starts from a cold cache. Only
+successful LLM responses are stored; fallbacks are never cached.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+
+from flask import has_app_context
+
+from app.database import db
+from app.models.ai_cache import AICacheEntry
+
+logger = logging.getLogger(__name__)
+
+# Prune the shared tier after this many writes from one process
+PRUNE_EVERY = 200
+
+
+def normalize_input(value):
+    """Case- and whitespace-insensitive form of a prompt input"""
+    if isinstance(value, str):
+        return ' '.join(value.split()).casefold()
+    if isinstance(value, dict):
+        return {key: normalize_input(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_input(item) for item in value]
+    return value
+
+
+def cache_key(kind, inputs, model, prompt_version):
+    payload = json.dumps([kind, model, prompt_version, normalize_input(inputs)], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class AICache:
+    """In-process LRU in front of the shared database tier"""
+
+    def __init__(self, max_entries=1024, ttl=7 * 24 * 3600, db_max_entries=50000, enabled=True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_max_entries = db_max_entries
+        self.enabled = enabled
+        self.stats = Counter()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def init_app(self, app):
+        self.max_entries = app.config['AI_CACHE_SIZE']
+        self.ttl = app.config['AI_CACHE_TTL']
+        self.db_max_entries = app.config['AI_CACHE_DB_MAX_ENTRIES']
+        self.enabled = app.config['AI_CACHE_ENABLED']
+
+    def get_or_compute(self, kind, inputs, compute, model, prompt_version):
+        """Return the cached result for these inputs, calling ``compute`` on a miss.
+
+        Exceptions from ``compute`` propagate and nothing is stored.
+        """
+        if not self.enabled:
+            return compute()
+
+        value = self.get(kind, inputs, model, prompt_version)
+        if value is None:
+            value = compute()
+            self.set(kind, inputs, model, prompt_version, value)
+        return value
+
+    def get(self, kind, inputs, model, prompt_version):
+        """Return the cached result for these inputs, or None on a miss"""
+        if not self.enabled:
+            return None
+
+        key = cache_key(kind, inputs, model, prompt_version)
+        value = self._memory_get(key)
+        if value is not None:
+            self._count('memory_hits')
+            return value
+
+        if has_app_context():
+            try:
+                with db.engine.connect() as connection:
+                    value = AICacheEntry.lookup(connection, key)
+            except Exception as e:
+                logger.warning(f"AI cache lookup failed: {e}")
+            if value is not None:
+                self._count('db_hits')
+                self._memory_set(key, value)
+                return value
+
+        self._count('misses')
+        return None
+
+    def set(self, kind, inputs, model, prompt_version, value):
+        """Store a successful LLM result for these inputs in both tiers"""
+        if not self.enabled:
+            return
+        key = cache_key(kind, inputs, model, prompt_version)
+        self._memory_set(key, value)
+        if has_app_context():
+            self._db_set(key, kind, model, prompt_version, value)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _memory_get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _memory_set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def _db_set(self, key, kind, model, prompt_version, value):
+        expires_at = datetime.utcnow() + timedelta(seconds=self.ttl)
+        try:
+            with db.engine.begin() as connection:
+                AICacheEntry.store(connection, key, kind, model, prompt_version, value, expires_at)
+                with self._lock:
+                    self._writes += 1
+                    prune = self._writes % PRUNE_EVERY == 0
+                if prune:
+                    AICacheEntry.prune(connection, self.db_max_entries)
+        except Exception as e:
+            logger.warning(f"AI cache write failed: {e}")
+
+    def get_stats(self):
+        hits = self.stats['memory_hits'] + self.stats['db_hits']
+        lookups = hits + self.stats['misses']
+        with self._lock:
+            size = len(self._entries)
+        return {
+            'enabled': self.enabled,
+            'memory_hits': self.stats['memory_hits'],
+            'db_hits': self.stats['db_hits'],
+            'misses': self.stats['misses'],
+            'evictions': self.stats['evictions'],
+            'hit_rate': round(hits / lookups, 4) if lookups else None,
+            'memory_entries': size
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.stats.clear()
+
+
+ai_cache = AICache()
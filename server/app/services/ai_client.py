@@ -0,0 +1,98 @@
+"""Process-wide Groq client.
+
+One client per process shares a keep-alive HTTP connection pool, so AI
+calls after the first skip the TCP and TLS handshakes. It is created on
+first use and recreated after a fork, since pooled sockets must not be
+shared between pre-forked workers.
+"""
+import logging
+import os
+import threading
+
+import httpx
+from groq import Groq
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_KEYS = {'', 'your-groq-api-key-here', 'your-gro************here'}
+
+
+class AIClient:
+    """Lazily built, fork-aware holder of the shared Groq client and AI settings"""
+
+    def __init__(self):
+        self.config = {}
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.config = {key: value for key, value in app.config.items() if key.startswith('GROQ_')}
+        self.config['AI_COMBINED_ANALYSIS'] = app.config['AI_COMBINED_ANALYSIS']
+        self.config['AI_CALL_TIMEOUT'] = app.config['AI_CALL_TIMEOUT']
+        self.close()
+
+    @property
+    def api_key(self):
+        key = self.config.get('GROQ_API_KEY')
+        return None if key is None or key in PLACEHOLDER_KEYS else key
+
+    @property
+    def model(self):
+        return self.config.get('GROQ_MODEL', 'llama-3.1-70b-versatile')
+
+    @property
+    def temperature(self):
+        return self.config.get('GROQ_TEMPERATURE', 0.7)
+
+    @property
+    def max_tokens(self):
+        return self.config.get('GROQ_MAX_TOKENS', 500)
+
+    @property
+    def combined_analysis(self):
+        return self.config.get('AI_COMBINED_ANALYSIS', True)
+
+    def get(self):
+        """Return this process's client, or None when no API key is configured"""
+        if not self.api_key:
+            return None
+        with self._lock:
+            if self._pid != os.getpid():
+                self._client = self._build()
+                self._pid = os.getpid()
+            return self._client
+
+    def _build(self):
+        config = self.config
+        http_client = httpx.Client(
+            # No single read may outlast the whole call's deadline
+            timeout=httpx.Timeout(config['AI_CALL_TIMEOUT'], connect=config['GROQ_CONNECT_TIMEOUT']),
+            limits=httpx.Limits(
+                max_connections=config['GROQ_MAX_CONNECTIONS'],
+                max_keepalive_connections=config['GROQ_MAX_KEEPALIVE_CONNECTIONS'],
+                keepalive_expiry=config['GROQ_KEEPALIVE_EXPIRY']
+            )
+        )
+        try:
+            return Groq(
+                api_key=self.api_key,
+                timeout=http_client.timeout,
+                max_retries=config['GROQ_MAX_RETRIES'],
+                http_client=http_client
+            )
+        except Exception as e:
+            logger.warning(f"Failed to initialize Groq client: {e}")
+            http_client.close()
+            return None
+
+    def close(self):
+        with self._lock:
+            # A client inherited over fork shares its sockets with the parent
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._pid = None
+
+
+ai_client = AIClient()
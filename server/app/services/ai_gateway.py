@@ -0,0 +1,215 @@
+"""Guard rails around every LLM call.
+
+``ai_gateway.complete`` gives each call a deadline, caps how many calls a
+process makes at once, and trips a circuit breaker after repeated provider
+failures. While the breaker is open, or no call slot frees up in time, it
+raises ``AIUnavailable`` immediately; callers treat that like any other
+failed call and serve their fallback, so a provider incident cannot tie up
+every worker. ``ai_gateway.stream`` applies the same rules to streamed
+completions.
+
+The deadline is wall-clock time for the whole call. The HTTP client's own
+timeouts only bound each connect and read, so a provider that keeps
+sending bytes slowly would otherwise hold a worker and a call slot for as
+long as it likes.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import groq
+
+logger = logging.getLogger(__name__)
+
+# Errors caused by the request itself say nothing about the provider's health
+CLIENT_ERRORS = (groq.BadRequestError, groq.NotFoundError, groq.UnprocessableEntityError)
+
+
+class AIUnavailable(Exception):
+    """An LLM call was refused without reaching the provider"""
+
+
+class AITimeout(TimeoutError):
+    """An LLM call was abandoned at its deadline"""
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures and lets one probe through after a cool-down"""
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def allow(self):
+        """Whether a call may go out now; in half-open state only one probe at a time"""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info('AI circuit breaker closed')
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f'AI circuit breaker opened after {self.failures} failures')
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """Give back a half-open probe whose outcome said nothing about the provider"""
+        with self._lock:
+            self._probing = False
+
+    def to_dict(self):
+        with self._lock:
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = max(0.0, round(self.reset_timeout - (time.monotonic() - self.opened_at), 1))
+            return {'state': self.state, 'failures': self.failures, 'retry_in': retry_in}
+
+
+class AIGateway:
+    """Per-process deadline, concurrency limit and circuit breaker for LLM calls"""
+
+    def __init__(self):
+        self.breaker = CircuitBreaker()
+        self.timeout = 15.0
+        self.queue_timeout = 0.5
+        self.max_concurrent = 8
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._calls = None
+        self._calls_pid = None
+
+    def init_app(self, app):
+        self.timeout = app.config['AI_CALL_TIMEOUT']
+        self.queue_timeout = app.config['AI_QUEUE_TIMEOUT']
+        self.max_concurrent = app.config['AI_MAX_CONCURRENT_CALLS']
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self.breaker = CircuitBreaker(app.config['AI_BREAKER_FAILURE_THRESHOLD'], app.config['AI_BREAKER_RESET_TIMEOUT'])
+        self._calls_pid = None
+
+    def complete(self, client, timeout=None, **params):
+        """Run ``client.chat.completions.create(**params)`` within the guard rails.
+
+        Raises ``AITimeout`` once ``timeout`` seconds (default AI_CALL_TIMEOUT)
+        have passed in total. The abandoned request finishes on a pool thread,
+        bounded by the client's read timeout, while its slot is freed at once.
+        """
+        self._acquire()
+        try:
+            future = self._executor().submit(client.chat.completions.create, **params)
+            try:
+                response = future.result(timeout=timeout or self.timeout)
+            except FutureTimeout:
+                future.cancel()
+                raise AITimeout(f'LLM call exceeded its {timeout or self.timeout}s deadline')
+        except CLIENT_ERRORS:
+            self.breaker.release_probe()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        else:
+            self.breaker.record_success()
+            return response
+        finally:
+            self._release()
+
+    def stream(self, client, timeout=None, **params):
+        """Like ``complete`` with ``stream=True``, yielding text deltas as they arrive.
+
+        The call slot is held until the stream ends or the generator is
+        closed. The deadline is checked as each chunk arrives, and the stream
+        is closed with ``AITimeout`` once it has passed.
+        """
+        self._acquire()
+        deadline = time.monotonic() + (timeout or self.timeout)
+        chunks = None
+        try:
+            chunks = client.chat.completions.create(stream=True, **params)
+            for chunk in chunks:
+                if time.monotonic() > deadline:
+                    raise AITimeout(f'LLM stream exceeded its {timeout or self.timeout}s deadline')
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+        except CLIENT_ERRORS:
+            self.breaker.release_probe()
+            raise
+        except GeneratorExit:
+            # The consumer went away; that says nothing about the provider
+            self.breaker.release_probe()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        else:
+            self.breaker.record_success()
+        finally:
+            if chunks is not None and hasattr(chunks, 'close'):
+                chunks.close()
+            self._release()
+
+    def _executor(self):
+        """Threads that run calls for ``complete``; rebuilt after a fork, whose child has none"""
+        with self._lock:
+            if self._calls_pid != os.getpid():
+                self._calls = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix='ai-call')
+                self._calls_pid = os.getpid()
+            return self._calls
+
+    def _acquire(self):
+        if not self.breaker.allow():
+            raise AIUnavailable('AI circuit breaker is open')
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self.breaker.release_probe()
+            raise AIUnavailable('Too many concurrent AI calls')
+        with self._lock:
+            self._in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def status(self):
+        with self._lock:
+            in_flight = self._in_flight
+        return {
+            'breaker': self.breaker.to_dict(),
+            'concurrency': {'limit': self.max_concurrent, 'in_flight': in_flight},
+            'timeout': self.timeout
+        }
+
+
+ai_gateway = AIGateway()
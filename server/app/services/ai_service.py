@@ -1,67 +1,286 @@
-import os
 import json
+import hashlib
 import logging
-from groq import Groq
+
+from app.services.ai_cache import ai_cache
+from app.services.ai_client import ai_client
+from app.services.ai_gateway import AIUnavailable, ai_gateway
+from app.services.green_catalog import green_catalog
+from app.services.task_pool import task_pool
+from app.services.text_classifier import local_classifier
+from app.utils.keyword_matcher import KeywordMatcher
 
 logger = logging.getLogger(__name__)
 
+# Bump a prompt's version whenever its wording changes so cached results
+# produced by the old prompt are no longer used
+PROMPT_VERSIONS = {
+    'classify': 1,
+    'advice': 1,
+    'analysis': 1,
+}
+
+# Keyword fallback tables, compiled once; ties go to the category listed first
+KEYWORD_CATEGORIES = {
+    "pollution": ["pollution", "contamination", "toxic", "chemical", "oil spill"],
+    "water-issues": ["water", "river", "lake", "ocean", "drought", "flood", "sewage"],
+    "air-quality": ["air", "smog", "emissions", "smoke", "dust", "fumes"],
+    "waste-management": ["waste", "garbage", "trash", "litter", "dump", "landfill"],
+    "deforestation": ["forest", "tree", "logging", "deforestation", "habitat loss"],
+    "wildlife": ["animal", "wildlife", "species", "endangered", "poaching"],
+    "climate-change": ["climate", "temperature", "global warming", "carbon", "greenhouse"],
+    "energy": ["energy", "electricity", "power", "solar", "renewable"]
+}
+keyword_matcher = KeywordMatcher(KEYWORD_CATEGORIES)
+
+CATEGORIES = ("pollution", "climate-change", "deforestation", "water-issues", "air-quality",
+              "wildlife", "waste-management", "energy", "general")
+
+# Rough prompt sizing for batch categorization: tokens are estimated as
+# characters / CHARS_PER_TOKEN, and each reply item needs about
+# BATCH_REPLY_TOKENS tokens of output
+CHARS_PER_TOKEN = 4
+BATCH_PROMPT_OVERHEAD_TOKENS = 150
+BATCH_ITEM_OVERHEAD_TOKENS = 10
+BATCH_REPLY_TOKENS = 20
+
+# Bump whenever the batch categorization prompt changes; part of its cache key
+BATCH_PROMPT_VERSION = 1
+
+# Output tokens allowed per task when generating tasks for the task pools
+TASK_REPLY_TOKENS = 150
+# Bump whenever the task pool prompt changes; stored with each pooled task
+TASK_PROMPT_VERSION = 1
+
+
+def prompt_version_label():
+    """The current prompt versions as stored with each report analysis"""
+    return ','.join(f'{kind}:{version}' for kind, version in sorted(PROMPT_VERSIONS.items()))
+
+
+def parse_json_object(content):
+    """Parse the JSON object in a model reply, ignoring code fences or prose around it"""
+    start, end = content.find('{'), content.rfind('}')
+    if start == -1 or end < start:
+        raise ValueError("No JSON object in AI response")
+    return json.loads(content[start:end + 1])
+
+
+def validate_classification(parsed):
+    """Normalize a classification reply; raises ValueError when it is unusable.
+
+    Accepts category spellings like "Water Issues" and confidences given as
+    strings or percentages.
+    """
+    if not isinstance(parsed, dict):
+        raise ValueError("AI response is not a JSON object")
+    category = str(parsed.get('category') or '').strip().lower().replace('_', '-').replace(' ', '-')
+    if category not in CATEGORIES:
+        raise ValueError(f"Unknown category {parsed.get('category')!r}")
+
+    try:
+        confidence = float(str(parsed.get('confidence')).strip().rstrip('%'))
+    except ValueError:
+        raise ValueError(f"Invalid confidence {parsed.get('confidence')!r}")
+    if 1 < confidence <= 100:
+        confidence /= 100
+    if not 0 <= confidence <= 1:
+        raise ValueError(f"Invalid confidence {parsed.get('confidence')!r}")
+
+    return {'category': category, 'confidence': confidence}
+
+
+def validate_analysis(parsed):
+    """Normalize a combined analysis reply; raises ValueError when it is unusable.
+
+    Category and confidence are checked as by ``validate_classification``;
+    advice may also be given as a list of steps.
+    """
+    classification = validate_classification(parsed)
+
+    advice = parsed.get('advice')
+    if isinstance(advice, list):
+        advice = ' '.join(str(step).strip() for step in advice)
+    if not isinstance(advice, str) or not advice.strip():
+        raise ValueError("Empty advice")
+
+    return dict(classification, advice=advice.strip())
+
 
 class AIService:
     """Service for AI-powered environmental analysis"""
     
     def __init__(self):
-        self.api_key = os.environ.get('GROQ_API_KEY')
-        self.client = None
-        if self.api_key and self.api_key not in ['your-groq-api-key-here', 'your-gro************here', '']:
-            try:
-                self.client = Groq(api_key=self.api_key)
-            except Exception as e:
-                logger.warning(f"Failed to initialize Groq client: {e}")
-                self.client = None
-        self.model = os.environ.get('GROQ_MODEL', 'llama-3.1-70b-versatile')
-        self.temperature = float(os.environ.get('GROQ_TEMPERATURE', '0.7'))
-        self.max_tokens = int(os.environ.get('GROQ_MAX_TOKENS', '500'))
+        # Cheap per request: the client and settings are shared per process
+        self.api_key = ai_client.api_key
+        self.client = ai_client.get()
+        self.model = ai_client.model
+        self.temperature = ai_client.temperature
+        self.max_tokens = ai_client.max_tokens
+        self.combined_analysis = ai_client.combined_analysis
+        self.task_prompt_version = TASK_PROMPT_VERSION
     
     def health_check(self):
         """Check if AI service is available"""
         return self.client is not None and self.api_key is not None
     
+    def report_input_hash(self, report):
+        """Hash of everything an analysis of this report depends on"""
+        payload = json.dumps([
+            report.title, report.description, report.location, report.image_url,
+            self.model if self.client else None, PROMPT_VERSIONS
+        ], sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def is_analysis_current(self, report):
+        """Whether the stored analysis came from the LLM, for the report as it is now.
+
+        Fallback analyses are never current, so they are replaced once the
+        LLM answers again.
+        """
+        return bool(report.ai_processed and report.ai_model and report.ai_input_hash
+                    and report.ai_input_hash == self.report_input_hash(report))
+
     def analyze_report(self, report):
         """Analyze an environmental report"""
         try:
-            classification = self.classify_environmental_issue(
-                report.title, 
-                report.description, 
-                report.image_url
-            )
-            
-            # Generate advice
-            advice = self.generate_advice(
-                classification.get('category', 'environmental-issue'),
-                report.title,
-                report.description,
-                report.location
-            )
+            analysis = self._combined_analysis(report) if self.combined_analysis else None
+            advice_fell_back = False
+            if analysis:
+                classification, advice = analysis
+            else:
+                classification = self.classify_environmental_issue(
+                    report.title, 
+                    report.description, 
+                    report.image_url
+                )
+                
+                # Generate advice
+                advice, advice_fell_back = self.generate_advice(
+                    classification.get('category', 'environmental-issue'),
+                    report.title,
+                    report.description,
+                    report.location
+                )
             
+            # Results with a fallback half are not attributed to the model, and
+            # only model results are hashed so fallbacks are never taken as current
+            fell_back = advice_fell_back or classification.get('source') in ('local', 'keyword')
+            model = None if fell_back else self.model
             return {
                 'category': classification.get('category'),
                 'confidence': classification.get('confidence'),
-                'advice': advice
+                'advice': advice,
+                'input_hash': self.report_input_hash(report) if model else None,
+                'model': model,
+                'prompt_version': prompt_version_label()
             }
             
         except Exception as e:
             logger.error(f"Failed to analyze report {report.id}: {e}")
             return None
     
+    def _combined_analysis(self, report):
+        """Category and advice from a single LLM call.
+
+        Returns (classification, advice), or None when the two-step flow
+        should be used instead: without a client, when a confident local
+        prediction makes the classification call unnecessary, or when the
+        reply cannot be used.
+        """
+        if not self.client:
+            return None
+        text = f"{report.title}. {report.description}".strip()
+        if local_classifier.confident_prediction(text):
+            return None
+
+        inputs = {'text': text, 'location': report.location}
+        try:
+            result = ai_cache.get_or_compute(
+                'analysis', inputs, lambda: self._analysis_with_llm(text, report.location),
+                self.model, PROMPT_VERSIONS['analysis']
+            )
+        except ValueError as e:
+            logger.warning(f"Unusable combined AI analysis, using separate calls: {e}")
+            return None
+        except Exception as e:
+            # Separate calls would hit the same failing provider twice more
+            logger.warning(f"Combined AI analysis failed: {e}")
+            classification = self._fallback_classification(text)
+            return classification, self._default_advice(classification['category'])
+
+        return {'category': result['category'], 'confidence': result['confidence']}, result['advice']
+
+    def _analysis_with_llm(self, text, location=None):
+        """Ask the model for category, confidence and advice at once; raises on any failure"""
+        prompt = f"""
+            You are an environmental expert. Classify the following environmental report
+            and give actionable advice for it.
+
+            Use one of these categories:
+            {json.dumps(list(CATEGORIES))}
+
+            For the advice, give 2-3 specific, actionable steps that individuals can take
+            to help address or report this problem, as one short paragraph.
+
+            Respond ONLY with valid JSON in this exact format:
+            {{
+              "category": "<category>",
+              "confidence": <number between 0 and 1>,
+              "advice": "<advice>"
+            }}
+
+            Report: {text}
+            Location: {location or 'Not specified'}
+            """
+
+        response = ai_gateway.complete(
+            self.client,
+            model=self.model,
+            messages=[{"role": "user", "content": prompt.strip()}],
+            temperature=self.temperature,
+            max_tokens=self.max_tokens
+        )
+
+        content = response.choices[0].message.content
+        if not content:
+            raise ValueError("Empty AI response")
+        return validate_analysis(parse_json_object(content))
+
     def classify_environmental_issue(self, title, description, image_url=None):
         """Classify environmental issue using AI"""
         text = f"{title}. {description}".strip()
         
         try:
             if not self.client:
-                return self._keyword_classification(text)
+                return self._fallback_classification(text)
+
+            # A confident local prediction saves the LLM call when configured
+            local = local_classifier.confident_prediction(text)
+            if local:
+                return local
+
+            return ai_cache.get_or_compute(
+                'classify', {'text': text}, lambda: self._classify_with_llm(text),
+                self.model, PROMPT_VERSIONS['classify']
+            )
             
-            prompt = f"""
+        except Exception as e:
+            logger.warning(f"AI classification failed: {e}")
+            return self._fallback_classification(text)
+
+    def _fallback_classification(self, text):
+        """Classify without the LLM: the trained local model, else keywords"""
+        model = local_classifier.get()
+        prediction = model.predict(text) if model else None
+        if prediction:
+            category, confidence = prediction
+            return {"category": category, "confidence": confidence, "source": "local"}
+        return dict(self._keyword_classification(text), source="keyword")
+
+    def _classify_with_llm(self, text):
+        """Ask the model for a category; raises on any failure"""
+        prompt = f"""
             You are an environmental issue classification assistant.
             
             Classify the following environmental report into one of these categories:
@@ -75,53 +294,64 @@ class AIService:
             
             Report: {text}
             """
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt.strip()}],
-                temperature=0.1,
-                max_tokens=100
-            )
-            
-            content = response.choices[0].message.content
-            if not content:
-                raise ValueError("Empty AI response")
-            
-            result = json.loads(content.strip())
-            return result
-            
-        except Exception as e:
-            logger.warning(f"AI classification failed: {e}")
-            return self._keyword_classification(text)
+
+        response = ai_gateway.complete(
+            self.client,
+            model=self.model,
+            messages=[{"role": "user", "content": prompt.strip()}],
+            temperature=0.1,
+            max_tokens=100
+        )
+
+        content = response.choices[0].message.content
+        if not content:
+            raise ValueError("Empty AI response")
+
+        # Validated before it is cached, so a bad reply is never served again
+        return validate_classification(parse_json_object(content))
     
     def _keyword_classification(self, text):
         """Fallback keyword-based classification"""
-        text_lower = text.lower()
-        
-        categories = {
-            "pollution": ["pollution", "contamination", "toxic", "chemical", "oil spill"],
-            "water-issues": ["water", "river", "lake", "ocean", "drought", "flood", "sewage"],
-            "air-quality": ["air", "smog", "emissions", "smoke", "dust", "fumes"],
-            "waste-management": ["waste", "garbage", "trash", "litter", "dump", "landfill"],
-            "deforestation": ["forest", "trees", "logging", "deforestation", "habitat loss"],
-            "wildlife": ["animals", "wildlife", "species", "endangered", "poaching"],
-            "climate-change": ["climate", "temperature", "global warming", "carbon", "greenhouse"],
-            "energy": ["energy", "electricity", "power", "solar", "renewable"]
-        }
-        
-        for category, keywords in categories.items():
-            if any(keyword in text_lower for keyword in keywords):
-                return {"category": category, "confidence": 0.7}
-        
-        return {"category": "general", "confidence": 0.5}
+        category, confidence = keyword_matcher.classify(text)
+        return {"category": category, "confidence": confidence}
     
     def generate_advice(self, category, title, description, location=None):
-        """Generate actionable advice for environmental issue"""
+        """Generate actionable advice for environmental issue.
+
+        Returns (advice, fell_back); ``fell_back`` is True when the advice is
+        the category default rather than the LLM's.
+        """
         try:
             if not self.client:
-                return self._default_advice(category)
+                return self._default_advice(category), True
+
+            inputs = {'category': category, 'title': title, 'description': description, 'location': location}
+            return ai_cache.get_or_compute(
+                'advice', inputs, lambda: self._advice_with_llm(category, title, description, location),
+                self.model, PROMPT_VERSIONS['advice']
+            ), False
             
-            prompt = f"""
+        except Exception as e:
+            logger.warning(f"AI advice generation failed: {e}")
+            return self._default_advice(category), True
+
+    def _advice_with_llm(self, category, title, description, location=None):
+        """Ask the model for advice; raises on any failure"""
+        response = ai_gateway.complete(
+            self.client,
+            model=self.model,
+            messages=[{"role": "user", "content": self._advice_prompt(category, title, description, location)}],
+            temperature=self.temperature,
+            max_tokens=self.max_tokens
+        )
+
+        advice = response.choices[0].message.content
+        if not advice or not advice.strip():
+            raise ValueError("Empty AI response")
+        return advice.strip()
+
+    def _advice_prompt(self, category, title, description, location=None):
+        prompt = f"""
             You are an environmental expert providing actionable advice.
             
             Based on this environmental issue, provide 2-3 specific, actionable steps 
@@ -134,20 +364,45 @@ class AIService:
             Details: {description}
             Location: {location or 'Not specified'}
             """
-            
-            response = self.client.chat.completions.create(
+        return prompt.strip()
+
+    def stream_advice(self, category, title, description, location=None):
+        """Yield ('token', text) events while advice is generated, then ('done', payload).
+
+        The final payload is authoritative: after a failure mid-stream it
+        carries the fallback advice instead of what was streamed so far.
+        """
+        inputs = {'category': category, 'title': title, 'description': description, 'location': location}
+        if self.client:
+            cached = ai_cache.get('advice', inputs, self.model, PROMPT_VERSIONS['advice'])
+            if cached is not None:
+                yield 'token', cached
+                yield 'done', {'advice': cached, 'source': 'cache'}
+                return
+
+        try:
+            if not self.client:
+                raise AIUnavailable('AI client is not configured')
+            parts = []
+            for delta in ai_gateway.stream(
+                self.client,
                 model=self.model,
-                messages=[{"role": "user", "content": prompt.strip()}],
+                messages=[{"role": "user", "content": self._advice_prompt(category, title, description, location)}],
                 temperature=self.temperature,
                 max_tokens=self.max_tokens
-            )
-            
-            advice = response.choices[0].message.content
-            return advice.strip() if advice else self._default_advice(category)
-            
+            ):
+                parts.append(delta)
+                yield 'token', delta
+            advice = ''.join(parts).strip()
+            if not advice:
+                raise ValueError("Empty AI response")
         except Exception as e:
-            logger.warning(f"AI advice generation failed: {e}")
-            return self._default_advice(category)
+            logger.warning(f"AI advice streaming failed: {e}")
+            yield 'done', {'advice': self._default_advice(category), 'source': 'fallback'}
+            return
+
+        ai_cache.set('advice', inputs, self.model, PROMPT_VERSIONS['advice'], advice)
+        yield 'done', {'advice': advice, 'source': 'ai'}
     
     def _default_advice(self, category):
         """Fallback advice based on category"""
@@ -165,56 +420,42 @@ class AIService:
         
         return advice_map.get(category, advice_map["general"])
     
-    def generate_green_advice(self, category='general', location=None):
-        """Generate green actions and advice"""
-        actions = [
-            {"title": "Switch to LED Bulbs", "category": "Energy", "difficulty": "Easy",
-             "description": "Replace traditional bulbs with energy efficient LED lights throughout your home.",
-             "impact": "Saves 75% energy, reduces 200kg CO₂/year"},
-            {"title": "Collect Rainwater", "category": "Water", "difficulty": "Medium",
-             "description": "Set up rainwater harvesting system for watering plants and gardens.",
-             "impact": "Saves 500+ litres per month"},
-            {"title": "Plant Native Trees", "category": "Nature", "difficulty": "Medium",
-             "description": "Plant indigenous tree species in your community to restore ecosystem.",
-             "impact": "Absorb 20kg carbon dioxide per tree"},
-            {"title": "Start Composting", "category": "Waste", "difficulty": "Medium",
-             "description": "Turn food waste into nutrient-rich compost for gardening.",
-             "impact": "Diverts 150kg waste from landfills per year"},
-            {"title": "Install Solar Panels", "category": "Energy", "difficulty": "Hard",
-             "description": "Generate clean energy by installing solar panels on your roof.",
-             "impact": "Saves 3,000kg carbon dioxide per year"},
-            {"title": "Fix Water Leaks", "category": "Water", "difficulty": "Easy",
-             "description": "Repair dripping taps and leaking pipes to conserve water.",
-             "impact": "Saves 20 litres per day"},
-            {"title": "Use Public Transport", "category": "Lifestyle", "difficulty": "Easy",
-             "description": "Choose buses, trains, or carpool instead of driving alone.",
-             "impact": "Reduces 1,000kg carbon dioxide per year"},
-            {"title": "Create Wildlife Habitat", "category": "Nature", "difficulty": "Medium",
-             "description": "Plant native flowers and shrubs to support local pollinators and birds.",
-             "impact": "Supports 50+ species"},
-            {"title": "Reduce Plastic Use", "category": "Waste", "difficulty": "Easy",
-             "description": "Use reusable bags, bottles, and containers to minimize plastic waste.",
-             "impact": "Prevents 100kg plastic waste per year"},
-            {"title": "Bike to Work", "category": "Lifestyle", "difficulty": "Easy",
-             "description": "Cycle for short trips instead of driving to reduce emissions.",
-             "impact": "Saves 500kg CO₂ per year"}
-        ]
-
-        # Filter by category if specified
-        if category != 'general' and category != 'all':
-            actions = [action for action in actions
-                      if action['category'].lower() == category.lower()]
-
-        return {"actions": actions, "total": len(actions)}
+    def generate_green_advice(self, category='general', location=None, difficulty=None):
+        """Green actions for a category from the catalog"""
+        advice = green_catalog.get().advice(category, difficulty)
+        return json.loads(advice.advice)
 
     def generate_green_task(self, category='general', difficulty=None, location=None):
         """Generate a single AI-powered green task"""
         try:
+            # Pools are generated without a location, so located requests get a fresh task
+            pooled = None if location else task_pool.serve(category, difficulty)
+            if pooled:
+                return pooled
+
             if not self.client:
                 return self._generate_fallback_task(category, difficulty)
 
-            # Build prompt for AI task generation
-            prompt = f"""
+            response = ai_gateway.complete(
+                self.client,
+                model=self.model,
+                messages=[{"role": "user", "content": self._task_prompt(category, difficulty, location)}],
+                temperature=self.temperature,
+                max_tokens=self.max_tokens
+            )
+
+            content = response.choices[0].message.content
+            if not content:
+                raise ValueError("Empty AI response")
+
+            return parse_json_object(content)
+
+        except Exception as e:
+            logger.warning(f"AI task generation failed: {e}")
+            return self._generate_fallback_task(category, difficulty)
+
+    def _task_prompt(self, category, difficulty=None, location=None):
+        prompt = f"""
             Generate a unique, actionable green environmental task for someone to complete.
 
             Requirements:
@@ -239,73 +480,115 @@ class AIService:
               "materials_needed": ["item1", "item2"] or null
             }}
             """
+        return prompt.strip()
+
+    def stream_green_task(self, category='general', difficulty=None, location=None):
+        """Yield ('token', text) events while a task is generated, then ('done', payload).
+
+        Tokens are the raw JSON as the model writes it; the final payload
+        holds the parsed task, or a fallback task when the reply was unusable.
+        A pooled task is sent as a single token.
+        """
+        pooled = None if location else task_pool.serve(category, difficulty)
+        if pooled:
+            yield 'token', json.dumps(pooled)
+            yield 'done', {'task': pooled, 'source': 'pool'}
+            return
 
-            response = self.client.chat.completions.create(
+        try:
+            if not self.client:
+                raise AIUnavailable('AI client is not configured')
+            parts = []
+            for delta in ai_gateway.stream(
+                self.client,
                 model=self.model,
-                messages=[{"role": "user", "content": prompt.strip()}],
+                messages=[{"role": "user", "content": self._task_prompt(category, difficulty, location)}],
                 temperature=self.temperature,
                 max_tokens=self.max_tokens
-            )
+            ):
+                parts.append(delta)
+                yield 'token', delta
+            task = parse_json_object(''.join(parts))
+        except Exception as e:
+            logger.warning(f"AI task streaming failed: {e}")
+            yield 'done', {'task': self._generate_fallback_task(category, difficulty), 'source': 'fallback'}
+            return
 
-            content = response.choices[0].message.content
-            if not content:
-                raise ValueError("Empty AI response")
+        yield 'done', {'task': task, 'source': 'ai'}
 
-            task = json.loads(content.strip())
-            return task
+    def generate_task_batch(self, category, difficulty, count, avoid_titles=()):
+        """Ask the model for ``count`` distinct tasks for a task pool; raises on any failure.
 
-        except Exception as e:
-            logger.warning(f"AI task generation failed: {e}")
-            return self._generate_fallback_task(category, difficulty)
+        Returns the tasks that have every required field.
+        """
+        prompt = f"""
+            Generate {count} different, actionable green environmental tasks for someone to complete.
 
-    def _generate_fallback_task(self, category, difficulty=None):
-        """Fallback task generation when AI is unavailable"""
-        fallback_tasks = {
-            "energy": [
-                {"title": "Audit Home Energy Use", "difficulty": "Easy", "description": "Go through your home and identify energy-wasting appliances and habits.", "impact": "Identify 10-20% energy savings opportunities", "time_estimate": "30 minutes", "materials_needed": None},
-                {"title": "Install Smart Thermostat", "difficulty": "Medium", "description": "Replace your traditional thermostat with a smart, programmable one.", "impact": "Reduce heating/cooling costs by 10%", "time_estimate": "1 hour", "materials_needed": ["Smart thermostat device"]},
-                {"title": "Home Solar Assessment", "difficulty": "Hard", "description": "Research and get quotes for solar panel installation on your property.", "impact": "Potential for 100% renewable energy", "time_estimate": "2-3 hours", "materials_needed": None}
-            ],
-            "water": [
-                {"title": "Check for Leaks", "difficulty": "Easy", "description": "Inspect all faucets, toilets, and pipes for water leaks.", "impact": "Save up to 10 gallons per day", "time_estimate": "15 minutes", "materials_needed": None},
-                {"title": "Install Low-Flow Fixtures", "difficulty": "Medium", "description": "Replace showerheads and faucets with water-efficient models.", "impact": "Reduce water usage by 40%", "time_estimate": "45 minutes", "materials_needed": ["Low-flow showerhead", "Low-flow faucet aerators"]},
-                {"title": "Create Rain Garden", "difficulty": "Hard", "description": "Design and install a rain garden to manage stormwater runoff.", "impact": "Prevent 1,000+ gallons of runoff annually", "time_estimate": "4-6 hours", "materials_needed": ["Native plants", "Mulch", "Shovel"]}
-            ],
-            "waste": [
-                {"title": "Zero Waste Week Challenge", "difficulty": "Easy", "description": "Try to produce no trash for one week by composting and reusing.", "impact": "Reduce landfill waste by 5-10 lbs", "time_estimate": "7 days", "materials_needed": None},
-                {"title": "Upcycle Old Furniture", "difficulty": "Medium", "description": "Transform old furniture or items into something new and useful.", "impact": "Keep items out of landfill", "time_estimate": "2-4 hours", "materials_needed": ["Paint", "Sandpaper", "Basic tools"]},
-                {"title": "Community Clean-up Event", "difficulty": "Hard", "description": "Organize a neighborhood or park cleanup event.", "impact": "Remove hundreds of pounds of litter", "time_estimate": "4-6 hours", "materials_needed": ["Trash bags", "Gloves", "Safety vests"]}
-            ],
-            "general": [
-                {"title": "Plant a Vegetable Garden", "difficulty": "Easy", "description": "Start a small vegetable garden in containers or a plot.", "impact": "Grow your own food sustainably", "time_estimate": "30 minutes setup", "materials_needed": ["Seeds or seedlings", "Containers or soil"]},
-                {"title": "Conduct Energy Audit", "difficulty": "Medium", "description": "Use an energy audit app or checklist to assess your home's efficiency.", "impact": "Identify energy savings of 15-25%", "time_estimate": "1 hour", "materials_needed": ["Energy audit app or checklist"]},
-                {"title": "Install Home Wind Turbine", "difficulty": "Hard", "description": "Research and install a small residential wind turbine.", "impact": "Generate clean energy for your home", "time_estimate": "Full day + installation", "materials_needed": ["Wind turbine kit", "Installation tools"]}
-            ]
-        }
+            Requirements:
+            - Category: {category}
+            - Difficulty: {difficulty}
+            - Each task must be clearly different from the others and from these existing tasks:
+              {json.dumps(list(avoid_titles), ensure_ascii=False)}
 
-        # Get tasks for category or fallback to general
-        tasks = fallback_tasks.get(category.lower(), fallback_tasks["general"])
+            Each task should be:
+            - Specific and actionable
+            - Realistic and achievable
+            - Environmentally beneficial
+            - Include measurable impact where possible
 
-        # Filter by difficulty if specified
-        if difficulty:
-            tasks = [task for task in tasks if task["difficulty"].lower() == difficulty.lower()]
+            Respond ONLY with valid JSON in this exact format:
+            {{
+              "tasks": [{{
+                "title": "Task Title",
+                "description": "Detailed description of what to do",
+                "impact": "Environmental impact or benefit",
+                "time_estimate": "Estimated time to complete",
+                "materials_needed": ["item1", "item2"] or null
+              }}]
+            }}
+            """
+
+        response = ai_gateway.complete(
+            self.client,
+            model=self.model,
+            messages=[{"role": "user", "content": prompt.strip()}],
+            temperature=self.temperature,
+            max_tokens=TASK_REPLY_TOKENS * count + 50
+        )
+
+        content = response.choices[0].message.content
+        if not content:
+            raise ValueError("Empty AI response")
 
-        # Return random task or first one
-        import random
-        selected_task = random.choice(tasks) if tasks else tasks[0]
+        tasks = []
+        for task in parse_json_object(content).get('tasks') or []:
+            if not isinstance(task, dict) or not all(isinstance(task.get(field), str) and task[field].strip()
+                                                     for field in ('title', 'description', 'impact')):
+                continue
+            materials = task.get('materials_needed')
+            tasks.append({
+                "title": task["title"].strip(),
+                "category": category,
+                "difficulty": difficulty.title(),
+                "description": task["description"].strip(),
+                "impact": task["impact"].strip(),
+                "time_estimate": task.get("time_estimate") or "1 hour",
+                "materials_needed": [str(item) for item in materials] if isinstance(materials, list) and materials else None
+            })
+        return tasks
 
-        # Ensure it has the required fields
-        task_data = {
-            "title": selected_task["title"],
+    def _generate_fallback_task(self, category, difficulty=None):
+        """Fallback task generation when AI is unavailable"""
+        task = green_catalog.get().random_task(category, difficulty)
+        return {
+            "title": task["title"],
             "category": category.title(),
-            "difficulty": selected_task["difficulty"],
-            "description": selected_task["description"],
-            "impact": selected_task["impact"],
-            "time_estimate": selected_task.get("time_estimate", "1 hour"),
-            "materials_needed": selected_task.get("materials_needed")
+            "difficulty": task["difficulty"],
+            "description": task["description"],
+            "impact": task["impact"],
+            "time_estimate": task.get("time_estimate", "1 hour"),
+            "materials_needed": list(task["materials_needed"]) if task.get("materials_needed") else None
         }
-
-        return task_data
     
     def categorize_environmental_issue(self, text):
         """Categorize environmental text and provide suggestions"""
@@ -319,6 +602,110 @@ class AIService:
             'suggestions': suggestions
         }
     
+    def categorize_batch(self, texts, token_budget=3000, max_items_per_prompt=50):
+        """Categorize many texts in as few LLM prompts as the token budget allows.
+
+        Returns one result per input text, in input order. Cached texts are
+        not sent again; items the model does not answer with a valid
+        category fall back to keywords.
+        """
+        unique = list(dict.fromkeys(' '.join(text.split()) for text in texts))
+        results = {}
+        prompts = 0
+
+        if self.client:
+            for text in unique:
+                cached = ai_cache.get('classify-batch', {'text': text}, self.model, BATCH_PROMPT_VERSION)
+                if cached is not None:
+                    results[text] = cached
+            missing = [text for text in unique if text not in results]
+            for batch in self._pack_batches(missing, token_budget, max_items_per_prompt):
+                prompts += 1
+                answered = self._classify_batch_with_llm(batch)
+                for text, classification in answered.items():
+                    ai_cache.set('classify-batch', {'text': text}, self.model, BATCH_PROMPT_VERSION, classification)
+                results.update(answered)
+
+        categorized = []
+        for text in texts:
+            normalized = ' '.join(text.split())
+            classification = results.get(normalized)
+            source = 'ai'
+            if classification is None:
+                classification = self._fallback_classification(normalized)
+                source = classification['source']
+            categorized.append({
+                'category': classification['category'],
+                'confidence': classification['confidence'],
+                'suggestions': self._get_category_suggestions(classification['category']),
+                'source': source
+            })
+        return categorized, prompts
+
+    def _pack_batches(self, texts, token_budget, max_items_per_prompt):
+        """Group texts into prompts whose estimated size stays within the budget.
+
+        Yields lists of (text, prompt_text) pairs.
+        """
+        available = token_budget - BATCH_PROMPT_OVERHEAD_TOKENS
+        batch, used = [], 0
+        for text in texts:
+            # A single oversized text is truncated to fit a prompt on its own
+            prompt_text = text
+            cost = BATCH_ITEM_OVERHEAD_TOKENS + BATCH_REPLY_TOKENS + len(text) // CHARS_PER_TOKEN
+            if cost > available:
+                prompt_text = text[:max(0, available - BATCH_ITEM_OVERHEAD_TOKENS - BATCH_REPLY_TOKENS) * CHARS_PER_TOKEN]
+                cost = available
+            if batch and (used + cost > available or len(batch) == max_items_per_prompt):
+                yield batch
+                batch, used = [], 0
+            batch.append((text, prompt_text))
+            used += cost
+        if batch:
+            yield batch
+
+    def _classify_batch_with_llm(self, batch):
+        """Classify one packed batch; returns {text: classification} for valid items only"""
+        items = [{"id": index, "text": prompt_text} for index, (_, prompt_text) in enumerate(batch)]
+        prompt = f"""
+            You are an environmental issue classification assistant.
+
+            Classify each of the following environmental reports into one of these categories:
+            {json.dumps(list(CATEGORIES))}
+
+            Respond ONLY with valid JSON in this exact format, with one result per report id:
+            {{
+              "results": [{{"id": <id>, "category": "<category>", "confidence": <number between 0 and 1>}}]
+            }}
+
+            Reports: {json.dumps(items, ensure_ascii=False)}
+            """
+
+        try:
+            response = ai_gateway.complete(
+                self.client,
+                model=self.model,
+                messages=[{"role": "user", "content": prompt.strip()}],
+                temperature=0.1,
+                max_tokens=BATCH_REPLY_TOKENS * len(batch) + 50
+            )
+            content = response.choices[0].message.content
+            answers = parse_json_object(content or '').get('results', [])
+        except Exception as e:
+            logger.warning(f"AI batch classification failed for {len(batch)} texts: {e}")
+            return {}
+
+        results = {}
+        for answer in answers if isinstance(answers, list) else []:
+            try:
+                index = int(answer['id'])
+                classification = validate_classification(answer)
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= index < len(batch):
+                results[batch[index][0]] = classification
+        return results
+
     def _get_category_suggestions(self, category):
         """Get suggestions based on category"""
         suggestions_map = {
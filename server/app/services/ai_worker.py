@@ -0,0 +1,123 @@
+"""Worker that drains the AI job queue.
+
+Runs outside the web processes (``flask ai-worker`` or ``python worker.py``)
+and analyzes reports on a thread pool, since the work is waiting on the
+LLM API rather than on the CPU. Between jobs it also keeps the green task
+pools topped up.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from app.database import db
+from app.models.ai_job import AIJob
+from app.services.ai_service import AIService
+from app.services.task_pool import task_pool
+
+logger = logging.getLogger(__name__)
+
+
+class AIWorker:
+    """Claims queued analysis jobs and runs up to ``concurrency`` at a time"""
+
+    def __init__(self, app, concurrency=None, poll_interval=None):
+        self.app = app
+        self.concurrency = concurrency or app.config['AI_WORKER_CONCURRENCY']
+        self.poll_interval = poll_interval or app.config['AI_WORKER_POLL_INTERVAL']
+        self.refill_interval = app.config['GREEN_TASK_REFILL_INTERVAL']
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self._stopping = threading.Event()
+        self._next_refill = 0.0
+        self._refilling = None
+
+    def stop(self):
+        """Finish running jobs, claim no new ones and return from ``run``"""
+        self._stopping.set()
+
+    def run(self, once=False):
+        """Process jobs until stopped, or until the queue is drained if ``once``"""
+        processed = 0
+        running = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='ai-job') as executor:
+            while not self._stopping.is_set():
+                if not once:
+                    self._schedule_refill(executor)
+                refilling = self._refilling is not None and not self._refilling.done()
+                free = self.concurrency - len(running) - refilling
+                job_ids = self._claim(free) if free else []
+                for job_id in job_ids:
+                    running.add(executor.submit(self._process, job_id))
+
+                if not running:
+                    if once:
+                        break
+                    self._stopping.wait(self.poll_interval)
+                    continue
+
+                done, running = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                processed += len(done)
+            wait(running)
+        return processed + len(running)
+
+    def _schedule_refill(self, executor):
+        """Start a task pool refill on the pool when one is due and none is running"""
+        if not self.refill_interval or time.monotonic() < self._next_refill:
+            return
+        if self._refilling is not None and not self._refilling.done():
+            return
+        self._next_refill = time.monotonic() + self.refill_interval
+        self._refilling = executor.submit(self._refill_task_pools)
+
+    def _refill_task_pools(self):
+        with self.app.app_context():
+            try:
+                added = task_pool.refill(AIService())
+                if added:
+                    logger.info(f"Refilled task pools: {sum(added.values())} tasks added")
+            except Exception as e:
+                logger.warning(f"Task pool refill failed: {e}")
+                db.session.rollback()
+
+    def _claim(self, limit):
+        with self.app.app_context():
+            AIJob.requeue_stale(self.app.config['AI_JOB_TIMEOUT'])
+            return AIJob.claim(self.worker_id, limit)
+
+    def _process(self, job_id):
+        with self.app.app_context():
+            job = db.session.get(AIJob, job_id)
+            if job is None:
+                return
+            try:
+                report = job.report
+                report.ai_status = 'running'
+                db.session.commit()
+
+                ai_service = AIService()
+                if not ai_service.is_analysis_current(report):
+                    result = ai_service.analyze_report(report)
+                    if not result:
+                        raise RuntimeError('AI analysis returned no result')
+                    # analyze_report falls back instead of raising when the LLM
+                    # fails; retry for a model answer, keeping the fallback
+                    # only once attempts run out or no LLM is configured
+                    if result.get('model') is None and ai_service.client and job.attempts < job.max_attempts:
+                        raise RuntimeError('LLM unavailable, analysis fell back')
+                    report.mark_ai_processed(
+                        category=result.get('category'),
+                        confidence=result.get('confidence'),
+                        advice=result.get('advice'),
+                        input_hash=result.get('input_hash'),
+                        model=result.get('model'),
+                        prompt_version=result.get('prompt_version')
+                    )
+                job.complete()
+                db.session.commit()
+            except Exception as e:
+                logger.warning(f"AI job {job_id} attempt {job.attempts} failed: {e}")
+                db.session.rollback()
+                job.fail(e, self.app.config['AI_JOB_BACKOFF_BASE'], self.app.config['AI_JOB_BACKOFF_MAX'])
+                db.session.commit()
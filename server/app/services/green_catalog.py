@@ -0,0 +1,147 @@
+"""Catalog of green actions and fallback tasks.
+
+The built-in catalog lives in ``app/data/green_catalog.json``; a
+deployment can add entries with its own file of the same shape named by
+GREEN_CATALOG_PATH. Both are read once per process into read-only
+indexes keyed by category and difficulty, and every green-advice
+response body is serialized together with its ETag up front.
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+from types import MappingProxyType
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'green_catalog.json')
+
+# Categories whose green advice lists every action
+ALL_CATEGORIES = ('general', 'all')
+ACTION_FIELDS = ('title', 'category', 'difficulty', 'description', 'impact')
+TASK_FIELDS = ('title', 'difficulty', 'description', 'impact')
+
+
+def _freeze(entry):
+    return MappingProxyType({key: tuple(value) if isinstance(value, list) else value
+                             for key, value in entry.items()})
+
+
+def _check(entry, fields, source):
+    missing = [field for field in fields if not entry.get(field)]
+    if missing:
+        raise ValueError(f"Catalog entry {entry.get('title')!r} in {source} lacks {', '.join(missing)}")
+
+
+class AdviceResponse:
+    """Pre-serialized green-advice body for one (category, difficulty)"""
+
+    __slots__ = ('advice', 'etag', 'total')
+
+    def __init__(self, actions):
+        self.total = len(actions)
+        self.advice = json.dumps({'actions': actions, 'total': self.total}, sort_keys=True,
+                                 separators=(',', ':')).encode('utf-8')
+        self.etag = hashlib.sha256(self.advice).hexdigest()[:32]
+
+    def body(self, category, location):
+        """Full response body echoing the request's category and location"""
+        return b'{"advice":%s,"category":%s,"location":%s}\n' % (
+            self.advice, json.dumps(category).encode('utf-8'), json.dumps(location).encode('utf-8'))
+
+
+class GreenCatalog:
+    """Read-only green actions and fallback tasks indexed by category and difficulty"""
+
+    def __init__(self, actions, tasks):
+        # (category, difficulty) -> AdviceResponse; difficulty None matches all
+        groups = {}
+        for action in actions:
+            category, difficulty = action['category'].lower(), action['difficulty'].lower()
+            for key in ((category, None), (category, difficulty), ('all', None), ('all', difficulty)):
+                groups.setdefault(key, []).append(action)
+        self._advice = MappingProxyType({key: AdviceResponse(group) for key, group in groups.items()})
+        self._no_actions = AdviceResponse([])
+
+        # (category, difficulty) -> tuple of tasks; difficulty None matches all
+        task_groups = {}
+        for category, entries in tasks.items():
+            for task in entries:
+                frozen = _freeze(task)
+                for key in ((category.lower(), None), (category.lower(), task['difficulty'].lower())):
+                    task_groups.setdefault(key, []).append(frozen)
+        self._tasks = MappingProxyType({key: tuple(group) for key, group in task_groups.items()})
+
+    @classmethod
+    def load(cls, *paths):
+        """Build a catalog from data files; later files add to earlier ones"""
+        actions, tasks = [], {}
+        for path in paths:
+            with open(path, encoding='utf-8') as handle:
+                data = json.load(handle)
+            for action in data.get('actions', []):
+                _check(action, ACTION_FIELDS, path)
+                actions.append(action)
+            for category, entries in data.get('tasks', {}).items():
+                for task in entries:
+                    _check(task, TASK_FIELDS, path)
+                tasks.setdefault(category, []).extend(entries)
+        if 'general' not in tasks:
+            raise ValueError('The catalog needs tasks for the general category')
+        return cls(actions, tasks)
+
+    def advice(self, category='general', difficulty=None):
+        """Pre-serialized actions for a category, optionally of one difficulty"""
+        category = category.lower()
+        if category in ALL_CATEGORIES:
+            category = 'all'
+        return self._advice.get((category, difficulty.lower() if difficulty else None), self._no_actions)
+
+    def tasks(self, category='general', difficulty=None):
+        """Tasks of a category, or of the general category when it has none.
+
+        When no task has the requested difficulty, all of the category's
+        tasks are candidates.
+        """
+        category = category.lower()
+        if (category, None) not in self._tasks:
+            category = 'general'
+        if difficulty:
+            matching = self._tasks.get((category, difficulty.lower()))
+            if matching:
+                return matching
+        return self._tasks[(category, None)]
+
+    def random_task(self, category='general', difficulty=None):
+        return random.choice(self.tasks(category, difficulty))
+
+
+class CatalogLoader:
+    """Loads the catalog at most once per process"""
+
+    def __init__(self):
+        self.paths = (DEFAULT_PATH,)
+        self._catalog = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        extra = app.config.get('GREEN_CATALOG_PATH')
+        self.paths = (DEFAULT_PATH, extra) if extra else (DEFAULT_PATH,)
+        # Loaded at startup so a broken data file fails fast
+        self._catalog = GreenCatalog.load(*self.paths)
+
+    def get(self):
+        if self._catalog is None:
+            with self._lock:
+                if self._catalog is None:
+                    self._catalog = GreenCatalog.load(*self.paths)
+        return self._catalog
+
+    def set_catalog(self, catalog):
+        with self._lock:
+            self._catalog = catalog
+
+
+green_catalog = CatalogLoader()
@@ -0,0 +1,153 @@
+"""Background image derivative pipeline.
+
+Uploads arrive with their metadata (EXIF GPS included) already stripped
+at ingest by ``MetadataFilter``. Here they are re-encoded, recompressed, and
+written as a full-size copy and several narrower ones, plus a WebP version
+of each. The original is never modified: its URL is content-addressed and
+served as immutable, so derivatives always get paths of their own. The work runs on a process pool so request workers only
+enqueue it; the finished variants are recorded on the stored file and
+every report showing it.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import has_app_context
+
+logger = logging.getLogger(__name__)
+
+# Pillow format used to re-encode each upload extension; GIFs, which may be
+# animated, are left as uploaded
+SAVE_FORMATS = {'jpg': 'JPEG', 'jpeg': 'JPEG', 'png': 'PNG'}
+
+
+def variant_name(filename, width=None, ext=None):
+    """File name of a derivative: ``<stem>[-<width>].<ext>``"""
+    stem, original_ext = filename.rsplit('.', 1)
+    suffix = f'-{width}' if width else ''
+    return f'{stem}{suffix}.{ext or original_ext}'
+
+
+def _save(image, path, save_format, quality):
+    if save_format == 'JPEG':
+        options = {'quality': quality, 'optimize': True, 'progressive': True}
+    elif save_format == 'WEBP':
+        options = {'quality': quality, 'method': 4}
+    else:
+        options = {'optimize': True}
+    # Written without exif/icc arguments, so no metadata is carried over; two
+    # renders of the same upload each write their own temporary file
+    temp_path = f'{path}.{os.getpid()}-{threading.get_ident()}.tmp'
+    image.save(temp_path, save_format, **options)
+    os.replace(temp_path, path)
+
+
+def render_variants(upload_folder, filename, widths, quality=82):
+    """Strip, recompress and resize one upload; returns its variants or None.
+
+    Runs in a pool process, so it takes and returns plain data only.
+    """
+    from PIL import Image, ImageOps
+
+    save_format = SAVE_FORMATS.get(filename.rsplit('.', 1)[-1].lower())
+    if save_format is None:
+        return None
+
+    with Image.open(os.path.join(upload_folder, filename)) as source:
+        # Apply the EXIF orientation before the tag is dropped
+        image = ImageOps.exif_transpose(source)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA', 'L'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    if save_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    width, height = image.size
+    sizes = []
+    # Narrower sizes, then a stripped full-size copy
+    for target_width in sorted(set(widths) - {width}) + [width]:
+        if target_width > width:
+            continue
+        resized = image if target_width == width else \
+            image.resize((target_width, max(1, round(height * target_width / width))), Image.LANCZOS)
+        name = variant_name(filename, target_width)
+        webp_name = variant_name(filename, target_width, 'webp')
+        _save(resized, os.path.join(upload_folder, name), save_format, quality)
+        _save(resized, os.path.join(upload_folder, webp_name), 'WEBP', quality)
+        sizes.append({'width': target_width, 'height': resized.height, 'file': name, 'webp_file': webp_name})
+
+    return {'width': width, 'height': height, 'sizes': sizes}
+
+
+class ImagePipeline:
+    """Runs ``render_variants`` on a process pool and records the results.
+
+    The pool is created on first use in each process, so pre-fork servers
+    never share one; ``IMAGE_WORKERS = 0`` processes inline instead.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # Spawned workers avoid inheriting the web worker's threads and locks
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.app.config['IMAGE_WORKERS'],
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, filename):
+        """Queue derivative rendering for a stored upload"""
+        config = self.app.config
+        args = (config['UPLOAD_FOLDER'], filename, config['IMAGE_VARIANT_WIDTHS'], config['IMAGE_QUALITY'])
+
+        if config['IMAGE_WORKERS'] == 0:
+            try:
+                self._record(filename, render_variants(*args))
+            except Exception:
+                logger.exception('Image processing failed for %s', filename)
+            return
+
+        future = self._get_executor().submit(render_variants, *args)
+        future.add_done_callback(lambda done: self._complete(filename, done))
+
+    def _complete(self, filename, future):
+        try:
+            self._record(filename, future.result())
+        except Exception:
+            logger.exception('Image processing failed for %s', filename)
+
+    def _record(self, filename, variants):
+        if variants is None:
+            return
+        for size in variants['sizes']:
+            size['url'] = f"/uploads/{size.pop('file')}"
+            size['webp_url'] = f"/uploads/{size.pop('webp_file')}"
+
+        from app.models.stored_file import StoredFile
+        if has_app_context():
+            StoredFile.record_variants(f'/uploads/{filename}', variants)
+        else:
+            with self.app.app_context():
+                StoredFile.record_variants(f'/uploads/{filename}', variants)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+image_pipeline = ImagePipeline()
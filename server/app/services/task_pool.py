@@ -0,0 +1,134 @@
+"""Pools of pre-generated green tasks.
+
+``task_pool.serve`` answers task requests from the ``green_tasks`` table
+with a single rotation query. ``task_pool.refill`` tops up every pool
+whose fresh tasks fell below the low-water mark, asking the LLM for a few
+tasks per call and dropping titles that nearly repeat a task already in
+the pool. The AI worker runs it every GREEN_TASK_REFILL_INTERVAL seconds;
+``flask refill-task-pools`` runs it on demand.
+"""
+import difflib
+import logging
+
+from app.database import db
+from app.models.green_task import GreenTask
+from app.utils.keyword_matcher import tokenize
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+# Words that do not tell two task titles apart
+TITLE_STOP_WORDS = frozenset(b'a an and the of for to in on at your with from by up'.split())
+
+# Titles at least this similar count as the same task
+DUPLICATE_TITLE_RATIO = 0.85
+
+# Tasks requested per LLM call, and calls in a row allowed to add nothing
+TASKS_PER_CALL = 5
+MAX_FRUITLESS_CALLS = 2
+
+
+def title_key(title):
+    """Order-, case-, plural- and stop-word-insensitive form of a task title"""
+    words = {word[:-1] if len(word) > 3 and word.endswith(b's') else word
+             for word in tokenize(title) if word not in TITLE_STOP_WORDS}
+    return b' '.join(sorted(words)).decode('utf-8')[:200]
+
+
+def is_near_duplicate(key, existing_keys):
+    """Whether a title key matches, or nearly matches, one of ``existing_keys``"""
+    for existing in existing_keys:
+        if key == existing or difflib.SequenceMatcher(None, key, existing).ratio() >= DUPLICATE_TITLE_RATIO:
+            return True
+    return False
+
+
+class TaskPool:
+    """Serves and refills the per-(category, difficulty) task pools"""
+
+    def __init__(self):
+        self.enabled = True
+        self.categories = ('general',)
+        self.size = 20
+        self.low_water = 5
+        self.max_serves = 50
+
+    def init_app(self, app):
+        self.enabled = app.config['GREEN_TASK_POOL_ENABLED']
+        self.categories = tuple(app.config['GREEN_TASK_POOL_CATEGORIES'])
+        self.size = app.config['GREEN_TASK_POOL_SIZE']
+        self.low_water = app.config['GREEN_TASK_POOL_LOW_WATER']
+        self.max_serves = app.config['GREEN_TASK_MAX_SERVES']
+
+    def serve(self, category='general', difficulty=None):
+        """A pooled task for the request, or None when its pool is empty or unknown"""
+        if not self.enabled:
+            return None
+        category, difficulty = category.lower(), difficulty.lower() if difficulty else None
+        if category not in self.categories or (difficulty and difficulty not in DIFFICULTIES):
+            return None
+        try:
+            return GreenTask.serve(category, difficulty)
+        except Exception as e:
+            logger.warning(f"Failed to serve a pooled task: {e}")
+            return None
+
+    def levels(self):
+        """Fresh tasks in every configured pool"""
+        counts = GreenTask.fresh_counts(self.max_serves)
+        return {(category, difficulty): counts.get((category, difficulty), 0)
+                for category in self.categories for difficulty in DIFFICULTIES}
+
+    def refill(self, ai_service, pools=None):
+        """Top up pools below the low-water mark to ``size`` fresh tasks.
+
+        Returns {(category, difficulty): tasks added} for the pools that
+        were refilled.
+        """
+        added = {}
+        if not ai_service.client:
+            return added
+        for pool, fresh in self.levels().items():
+            if (pools is None or pool in pools) and fresh < self.low_water:
+                added[pool] = self._refill_pool(ai_service, *pool, fresh=fresh)
+        return added
+
+    def _refill_pool(self, ai_service, category, difficulty, fresh):
+        rows = GreenTask.titles(category, difficulty)
+        titles, keys = [title for title, _ in rows], [key for _, key in rows]
+        wanted = self.size - fresh
+        added = fruitless = 0
+        while added < wanted and fruitless < MAX_FRUITLESS_CALLS:
+            try:
+                tasks = ai_service.generate_task_batch(category, difficulty, min(TASKS_PER_CALL, wanted - added),
+                                                       avoid_titles=titles[-50:])
+            except Exception as e:
+                logger.warning(f"Task pool refill for {category}/{difficulty} failed: {e}")
+                break
+
+            new = 0
+            for task in tasks:
+                if added + new == wanted:
+                    break
+                key = title_key(task['title'])
+                if not key or is_near_duplicate(key, keys):
+                    continue
+                keys.append(key)
+                titles.append(task['title'])
+                # A concurrent refill may have added the same title meanwhile
+                if GreenTask.add(category, difficulty, task['title'][:200], key, task, model=ai_service.model,
+                                 prompt_version=ai_service.task_prompt_version):
+                    new += 1
+            added += new
+            fruitless = 0 if new else fruitless + 1
+
+        if fresh + added >= self.low_water:
+            # Enough fresh tasks to replace the ones served often enough
+            GreenTask.retire(category, difficulty, self.max_serves)
+        db.session.commit()
+        logger.info(f"Added {added} tasks to the {category}/{difficulty} pool")
+        return added
+
+
+task_pool = TaskPool()
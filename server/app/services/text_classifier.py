@@ -0,0 +1,191 @@
+"""Local text classifier used when the LLM is unavailable or skipped.
+
+Texts are turned into hashed unigram and bigram features weighted by
+TF-IDF, and a multinomial naive Bayes model over those weights picks the
+category. Training reads reports whose category was assigned by the LLM
+(``flask train-classifier``); the model is stored as gzipped JSON holding
+only the features seen in training and is loaded once per process.
+"""
+import gzip
+import json
+import logging
+import math
+import os
+import threading
+import zlib
+from collections import Counter, defaultdict
+
+from app.utils.keyword_matcher import tokenize
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+MAX_CONFIDENCE = 0.95
+
+
+def hashed_features(text, n_features):
+    """Counter of hashed unigram and bigram ids; crc32 is stable across processes"""
+    tokens = tokenize(text)
+    grams = tokens + [b'%s %s' % pair for pair in zip(tokens, tokens[1:])]
+    return Counter(zlib.crc32(gram) % n_features for gram in grams)
+
+
+class TextClassifier:
+    """Hashed TF-IDF features with a multinomial naive Bayes model"""
+
+    def __init__(self, classes, priors, defaults, idf, deltas, n_features, default_idf):
+        self.classes = classes
+        self.priors = priors  # log P(class)
+        self.defaults = defaults  # log P(feature | class) for features unseen in that class
+        self.idf = idf
+        self.deltas = deltas  # feature -> per-class log P(feature | class) minus the default
+        self.n_features = n_features
+        self.default_idf = default_idf
+
+    @classmethod
+    def train(cls, texts, labels, n_features=2 ** 18, alpha=0.1):
+        """Fit a model to parallel lists of texts and category labels"""
+        if len(set(labels)) < 2:
+            raise ValueError('Training needs examples of at least two categories')
+
+        documents = [hashed_features(text, n_features) for text in texts]
+        document_frequency = Counter(feature for document in documents for feature in document)
+        total = len(documents)
+        idf = {feature: math.log((1 + total) / (1 + count)) + 1 for feature, count in document_frequency.items()}
+
+        classes = sorted(set(labels))
+        index = {label: position for position, label in enumerate(classes)}
+        class_counts = Counter(labels)
+        weights = [defaultdict(float) for _ in classes]
+        for document, label in zip(documents, labels):
+            for feature, weight in cls._weigh(document, idf, 0.0).items():
+                weights[index[label]][feature] += weight
+
+        priors = [math.log(class_counts[label] / total) for label in classes]
+        defaults, deltas = [], defaultdict(lambda: [0.0] * len(classes))
+        for position, class_weights in enumerate(weights):
+            denominator = sum(class_weights.values()) + alpha * n_features
+            default = math.log(alpha / denominator)
+            defaults.append(default)
+            for feature, weight in class_weights.items():
+                deltas[feature][position] = math.log((weight + alpha) / denominator) - default
+
+        return cls(classes, priors, defaults, idf, dict(deltas), n_features, math.log(1 + total) + 1)
+
+    @staticmethod
+    def _weigh(document, idf, default_idf):
+        """L2-normalized sublinear TF-IDF weights of a document's features"""
+        weights = {feature: (1 + math.log(count)) * idf.get(feature, default_idf)
+                   for feature, count in document.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+        return {feature: weight / norm for feature, weight in weights.items()}
+
+    def predict(self, text):
+        """Return (category, confidence), or None when no feature of the text is known"""
+        document = hashed_features(text, self.n_features)
+        known = {feature: count for feature, count in document.items() if feature in self.deltas}
+        if not known:
+            return None
+
+        weights = self._weigh(document, self.idf, self.default_idf)
+        scores = list(self.priors)
+        total_weight = sum(weights[feature] for feature in known)
+        for position, default in enumerate(self.defaults):
+            scores[position] += total_weight * default
+        for feature in known:
+            weight = weights[feature]
+            for position, delta in enumerate(self.deltas[feature]):
+                scores[position] += weight * delta
+
+        best = max(range(len(scores)), key=scores.__getitem__)
+        top = scores[best]
+        confidence = 1 / sum(math.exp(score - top) for score in scores)
+        # Naive Bayes posteriors are overconfident; never claim certainty
+        return self.classes[best], round(min(confidence, MAX_CONFIDENCE), 2)
+
+    def save(self, path):
+        """Write the model as compact gzipped JSON"""
+        data = {
+            'version': FORMAT_VERSION,
+            'n_features': self.n_features,
+            'default_idf': round(self.default_idf, 4),
+            'classes': self.classes,
+            'priors': [round(value, 5) for value in self.priors],
+            'defaults': [round(value, 5) for value in self.defaults],
+            'idf': {str(feature): round(value, 3) for feature, value in self.idf.items()},
+            'deltas': {str(feature): [round(value, 3) for value in values] for feature, values in self.deltas.items()}
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f'{path}.tmp'
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as handle:
+            json.dump(data, handle, separators=(',', ':'))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, 'rt', encoding='utf-8') as handle:
+            data = json.load(handle)
+        if data.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported classifier format {data.get('version')}")
+        return cls(
+            data['classes'], data['priors'], data['defaults'],
+            {int(feature): value for feature, value in data['idf'].items()},
+            {int(feature): values for feature, values in data['deltas'].items()},
+            data['n_features'], data['default_idf']
+        )
+
+
+class LocalClassifier:
+    """Loads the trained model at most once per process"""
+
+    def __init__(self):
+        self.path = None
+        self.skip_llm_confidence = None
+        self._model = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.path = app.config['AI_LOCAL_MODEL_PATH']
+        self.skip_llm_confidence = app.config['AI_LOCAL_SKIP_LLM_CONFIDENCE']
+        self._model = None
+        self._loaded = False
+
+    def get(self):
+        """Return the model, or None when no trained model file exists"""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._model = self._load()
+                    self._loaded = True
+        return self._model
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            return TextClassifier.load(self.path)
+        except Exception as e:
+            logger.warning(f"Failed to load local classifier from {self.path}: {e}")
+            return None
+
+    def confident_prediction(self, text):
+        """A local classification good enough to skip the LLM, or None.
+
+        Only used when AI_LOCAL_SKIP_LLM_CONFIDENCE is set.
+        """
+        if self.skip_llm_confidence is None:
+            return None
+        model = self.get()
+        prediction = model.predict(text) if model else None
+        if prediction and prediction[1] >= self.skip_llm_confidence:
+            return {"category": prediction[0], "confidence": prediction[1], "source": "local"}
+        return None
+
+    def set_model(self, model):
+        with self._lock:
+            self._model = model
+            self._loaded = True
+
+
+local_classifier = LocalClassifier()
@@ -0,0 +1,94 @@
+from collections import Counter
+
+from app.database import db
+from app.models.grid import ReportGridCell
+from app.models.report import Report
+from app.utils.geo import (
+    tile_bbox, covering_cells, cell_size, geohash_center, GRID_MAX_PRECISION
+)
+
+
+def cluster_precision(z):
+    """Coarsest grid precision giving at least four cells across a tile at zoom z"""
+    tile_width = 360.0 / (1 << z)
+    for precision in range(1, GRID_MAX_PRECISION + 1):
+        if cell_size(precision)[1] <= tile_width / 4:
+            return precision
+    return GRID_MAX_PRECISION
+
+
+def _summary(clusters):
+    severity = Counter()
+    categories = Counter()
+    for cluster in clusters:
+        severity.update(cluster.severity_counts or {})
+        categories.update(cluster.category_counts or {})
+    top_category = max(categories.items(), key=lambda item: (item[1], item[0]))[0] if categories else None
+    return dict(severity), top_category
+
+
+def build_tile(z, x, y, points_min_zoom=13, max_points=1000):
+    """Aggregate public, active reports for a Web Mercator tile.
+
+    Below ``points_min_zoom`` the tile is built from grid rollups only; each
+    cell is assigned to the tile that holds its centre. From that zoom on the
+    individual report points are returned instead.
+    """
+    min_lat, min_lng, max_lat, max_lng = tile_bbox(z, x, y)
+    tile = {
+        'tile': {'z': z, 'x': x, 'y': y, 'bbox': [min_lng, min_lat, max_lng, max_lat]}
+    }
+
+    if z >= points_min_zoom:
+        rows = db.session.query(
+            Report.id, Report.title, Report.latitude, Report.longitude,
+            Report.severity, Report.ai_category
+        ).filter(
+            Report.latitude >= min_lat, Report.latitude < max_lat,
+            Report.longitude >= min_lng, Report.longitude < max_lng,
+            Report.is_public == True,
+            Report.status == 'active'
+        ).order_by(Report.id).limit(max_points + 1).all()
+
+        points = [
+            {
+                'id': row.id,
+                'title': row.title,
+                'latitude': row.latitude,
+                'longitude': row.longitude,
+                'severity': row.severity,
+                'ai_category': row.ai_category
+            }
+            for row in rows[:max_points]
+        ]
+        severity = Counter(point['severity'] for point in points)
+        categories = Counter(point['ai_category'] for point in points if point['ai_category'])
+        tile.update({
+            'mode': 'points',
+            'count': len(points),
+            'truncated': len(rows) > max_points,
+            'points': points,
+            'severity': dict(severity),
+            'top_category': categories.most_common(1)[0][0] if categories else None
+        })
+        return tile
+
+    precision = cluster_precision(z)
+    cells = covering_cells(min_lat, min_lng, max_lat, max_lng, precision)
+    clusters = []
+    if cells:
+        for cluster in ReportGridCell.query.filter(ReportGridCell.cell.in_(cells)).order_by(ReportGridCell.cell):
+            center_lat, center_lng = geohash_center(cluster.cell)
+            if min_lat <= center_lat < max_lat and min_lng <= center_lng < max_lng:
+                clusters.append(cluster)
+
+    severity, top_category = _summary(clusters)
+    tile.update({
+        'mode': 'clusters',
+        'precision': precision,
+        'count': sum(cluster.reports_count for cluster in clusters),
+        'clusters': [cluster.to_dict() for cluster in clusters],
+        'severity': severity,
+        'top_category': top_category
+    })
+    return tile
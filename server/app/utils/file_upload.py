@@ -1,16 +1,168 @@
+import hashlib
 import os
-import uuid
-import re
+import shutil
+import tempfile
+
+from flask import Request, current_app, has_app_context
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from app.utils.image_metadata import MetadataFilter
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+CHUNK_SIZE = 64 * 1024
+
+# Leading bytes of each accepted image format, and the extension it is stored under
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+SIGNATURE_LENGTH = max(len(signature) for signature, _ in IMAGE_SIGNATURES)
 
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def save_uploaded_file(file, upload_folder='uploads'):
+def detect_image_type(head):
+    """Return the extension matching an image's leading bytes, or None"""
+    for signature, ext in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    return None
+
+
+def incoming_folder(upload_folder):
+    """Directory for partial uploads: UPLOAD_TEMP_FOLDER, or a sibling of the upload folder.
+
+    It must not be inside the upload folder, which is served as-is, and
+    should be on the same filesystem so keeping a file is a rename.
+    """
+    configured = current_app.config.get('UPLOAD_TEMP_FOLDER') if has_app_context() else None
+    return configured or f'{os.path.normpath(os.path.abspath(upload_folder))}.incoming'
+
+
+class HashingFileStream:
+    """Temporary upload file that is size-checked, stripped of metadata and hashed as it is written.
+
+    ``received`` counts the bytes sent, which ``max_size`` limits; ``size``
+    and the hash describe the stored bytes, which ``MetadataFilter`` has
+    removed EXIF and similar metadata from. The file is created in
+    ``directory`` and removed on close unless ``persist()`` moved it into
+    place.
+    """
+
+    def __init__(self, directory, max_size=MAX_FILE_SIZE):
+        os.makedirs(directory, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=directory, delete=False)
+        self.path = self._file.name
+        self.max_size = max_size
+        self.received = 0
+        self.size = 0
+        self.head = b''
+        self._sha256 = hashlib.sha256()
+        self._filter = MetadataFilter()
+        self._persisted = False
+
+    @classmethod
+    def from_file(cls, source, directory, max_size=MAX_FILE_SIZE):
+        """Copy a readable file object through a new stream in chunks"""
+        stream = cls(directory, max_size)
+        try:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                stream.write(chunk)
+        except Exception:
+            stream.close()
+            raise
+        stream.seek(0)
+        return stream
+
+    def write(self, data):
+        self.received += len(data)
+        if self.received > self.max_size:
+            raise RequestEntityTooLarge(f'File exceeds maximum allowed size ({self.max_size // (1024 * 1024)}MB).')
+        if len(self.head) < SIGNATURE_LENGTH:
+            self.head += data[:SIGNATURE_LENGTH - len(self.head)]
+        self._store(self._filter.feed(data))
+        return len(data)
+
+    def _store(self, data):
+        self.size += len(data)
+        self._sha256.update(data)
+        self._file.write(data)
+
+    def _finish(self):
+        """Write out what the metadata filter still holds once the upload is complete"""
+        if self._filter is not None:
+            self._store(self._filter.finish())
+            self._filter = None
+            self._file.flush()
+
+    def seek(self, *args):
+        # Readers rewind first, so the file is complete by the time they read
+        self._finish()
+        return self._file.seek(*args)
+
+    def hexdigest(self):
+        self._finish()
+        return self._sha256.hexdigest()
+
+    def persist(self, path):
+        """Move the finished upload to its final path"""
+        self._finish()
+        self._file.close()
+        shutil.move(self.path, path)
+        self.path = path
+        self._persisted = True
+
+    def close(self):
+        self._file.close()
+        if not self._persisted:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    """Request that streams multipart file parts to disk through HashingFileStream"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        max_size = current_app.config.get('MAX_FILE_SIZE', MAX_FILE_SIZE)
+        if content_length is not None and content_length > max_size:
+            raise RequestEntityTooLarge()
+        stream = HashingFileStream(incoming_folder(current_app.config['UPLOAD_FOLDER']), max_size)
+        # Parts abandoned mid-parse never reach request.files, so track them here
+        self.__dict__.setdefault('_upload_streams', []).append(stream)
+        return stream
+
+    def close(self):
+        super().close()
+        for stream in self.__dict__.get('_upload_streams', ()):
+            stream.close()
+
+
+def content_path(sha256, ext):
+    """Sharded relative path of a content-addressed upload: ab/cd/<sha256>.<ext>"""
+    return f'{sha256[:2]}/{sha256[2:4]}/{sha256}.{ext}'
+
+
+def save_uploaded_file(file, upload_folder='uploads', max_size=MAX_FILE_SIZE):
+    """Store an uploaded image under the SHA-256 of its content.
+
+    Files parsed by ``UploadRequest`` are already on disk, stripped of
+    metadata and hashed, so storing them is a rename; other file objects are
+    copied through the same stream in chunks. When
+    the content is already on disk nothing is written; whether it is new to
+    the store is decided by ``StoredFile.register``, not by the file. Raises
+    RequestEntityTooLarge for oversized files.
+    """
+    stream = None
     try:
         if not file or not file.filename:
             return None, "No file provided."
@@ -18,34 +170,46 @@ def save_uploaded_file(file, upload_folder='uploads'):
         if not allowed_file(file.filename):
             return None, "File type not allowed."
 
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)
-        if file_size > MAX_FILE_SIZE:
-            return None, "File exceeds maximum allowed size (5MB)."
-
         os.makedirs(upload_folder, exist_ok=True)
+        stream = file.stream
+        if not isinstance(stream, HashingFileStream):
+            stream = HashingFileStream.from_file(stream, incoming_folder(upload_folder), max_size)
+        elif stream.received > max_size:
+            raise RequestEntityTooLarge()
 
-        ext = file.filename.rsplit('.', 1)[1].lower()
-        filename = f"{uuid.uuid4()}.{ext}"
-        safe_name = re.sub(r'[^\w\s-]', '', filename).strip()[:255]
-        file_path = os.path.join(upload_folder, safe_name)
+        ext = detect_image_type(stream.head)
+        if ext is None:
+            return None, "File content is not a supported image."
 
-        file.save(file_path)
+        sha256 = stream.hexdigest()
+        filename = content_path(sha256, ext)
+        target = os.path.join(upload_folder, filename)
+        if os.path.exists(target):
+            # Restart the age prune_stored_files judges files without a row by
+            os.utime(target)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            stream.persist(target)
 
         return {
-            "filename": safe_name,
-            "url": f"/uploads/{safe_name}",
-            "size": file_size
+            "filename": filename,
+            "url": f"/uploads/{filename}",
+            "size": stream.size,
+            "sha256": sha256
         }, "File uploaded successfully."
 
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         return None, f"Upload failed: {str(e)}"
+    finally:
+        if stream is not None and stream is not file.stream:
+            stream.close()
 
 
-def upload_file(file, upload_folder='uploads'):
+def upload_file(file, upload_folder='uploads', max_size=MAX_FILE_SIZE):
     """Simple wrapper for save_uploaded_file that returns just the URL"""
-    result, message = save_uploaded_file(file, upload_folder)
+    result, message = save_uploaded_file(file, upload_folder, max_size)
     if result:
         return result['url']
     else:
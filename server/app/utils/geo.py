@@ -0,0 +1,164 @@
+import math
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 12
+
+# Finest geohash precision kept in the map grid rollups (~1.2km x 0.6km cells)
+GRID_MAX_PRECISION = 6
+EARTH_RADIUS_KM = 6371.0088
+
+# Upper bound of a geohash prefix range; sorts after every alphabet character
+GEOHASH_RANGE_END = '~'
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Encode a coordinate as a geohash string"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        interval, value = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(chars)
+
+
+def geohash_bbox(geohash):
+    """Return the (min_lat, min_lng, max_lat, max_lng) box of a geohash cell"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        value = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            interval = lng_range if even else lat_range
+            mid = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = mid
+            else:
+                interval[1] = mid
+            even = not even
+
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def cell_size(precision):
+    """Return the (lat_degrees, lng_degrees) size of a geohash cell"""
+    bits = precision * 5
+    lng_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def _cell_index_ranges(min_lat, min_lng, max_lat, max_lng, precision):
+    lat_size, lng_size = cell_size(precision)
+    lat_cells = 1 << ((precision * 5) // 2)
+    lng_cells = 1 << ((precision * 5 + 1) // 2)
+    rows = range(
+        max(int((min_lat + 90.0) // lat_size), 0),
+        min(int((max_lat + 90.0) // lat_size), lat_cells - 1) + 1
+    )
+    cols = range(
+        max(int((min_lng + 180.0) // lng_size), 0),
+        min(int((max_lng + 180.0) // lng_size), lng_cells - 1) + 1
+    )
+    return rows, cols, lat_size, lng_size
+
+
+def covering_cell_count(min_lat, min_lng, max_lat, max_lng, precision):
+    """Number of geohash cells of a precision that cover a bounding box"""
+    rows, cols, _, _ = _cell_index_ranges(min_lat, min_lng, max_lat, max_lng, precision)
+    return len(rows) * len(cols)
+
+
+def covering_cells(min_lat, min_lng, max_lat, max_lng, precision):
+    """Return the geohash cells of a precision that cover a bounding box"""
+    rows, cols, lat_size, lng_size = _cell_index_ranges(min_lat, min_lng, max_lat, max_lng, precision)
+    return sorted({
+        encode_geohash(-90.0 + (row + 0.5) * lat_size, -180.0 + (col + 0.5) * lng_size, precision)
+        for row in rows for col in cols
+    })
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """Return the bounding boxes enclosing a circle, split at the antimeridian"""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat = max(latitude - lat_delta, -90.0)
+    max_lat = min(latitude + lat_delta, 90.0)
+
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+
+    lng_delta = math.degrees(radius_km / (EARTH_RADIUS_KM * max(math.cos(math.radians(latitude)), 1e-6)))
+    if lng_delta >= 180.0:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+
+    min_lng = longitude - lng_delta
+    max_lng = longitude + lng_delta
+    if min_lng < -180.0:
+        return [(min_lat, min_lng + 360.0, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lng)]
+    if max_lng > 180.0:
+        return [(min_lat, min_lng, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lng - 360.0)]
+    return [(min_lat, min_lng, max_lat, max_lng)]
+
+
+def cells_for_radius(latitude, longitude, radius_km, max_cells=16):
+    """Return the finest set of at most max_cells geohash prefixes covering a circle"""
+    boxes = bounding_box(latitude, longitude, radius_km)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        if sum(covering_cell_count(*box, precision) for box in boxes) <= max_cells:
+            return sorted({cell for box in boxes for cell in covering_cells(*box, precision)})
+    return sorted({cell for box in boxes for cell in covering_cells(*box, 1)})
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two coordinates in kilometres"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def tile_bbox(z, x, y):
+    """Return the (min_lat, min_lng, max_lat, max_lng) box of a Web Mercator tile"""
+    n = 1 << z
+    min_lng = x / n * 360.0 - 180.0
+    max_lng = (x + 1) / n * 360.0 - 180.0
+    max_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    min_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return min_lat, min_lng, max_lat, max_lng
+
+
+def tile_for_point(latitude, longitude, z):
+    """Return the (x, y) Web Mercator tile containing a coordinate at zoom z"""
+    n = 1 << z
+    latitude = max(min(latitude, 85.05112878), -85.05112878)
+    x = int((longitude + 180.0) / 360.0 * n)
+    lat_radians = math.radians(latitude)
+    y = int((1 - math.asinh(math.tan(lat_radians)) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def geohash_center(geohash):
+    """Return the (latitude, longitude) centre of a geohash cell"""
+    min_lat, min_lng, max_lat, max_lng = geohash_bbox(geohash)
+    return (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
@@ -0,0 +1,51 @@
+import hashlib
+import json
+from datetime import timezone
+
+from flask import current_app, request
+
+from app.models.cache_version import get_versions, GLOBAL_SCOPE
+
+
+class ConditionalGet:
+    """HTTP validators for a GET response built from cache version counters.
+
+    The ETag hashes the versions of the scopes the response is built from,
+    the request path and query string and, for private resources, the user.
+    Check ``is_fresh()`` before loading or serializing anything else.
+    """
+
+    def __init__(self, scopes, cache_control='public, no-cache', user_id=None):
+        versions = get_versions(sorted(set(scopes) | {GLOBAL_SCOPE}))
+        key = json.dumps([
+            [[scope, version] for scope, (version, _) in sorted(versions.items())],
+            request.full_path,
+            user_id
+        ])
+        self.etag = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+        modified = [updated_at for _, updated_at in versions.values() if updated_at]
+        self.last_modified = max(modified).replace(microsecond=0, tzinfo=timezone.utc) if modified else None
+        self.cache_control = cache_control
+        self.private = user_id is not None
+
+    def is_fresh(self):
+        """Whether the client's cached copy is still current"""
+        if request.if_none_match:
+            return request.if_none_match.contains(self.etag)
+        if request.if_modified_since and self.last_modified:
+            return self.last_modified <= request.if_modified_since
+        return False
+
+    def apply(self, response):
+        """Attach the validators and caching policy to a response"""
+        response.set_etag(self.etag)
+        if self.last_modified:
+            response.last_modified = self.last_modified
+        response.headers['Cache-Control'] = self.cache_control
+        if self.private:
+            response.vary.add('Authorization')
+        return response
+
+    def not_modified(self):
+        """Empty 304 response carrying the current validators"""
+        return self.apply(current_app.response_class(status=304))
@@ -0,0 +1,213 @@
+"""Lossless metadata stripping for uploaded images.
+
+``MetadataFilter`` is fed an upload chunk by chunk and returns the bytes to
+store, so it runs while the upload streams to disk and before it is hashed.
+It drops the segments that carry EXIF (GPS included), XMP, IPTC and
+comments from JPEGs, and the text, time and EXIF chunks from PNGs; image
+data is copied untouched, nothing is decoded or re-encoded. A JPEG's EXIF
+orientation is kept in a minimal EXIF segment of its own, so photos still
+display upright. Data that does not parse as expected, and other formats,
+are passed through as-is.
+"""
+JPEG_SOI = b'\xff\xd8'
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# JPEG markers without a length field
+JPEG_STANDALONE_MARKERS = {0x01, 0xd8} | set(range(0xd0, 0xd8))
+JPEG_EOI, JPEG_SOS, JPEG_APP1, JPEG_COM = 0xd9, 0xda, 0xe1, 0xfe
+# APPn segments kept: JFIF/JFXX, ICC profiles and Adobe color transforms
+JPEG_KEPT_APPS = ((0xe0, b''), (0xe2, b'ICC_PROFILE\x00'), (0xee, b'Adobe'))
+JPEG_APP_ID_LENGTH = 12
+EXIF_HEADER = b'Exif\x00\x00'
+EXIF_ORIENTATION_TAG = 0x0112
+
+PNG_METADATA_CHUNKS = {b'eXIf', b'tEXt', b'zTXt', b'iTXt', b'tIME'}
+PNG_IEND = b'IEND'
+
+
+def exif_orientation(payload):
+    """Orientation (1-8) recorded in an EXIF APP1 payload, or None"""
+    tiff = payload[len(EXIF_HEADER):]
+    byteorder = {b'II': 'little', b'MM': 'big'}.get(bytes(tiff[:2]))
+    if byteorder is None or len(tiff) < 8:
+        return None
+    ifd = int.from_bytes(tiff[4:8], byteorder)
+    count = int.from_bytes(tiff[ifd:ifd + 2], byteorder)
+    for start in range(ifd + 2, ifd + 2 + 12 * count, 12):
+        entry = tiff[start:start + 12]
+        if len(entry) < 12:
+            break
+        if int.from_bytes(entry[:2], byteorder) == EXIF_ORIENTATION_TAG:
+            orientation = int.from_bytes(entry[8:10], byteorder)
+            return orientation if 1 <= orientation <= 8 else None
+    return None
+
+
+def orientation_segment(orientation):
+    """A JPEG APP1 segment holding nothing but an EXIF orientation"""
+    tiff = b''.join((
+        b'MM\x00\x2a', (8).to_bytes(4, 'big'),
+        (1).to_bytes(2, 'big'),
+        EXIF_ORIENTATION_TAG.to_bytes(2, 'big'), (3).to_bytes(2, 'big'), (1).to_bytes(4, 'big'),
+        orientation.to_bytes(2, 'big'), b'\x00\x00',
+        (0).to_bytes(4, 'big')
+    ))
+    payload = EXIF_HEADER + tiff
+    return b'\xff' + bytes([JPEG_APP1]) + (len(payload) + 2).to_bytes(2, 'big') + payload
+
+
+class MetadataFilter:
+    """Streaming filter that removes metadata from JPEG and PNG uploads"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._state = self._detect
+        self._remaining = 0  # Bytes left of the segment being copied or skipped
+        self._then = None  # State after that segment
+
+    def feed(self, data):
+        """Take the next chunk of the upload; returns the bytes to store"""
+        self._buffer += data
+        output = bytearray()
+        while self._buffer and self._state(output):
+            pass
+        return bytes(output)
+
+    def finish(self):
+        """Return whatever is left once the upload has ended"""
+        tail, self._buffer = bytes(self._buffer), bytearray()
+        if self._state in (self._skip, self._discard) or self._holds_jpeg_metadata(tail):
+            return b''
+        return tail
+
+    # Each state consumes from the buffer and returns False when it needs more data
+
+    def _detect(self, output):
+        if len(self._buffer) < len(PNG_SIGNATURE) and \
+                (PNG_SIGNATURE.startswith(self._buffer) or JPEG_SOI.startswith(self._buffer[:2])):
+            return False
+        if self._buffer.startswith(JPEG_SOI):
+            self._emit(output, len(JPEG_SOI))
+            self._state = self._jpeg_marker
+        elif self._buffer.startswith(PNG_SIGNATURE):
+            self._emit(output, len(PNG_SIGNATURE))
+            self._state = self._png_chunk
+        else:
+            self._state = self._copy
+        return True
+
+    def _copy(self, output):
+        self._emit(output, len(self._buffer))
+        return True
+
+    def _discard(self, output):
+        self._buffer.clear()
+        return True
+
+    def _copy_segment(self, output):
+        count = min(self._remaining, len(self._buffer))
+        self._emit(output, count)
+        self._remaining -= count
+        if not self._remaining:
+            self._state = self._then
+        return True
+
+    def _skip(self, output):
+        count = min(self._remaining, len(self._buffer))
+        del self._buffer[:count]
+        self._remaining -= count
+        if not self._remaining:
+            self._state = self._then
+        return True
+
+    def _segment(self, length, keep, then):
+        self._remaining, self._then = length, then
+        self._state = self._copy_segment if keep else self._skip
+
+    def _jpeg_marker(self, output):
+        buffer = self._buffer
+        if len(buffer) < 2:
+            return False
+        if buffer[0] != 0xff:
+            self._state = self._copy
+            return True
+        marker = buffer[1]
+        if marker == 0xff:
+            # Fill byte before a marker
+            del buffer[:1]
+            return True
+        if marker == JPEG_EOI:
+            # Anything after the image, like embedded previews, is dropped
+            self._emit(output, 2)
+            self._state = self._discard
+            return True
+        if marker in JPEG_STANDALONE_MARKERS:
+            self._emit(output, 2)
+            return True
+        if len(buffer) < 4:
+            return False
+
+        length = int.from_bytes(buffer[2:4], 'big') + 2
+        if length < 4:
+            self._state = self._copy
+        elif marker == JPEG_SOS:
+            self._segment(length, True, self._jpeg_entropy)
+        elif 0xe0 <= marker <= 0xef or marker == JPEG_COM:
+            return self._jpeg_metadata(output, marker, length)
+        else:
+            self._segment(length, True, self._jpeg_marker)
+        return True
+
+    def _jpeg_metadata(self, output, marker, length):
+        buffer = self._buffer
+        if marker == JPEG_APP1 and buffer[4:4 + len(EXIF_HEADER)] == EXIF_HEADER:
+            if len(buffer) < length:
+                return False
+            orientation = exif_orientation(buffer[4:length])
+            del buffer[:length]
+            if orientation and orientation != 1:
+                output += orientation_segment(orientation)
+            return True
+        if len(buffer) < min(length, 4 + JPEG_APP_ID_LENGTH):
+            return False
+        identifier = bytes(buffer[4:4 + JPEG_APP_ID_LENGTH])
+        keep = any(marker == kept and identifier.startswith(prefix) for kept, prefix in JPEG_KEPT_APPS)
+        self._segment(length, keep, self._jpeg_marker)
+        return True
+
+    def _jpeg_entropy(self, output):
+        buffer = self._buffer
+        position = buffer.find(b'\xff')
+        if position == -1:
+            self._emit(output, len(buffer))
+            return True
+        self._emit(output, position)
+        if len(buffer) < 2:
+            return False
+        # Stuffed bytes and restart markers belong to the scan
+        if buffer[1] == 0x00 or 0xd0 <= buffer[1] <= 0xd7:
+            self._emit(output, 2)
+        else:
+            self._state = self._jpeg_marker
+        return True
+
+    def _png_chunk(self, output):
+        buffer = self._buffer
+        if len(buffer) < 8:
+            return False
+        length = int.from_bytes(buffer[:4], 'big') + 12
+        chunk_type = bytes(buffer[4:8])
+        if chunk_type == PNG_IEND:
+            self._segment(length, True, self._discard)
+        else:
+            self._segment(length, chunk_type not in PNG_METADATA_CHUNKS, self._png_chunk)
+        return True
+
+    def _holds_jpeg_metadata(self, tail):
+        """Whether an unfinished tail is the start of a JPEG metadata segment"""
+        return self._state == self._jpeg_marker and len(tail) >= 2 and tail[0] == 0xff and \
+            (0xe1 <= tail[1] <= 0xef or tail[1] == JPEG_COM)
+
+    def _emit(self, output, count):
+        output += self._buffer[:count]
+        del self._buffer[:count]
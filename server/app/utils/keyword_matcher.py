@@ -0,0 +1,93 @@
+"""Multi-pattern keyword matching.
+
+``KeywordMatcher`` compiles keyword tables once into a lookup from every
+accepted word form to its label. Each call tokenizes and counts the text
+in one pass done by C code (``bytes.translate``, ``split`` and
+``Counter``), so the Python-level work depends on the number of keywords,
+not on the length of the text.
+"""
+from collections import Counter
+
+# ASCII punctuation and whitespace become word separators; bytes of
+# non-ASCII characters are kept, so accented letters still join words
+SEPARATORS = bytes(byte for byte in range(128) if not (chr(byte).isalnum() or chr(byte) == '_'))
+SEPARATOR_TABLE = bytes.maketrans(SEPARATORS, b' ' * len(SEPARATORS))
+
+
+def tokenize(text):
+    """Lowercased UTF-8 words of a text"""
+    return text.lower().encode('utf-8').translate(SEPARATOR_TABLE).split()
+
+
+class KeywordMatcher:
+    """Counts whole-word keyword hits per label.
+
+    Matching is case-insensitive and ignores punctuation and spacing
+    between the words of a multi-word keyword. A keyword only matches as a
+    whole word (``air`` does not match ``repair``), optionally followed by
+    a plural ``s`` so ``tree`` also matches ``trees``. Where keywords
+    overlap the longest one wins, so ``global warming`` is not also a
+    ``warming`` hit.
+    """
+
+    def __init__(self, keywords_by_label):
+        self.labels = list(keywords_by_label)
+        words = {}
+        phrases = {}
+        for label, keywords in keywords_by_label.items():
+            for keyword in keywords:
+                parts = tuple(tokenize(keyword))
+                if len(parts) == 1:
+                    words.setdefault(parts[0], label)
+                elif parts:
+                    phrases.setdefault(parts, label)
+
+        # Exact keywords take precedence over another keyword's plural form
+        forms = {word + b's': word for word in words}
+        forms.update({word: word for word in words})
+        self._word_forms = [(form, words[word]) for form, word in forms.items()]
+
+        # Phrases are counted in the text re-joined with double spaces, so
+        # back-to-back occurrences each keep a separator on both sides
+        self._phrases = []
+        for parts, label in phrases.items():
+            needles = [b' %s ' % b'  '.join(parts), b' %s ' % b'  '.join(parts[:-1] + (parts[-1] + b's',))]
+            overlapping = [words[forms[part]] for part in parts if part in forms]
+            self._phrases.append((parts[0], needles, label, overlapping))
+
+    def count(self, text):
+        """Return a Counter of whole-word keyword hits per label"""
+        tokens = tokenize(text)
+        occurrences = Counter(tokens)
+        counts = Counter()
+        for form, label in self._word_forms:
+            hits = occurrences[form]
+            if hits:
+                counts[label] += hits
+
+        joined = None
+        for first, needles, label, overlapping in self._phrases:
+            if not occurrences[first]:
+                continue
+            if joined is None:
+                joined = b'  %s  ' % b'  '.join(tokens)
+            hits = sum(joined.count(needle) for needle in needles)
+            if hits:
+                counts[label] += hits
+                # Words inside the phrase were also counted on their own
+                for word_label in overlapping:
+                    counts[word_label] -= hits
+        return +counts
+
+    def classify(self, text, default='general'):
+        """Return (label, confidence) for the label with the most hits.
+
+        Ties go to the label listed first. Confidence grows with the number
+        of hits and with the winning label's share of all hits.
+        """
+        counts = self.count(text)
+        if not counts:
+            return default, 0.5
+        best = max(self.labels, key=lambda label: counts[label])
+        share = counts[best] / sum(counts.values())
+        return best, round(min(0.95, 0.5 + 0.15 * share + 0.05 * min(counts[best], 6)), 2)
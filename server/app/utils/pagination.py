@@ -0,0 +1,93 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def _encode(values):
+    payload = json.dumps(values, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+
+
+def encode_cursor(item, direction='next'):
+    """Encode an opaque cursor pointing at an item's (created_at, id) key"""
+    return _encode([item.created_at.isoformat(), item.id, direction])
+
+
+def decode_cursor(cursor):
+    """Decode a cursor into (created_at, id, direction)"""
+    try:
+        created_at, item_id, direction = _decode(cursor)
+        if direction not in ('next', 'prev'):
+            raise ValueError(direction)
+        return datetime.fromisoformat(created_at), int(item_id), direction
+    except Exception:
+        raise InvalidCursorError('Cursor is malformed or expired')
+
+
+def encode_distance_cursor(distance_km, item_id):
+    """Encode an opaque cursor pointing at a (distance_km, id) key"""
+    return _encode([distance_km, item_id])
+
+
+def decode_distance_cursor(cursor):
+    """Decode a distance cursor into (distance_km, id)"""
+    try:
+        distance_km, item_id = _decode(cursor)
+        return float(distance_km), int(item_id)
+    except Exception:
+        raise InvalidCursorError('Cursor is malformed or expired')
+
+
+def keyset_paginate(query, model, cursor, per_page):
+    """Paginate a query newest-first by (created_at, id) using a keyset cursor.
+
+    An empty cursor returns the first page. Returns the page items and the
+    pagination block with next/prev cursors; no COUNT query is issued.
+    """
+    direction = 'next'
+    if cursor:
+        created_at, item_id, direction = decode_cursor(cursor)
+        if direction == 'next':
+            query = query.filter(or_(
+                model.created_at < created_at,
+                and_(model.created_at == created_at, model.id < item_id)
+            ))
+        else:
+            query = query.filter(or_(
+                model.created_at > created_at,
+                and_(model.created_at == created_at, model.id > item_id)
+            ))
+
+    if direction == 'next':
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.created_at.asc(), model.id.asc())
+
+    items = query.limit(per_page + 1).all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+
+    if direction == 'next':
+        has_next, has_prev = has_more, bool(cursor)
+    else:
+        items.reverse()
+        has_next, has_prev = True, has_more
+
+    return items, {
+        'per_page': per_page,
+        'has_next': has_next and bool(items),
+        'has_prev': has_prev and bool(items),
+        'next_cursor': encode_cursor(items[-1], 'next') if has_next and items else None,
+        'prev_cursor': encode_cursor(items[0], 'prev') if has_prev and items else None
+    }
@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+
+from app.utils.geo import encode_geohash, geohash_center, tile_for_point, GRID_MAX_PRECISION
+
+
+class TileCache:
+    """Per-process LRU cache of rendered map tiles.
+
+    Writes made in this process invalidate the affected tiles on commit; the
+    TTL bounds how long other workers can serve a tile after a remote write.
+    """
+
+    def __init__(self, max_entries=2048, ttl=60, max_zoom=22):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_zoom = max_zoom
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, max_entries=None, ttl=None):
+        if max_entries is not None:
+            self.max_entries = max_entries
+        if ttl is not None:
+            self.ttl = ttl
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_points(self, points):
+        """Drop every cached tile that can contain one of the given coordinates.
+
+        Cluster tiles assign a grid cell to the tile holding the cell centre,
+        so the tiles holding each ancestor cell's centre are dropped as well.
+        """
+        anchors = set()
+        for latitude, longitude in points:
+            anchors.add((latitude, longitude))
+            geohash = encode_geohash(latitude, longitude, GRID_MAX_PRECISION)
+            for precision in range(1, GRID_MAX_PRECISION + 1):
+                anchors.add(geohash_center(geohash[:precision]))
+
+        with self._lock:
+            if not self._entries:
+                return
+            for z in range(self.max_zoom + 1):
+                for latitude, longitude in anchors:
+                    x, y = tile_for_point(latitude, longitude, z)
+                    self._entries.pop((z, x, y), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+tile_cache = TileCache()
@@ -0,0 +1,85 @@
+"""End-to-end report analysis latency: one combined LLM call versus two.
+
+Runs ``AIService.analyze_report`` against a mock LLM that sleeps for a
+fixed round-trip time plus a per-output-token generation time, with the
+result cache disabled. Run from the server directory:
+
+    python benchmarks/ai_analysis.py [--reports 50] [--round-trip 0.25] [--per-token 0.004]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.ai_cache import ai_cache
+from app.services.ai_service import AIService, CHARS_PER_TOKEN
+
+ADVICE = ('Document the spill with photos and note the exact location. Report it to the local '
+          'environmental agency and keep people and pets away from the affected water.')
+
+
+class MockLLM:
+    """Answers the classify, advice and combined prompts after a simulated delay"""
+
+    def __init__(self, round_trip, per_token):
+        self.round_trip = round_trip
+        self.per_token = per_token
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages, timeout=None, **params):
+        prompt = messages[0]['content']
+        if '"advice"' in prompt:
+            content = json.dumps({'category': 'water-issues', 'confidence': 0.9, 'advice': ADVICE})
+        elif '"category"' in prompt:
+            content = json.dumps({'category': 'water-issues', 'confidence': 0.9})
+        else:
+            content = ADVICE
+        self.calls += 1
+        self.prompt_tokens += len(prompt) // CHARS_PER_TOKEN
+        time.sleep(self.round_trip + self.per_token * (len(content) // CHARS_PER_TOKEN))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def run(combined, reports, round_trip, per_token):
+    service = AIService()
+    service.client = MockLLM(round_trip, per_token)
+    service.combined_analysis = combined
+    latencies = []
+    for index in range(reports):
+        report = SimpleNamespace(id=index, title=f'Oil spill {index}', description='Oil floating on the river',
+                                 location='Riverside', image_url=None)
+        start = time.perf_counter()
+        service.analyze_report(report)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        'mean': statistics.mean(latencies),
+        'p95': latencies[int(len(latencies) * 0.95) - 1],
+        'calls': service.client.calls / reports,
+        'prompt_tokens': service.client.prompt_tokens / reports
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reports', type=int, default=50, help='reports analyzed per mode')
+    parser.add_argument('--round-trip', type=float, default=0.25, help='seconds per call before generation')
+    parser.add_argument('--per-token', type=float, default=0.004, help='seconds per generated token')
+    args = parser.parse_args()
+
+    ai_cache.enabled = False
+    for name, combined in (('two calls', False), ('combined', True)):
+        result = run(combined, args.reports, args.round_trip, args.per_token)
+        print(f"{name:>9}: mean {result['mean'] * 1000:.0f} ms, p95 {result['p95'] * 1000:.0f} ms, "
+              f"{result['calls']:.1f} calls and ~{result['prompt_tokens']:.0f} prompt tokens per report")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Throughput of the keyword fallback classifier on long descriptions.
+
+Compares the compiled matcher against the per-category substring scan it
+replaced, which stops at the first category with any hit and ignores word
+boundaries, and against one boundary-aware regex per keyword, which counts
+every category like the matcher does. Run from the server directory:
+
+    python benchmarks/keyword_matcher.py [--length 5000] [--texts 200]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.ai_service import KEYWORD_CATEGORIES, keyword_matcher
+
+FILLER = ('the a report near our street was seen again by residents who said it '
+          'has been getting worse every week since spring').split()
+
+
+def substring_scan(text):
+    """The previous fallback: first category with any substring hit"""
+    text_lower = text.lower()
+    for category, keywords in KEYWORD_CATEGORIES.items():
+        if any(keyword in text_lower for keyword in keywords):
+            return category
+    return 'general'
+
+
+KEYWORD_PATTERNS = [
+    (re.compile(r'(?<!\w)' + r'\s+'.join(map(re.escape, keyword.split())) + r's?(?!\w)', re.IGNORECASE), category)
+    for category, keywords in KEYWORD_CATEGORIES.items() for keyword in keywords
+]
+
+
+def regex_per_keyword(text):
+    """Every category counted with one whole-word regex per keyword"""
+    counts = {}
+    for pattern, category in KEYWORD_PATTERNS:
+        hits = len(pattern.findall(text))
+        if hits:
+            counts[category] = counts.get(category, 0) + hits
+    return max(counts, key=counts.get) if counts else 'general'
+
+
+def make_texts(count, length, seed=42):
+    rng = random.Random(seed)
+    keywords = [keyword for keywords in KEYWORD_CATEGORIES.values() for keyword in keywords]
+    texts = []
+    for _ in range(count):
+        words = []
+        while sum(len(word) + 1 for word in words) < length:
+            words.append(rng.choice(keywords) if rng.random() < 0.02 else rng.choice(FILLER))
+        texts.append(' '.join(words))
+    return texts
+
+
+def measure(function, texts, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            function(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--length', type=int, default=5000, help='characters per description')
+    parser.add_argument('--texts', type=int, default=200, help='descriptions per run')
+    parser.add_argument('--repeat', type=int, default=5, help='runs; the fastest is reported')
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts, args.length)
+    megabytes = sum(len(text) for text in texts) / 1e6
+    print(f'{args.texts} descriptions of ~{args.length} characters')
+    candidates = (
+        ('substring scan', substring_scan),
+        ('regex per keyword', regex_per_keyword),
+        ('compiled matcher', keyword_matcher.classify),
+    )
+    for name, function in candidates:
+        seconds = measure(function, texts, args.repeat)
+        print(f'{name:>18}: {args.texts / seconds:10.0f} texts/s  {megabytes / seconds:7.2f} MB/s')
+
+
+if __name__ == '__main__':
+    main()
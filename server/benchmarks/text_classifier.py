@@ -0,0 +1,64 @@
+"""Training time, model size and prediction throughput of the local classifier.
+
+Uses synthetic reports built from the keyword tables. Run from the server
+directory:
+
+    python benchmarks/text_classifier.py [--train 2000] [--words 60]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.ai_service import KEYWORD_CATEGORIES
+from app.services.text_classifier import TextClassifier
+
+FILLER = ('the a report near our street was seen again by residents who said it '
+          'has been getting worse every week since spring').split()
+
+
+def make_reports(count, words, seed=42):
+    rng = random.Random(seed)
+    categories = list(KEYWORD_CATEGORIES)
+    texts, labels = [], []
+    for _ in range(count):
+        category = rng.choice(categories)
+        keywords = KEYWORD_CATEGORIES[category]
+        texts.append(' '.join(rng.choice(keywords) if rng.random() < 0.1 else rng.choice(FILLER)
+                              for _ in range(words)))
+        labels.append(category)
+    return texts, labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--train', type=int, default=2000, help='training reports')
+    parser.add_argument('--test', type=int, default=2000, help='reports classified')
+    parser.add_argument('--words', type=int, default=60, help='words per report')
+    args = parser.parse_args()
+
+    texts, labels = make_reports(args.train + args.test, args.words)
+
+    start = time.perf_counter()
+    model = TextClassifier.train(texts[:args.train], labels[:args.train])
+    print(f'trained on {args.train} reports in {time.perf_counter() - start:.2f}s')
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'model.json.gz')
+        model.save(path)
+        print(f'model file: {os.path.getsize(path) / 1024:.0f} KiB, {len(model.deltas)} features')
+
+    start = time.perf_counter()
+    predictions = [model.predict(text) for text in texts[args.train:]]
+    seconds = time.perf_counter() - start
+    correct = sum(1 for prediction, label in zip(predictions, labels[args.train:])
+                  if prediction and prediction[0] == label)
+    print(f'classified {args.test / seconds:.0f} texts/s, accuracy {correct / args.test:.1%}')
+
+
+if __name__ == '__main__':
+    main()
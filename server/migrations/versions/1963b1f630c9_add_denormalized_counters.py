@@ -0,0 +1,65 @@
+"""Add denormalized counter columns
+
+Revision ID: 1963b1f630c9
+Revises: 6852da23b7b2
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1963b1f630c9'
+down_revision = '6852da23b7b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reports_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('comments_count', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('comments_count', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('replies_count', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('tags', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reports_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill from existing rows
+    op.execute(
+        'UPDATE users SET '
+        'reports_count = (SELECT COUNT(*) FROM reports WHERE reports.user_id = users.id), '
+        'comments_count = (SELECT COUNT(*) FROM comments WHERE comments.user_id = users.id)'
+    )
+    op.execute(
+        'UPDATE reports SET '
+        'comments_count = (SELECT COUNT(*) FROM comments WHERE comments.report_id = reports.id)'
+    )
+    op.execute(
+        'UPDATE comments SET '
+        'replies_count = (SELECT COUNT(*) FROM comments AS replies WHERE replies.parent_id = comments.id)'
+    )
+    op.execute(
+        'UPDATE tags SET '
+        'reports_count = (SELECT COUNT(*) FROM report_tags WHERE report_tags.tag_id = tags.id)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('tags', schema=None) as batch_op:
+        batch_op.drop_column('reports_count')
+
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.drop_column('replies_count')
+
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.drop_column('comments_count')
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('comments_count')
+        batch_op.drop_column('reports_count')
@@ -0,0 +1,46 @@
+"""Add geohash cell column to reports
+
+Revision ID: 47c1b8afeed2
+Revises: 7966588ea3ee
+Create Date: 2026-10-18 11:26:54.304417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.geo import encode_geohash
+
+
+# revision identifiers, used by Alembic.
+revision = '47c1b8afeed2'
+down_revision = '7966588ea3ee'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('geohash', sa.String(length=12), nullable=True))
+
+    # Backfill cells for existing located reports
+    bind = op.get_bind()
+    reports = sa.table('reports', sa.column('id'), sa.column('latitude'),
+                       sa.column('longitude'), sa.column('geohash'))
+    rows = bind.execute(
+        sa.select(reports.c.id, reports.c.latitude, reports.c.longitude)
+        .where(reports.c.latitude.isnot(None), reports.c.longitude.isnot(None))
+    ).fetchall()
+    for report_id, latitude, longitude in rows:
+        bind.execute(
+            reports.update().where(reports.c.id == report_id)
+            .values(geohash=encode_geohash(latitude, longitude))
+        )
+
+    op.create_index('ix_reports_geohash', 'reports', ['geohash'])
+
+
+def downgrade():
+    op.drop_index('ix_reports_geohash', table_name='reports')
+
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.drop_column('geohash')
@@ -0,0 +1,69 @@
+"""Add full-text search index for reports
+
+Revision ID: 5d2c81f0a6e4
+Revises: b3947af7b24b
+Create Date: 2026-10-18 13:20:44.512907
+
+SQLite gets an external-content FTS5 table kept current by triggers and is
+rebuilt from the existing rows; PostgreSQL gets a generated tsvector column
+with a GIN index.
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2c81f0a6e4'
+down_revision = 'b3947af7b24b'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5("
+    "title, description, content='reports', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS reports_fts_ai AFTER INSERT ON reports BEGIN "
+    "INSERT INTO reports_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS reports_fts_ad AFTER DELETE ON reports BEGIN "
+    "INSERT INTO reports_fts(reports_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS reports_fts_au AFTER UPDATE OF title, description ON reports BEGIN "
+    "INSERT INTO reports_fts(reports_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO reports_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "INSERT INTO reports_fts(reports_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS reports_fts_au",
+    "DROP TRIGGER IF EXISTS reports_fts_ad",
+    "DROP TRIGGER IF EXISTS reports_fts_ai",
+    "DROP TABLE IF EXISTS reports_fts",
+]
+
+POSTGRES_UPGRADE = [
+    "ALTER TABLE reports ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_reports_search_vector ON reports USING GIN (search_vector)",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP INDEX IF EXISTS ix_reports_search_vector",
+    "ALTER TABLE reports DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(sqlite_statements, postgres_statements):
+    dialect = op.get_bind().dialect.name
+    statements = {'sqlite': sqlite_statements, 'postgresql': postgres_statements}.get(dialect, [])
+    for statement in statements:
+        op.execute(statement)
+
+
+def upgrade():
+    _run(SQLITE_UPGRADE, POSTGRES_UPGRADE)
+
+
+def downgrade():
+    _run(SQLITE_DOWNGRADE, POSTGRES_DOWNGRADE)
@@ -0,0 +1,59 @@
+"""Add composite indexes for hot query shapes
+
+Revision ID: 7966588ea3ee
+Revises: 1963b1f630c9
+Create Date: 2026-10-18 10:03:17.562911
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7966588ea3ee'
+down_revision = '1963b1f630c9'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    # Public feed: is_public/status filter, newest first (routes/reports.py)
+    ('ix_reports_public_status_created', 'reports', ['is_public', 'status', 'created_at', 'id']),
+    # User feeds and profile activity (routes/reports.py, routes/profile.py)
+    ('ix_reports_user_created', 'reports', ['user_id', 'created_at', 'id']),
+    # Profile top category aggregation (routes/profile.py)
+    ('ix_reports_user_category', 'reports', ['user_id', 'ai_category']),
+    # Nearby bounding box (Report.get_by_location)
+    ('ix_reports_lat_lng', 'reports', ['latitude', 'longitude']),
+    # Report comment threads (routes/comments.py)
+    ('ix_comments_report_parent_created', 'comments', ['report_id', 'parent_id', 'created_at']),
+    # Replies of a comment (Comment.replies)
+    ('ix_comments_parent_created', 'comments', ['parent_id', 'created_at']),
+    # Profile activity (routes/profile.py)
+    ('ix_comments_user_created', 'comments', ['user_id', 'created_at']),
+    # Tag listing and popular tags (routes/tags.py, models/tag.py)
+    ('ix_tags_active_name', 'tags', ['is_active', 'name']),
+    ('ix_tags_reports_count', 'tags', ['reports_count']),
+    # Reverse lookup of the report/tag association
+    ('ix_report_tags_tag_id', 'report_tags', ['tag_id']),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, table, _ in reversed(INDEXES):
+                op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    else:
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,29 @@
+"""Add cache version counters
+
+Revision ID: 9a4e6c1d2b57
+Revises: e81f3a92c4d7
+Create Date: 2026-10-18 14:48:12.660391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4e6c1d2b57'
+down_revision = 'e81f3a92c4d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cache_versions',
+    sa.Column('scope', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('scope')
+    )
+
+
+def downgrade():
+    op.drop_table('cache_versions')
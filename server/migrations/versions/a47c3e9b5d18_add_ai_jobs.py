@@ -0,0 +1,54 @@
+"""Add AI job queue and report AI status
+
+Revision ID: a47c3e9b5d18
+Revises: f2b8d41c7e93
+Create Date: 2026-10-18 16:48:12.905316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a47c3e9b5d18'
+down_revision = 'f2b8d41c7e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ai_jobs',
+    sa.Column('report_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('priority', sa.Integer(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('run_at', sa.DateTime(), nullable=False),
+    sa.Column('locked_by', sa.String(length=100), nullable=True),
+    sa.Column('locked_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['report_id'], ['reports.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('ai_jobs', schema=None) as batch_op:
+        batch_op.create_index('ix_ai_jobs_claim', ['status', 'priority', 'run_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_ai_jobs_report_id'), ['report_id'], unique=False)
+
+    op.add_column('reports', sa.Column('ai_status', sa.String(length=20), nullable=True))
+    op.execute("UPDATE reports SET ai_status = 'done' WHERE ai_processed")
+
+
+def downgrade():
+    # A plain drop keeps the SQLite full-text triggers that a batch table
+    # rebuild would lose (needs SQLite 3.35+)
+    op.drop_column('reports', 'ai_status')
+
+    with op.batch_alter_table('ai_jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ai_jobs_report_id'))
+        batch_op.drop_index('ix_ai_jobs_claim')
+
+    op.drop_table('ai_jobs')
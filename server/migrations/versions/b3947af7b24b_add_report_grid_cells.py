@@ -0,0 +1,36 @@
+"""Add map grid rollup table
+
+Revision ID: b3947af7b24b
+Revises: 47c1b8afeed2
+Create Date: 2026-10-18 12:41:09.873160
+
+Run ``flask rebuild-grid`` after upgrading to populate the rollups from the
+existing reports; new writes keep them current.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3947af7b24b'
+down_revision = '47c1b8afeed2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('report_grid_cells',
+    sa.Column('cell', sa.String(length=6), nullable=False),
+    sa.Column('reports_count', sa.Integer(), nullable=False),
+    sa.Column('latitude_sum', sa.Float(), nullable=False),
+    sa.Column('longitude_sum', sa.Float(), nullable=False),
+    sa.Column('severity_counts', sa.JSON(), nullable=False),
+    sa.Column('category_counts', sa.JSON(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('cell')
+    )
+
+
+def downgrade():
+    op.drop_table('report_grid_cells')
@@ -0,0 +1,28 @@
+"""Add model and prompt version of report analyses
+
+Revision ID: b8c3f6e1d240
+Revises: d5e1f7a2c934
+Create Date: 2026-10-18 19:02:11.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8c3f6e1d240'
+down_revision = 'd5e1f7a2c934'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('reports', sa.Column('ai_model', sa.String(length=100), nullable=True))
+    op.add_column('reports', sa.Column('ai_prompt_version', sa.String(length=50), nullable=True))
+
+
+def downgrade():
+    # A plain drop keeps the SQLite full-text triggers that a batch table
+    # rebuild would lose (needs SQLite 3.35+)
+    op.drop_column('reports', 'ai_prompt_version')
+    op.drop_column('reports', 'ai_model')
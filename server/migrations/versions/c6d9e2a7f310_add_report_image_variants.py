@@ -0,0 +1,27 @@
+"""Add image variants to reports
+
+Revision ID: c6d9e2a7f310
+Revises: 9a4e6c1d2b57
+Create Date: 2026-10-18 15:21:05.204871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6d9e2a7f310'
+down_revision = '9a4e6c1d2b57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_variants', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    # A plain drop keeps the SQLite full-text triggers that a batch table
+    # rebuild would lose (needs SQLite 3.35+)
+    op.drop_column('reports', 'image_variants')
@@ -0,0 +1,46 @@
+"""Add AI result cache and report analysis input hash
+
+Revision ID: d5e1f7a2c934
+Revises: a47c3e9b5d18
+Create Date: 2026-10-18 17:31:40.552871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e1f7a2c934'
+down_revision = 'a47c3e9b5d18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ai_cache_entries',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('kind', sa.String(length=50), nullable=False),
+    sa.Column('model', sa.String(length=100), nullable=False),
+    sa.Column('prompt_version', sa.Integer(), nullable=False),
+    sa.Column('value', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    with op.batch_alter_table('ai_cache_entries', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ai_cache_entries_created_at'), ['created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_ai_cache_entries_expires_at'), ['expires_at'], unique=False)
+
+    op.add_column('reports', sa.Column('ai_input_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    # A plain drop keeps the SQLite full-text triggers that a batch table
+    # rebuild would lose (needs SQLite 3.35+)
+    op.drop_column('reports', 'ai_input_hash')
+
+    with op.batch_alter_table('ai_cache_entries', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ai_cache_entries_expires_at'))
+        batch_op.drop_index(batch_op.f('ix_ai_cache_entries_created_at'))
+
+    op.drop_table('ai_cache_entries')
@@ -0,0 +1,56 @@
+"""Add materialized thread paths to comments
+
+Revision ID: e81f3a92c4d7
+Revises: 5d2c81f0a6e4
+Create Date: 2026-10-18 14:02:37.118254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e81f3a92c4d7'
+down_revision = '5d2c81f0a6e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('root_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('depth', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('path', sa.String(length=255), nullable=True))
+        batch_op.create_foreign_key('fk_comments_root_id_comments', 'comments', ['root_id'], ['id'])
+
+    # Backfill thread positions; parents always have lower ids than their replies
+    bind = op.get_bind()
+    comments = sa.table('comments', sa.column('id'), sa.column('parent_id'), sa.column('root_id'),
+                        sa.column('depth'), sa.column('path'))
+    positions = {}
+    for comment_id, parent_id in bind.execute(
+        sa.select(comments.c.id, comments.c.parent_id).order_by(comments.c.id)
+    ).fetchall():
+        segment = str(comment_id).zfill(10)
+        parent = positions.get(parent_id)
+        if parent is None:
+            position = (comment_id, 0, segment)
+        else:
+            position = (parent[0], parent[1] + 1, f'{parent[2]}/{segment}')
+        positions[comment_id] = position
+        bind.execute(
+            comments.update().where(comments.c.id == comment_id)
+            .values(root_id=position[0], depth=position[1], path=position[2])
+        )
+
+    op.create_index('ix_comments_root_path', 'comments', ['root_id', 'path'])
+
+
+def downgrade():
+    op.drop_index('ix_comments_root_path', table_name='comments')
+
+    with op.batch_alter_table('comments', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_comments_root_id_comments', type_='foreignkey')
+        batch_op.drop_column('path')
+        batch_op.drop_column('depth')
+        batch_op.drop_column('root_id')
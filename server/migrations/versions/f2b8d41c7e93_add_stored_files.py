@@ -0,0 +1,34 @@
+"""Add content-addressed stored files
+
+Revision ID: f2b8d41c7e93
+Revises: c6d9e2a7f310
+Create Date: 2026-10-18 16:02:47.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b8d41c7e93'
+down_revision = 'c6d9e2a7f310'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stored_files',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('path', sa.String(length=255), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('variants', sa.JSON(), nullable=True),
+    sa.Column('uploaded_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    op.create_index('ix_reports_image_url', 'reports', ['image_url'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_reports_image_url', table_name='reports')
+    op.drop_table('stored_files')
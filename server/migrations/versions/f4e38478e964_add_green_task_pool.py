@@ -0,0 +1,44 @@
+"""Add pre-generated green task pools
+
+Revision ID: f4e38478e964
+Revises: b8c3f6e1d240
+Create Date: 2026-10-18 19:36:46.314429
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4e38478e964'
+down_revision = 'b8c3f6e1d240'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('green_tasks',
+    sa.Column('category', sa.String(length=50), nullable=False),
+    sa.Column('difficulty', sa.String(length=10), nullable=False),
+    sa.Column('title', sa.String(length=200), nullable=False),
+    sa.Column('title_key', sa.String(length=200), nullable=False),
+    sa.Column('task', sa.JSON(), nullable=False),
+    sa.Column('model', sa.String(length=100), nullable=True),
+    sa.Column('prompt_version', sa.Integer(), nullable=True),
+    sa.Column('served_count', sa.Integer(), nullable=False),
+    sa.Column('last_served_at', sa.DateTime(), nullable=True),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('category', 'difficulty', 'title_key', name='uq_green_tasks_title')
+    )
+    with op.batch_alter_table('green_tasks', schema=None) as batch_op:
+        batch_op.create_index('ix_green_tasks_rotation', ['category', 'difficulty', 'last_served_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('green_tasks', schema=None) as batch_op:
+        batch_op.drop_index('ix_green_tasks_rotation')
+
+    op.drop_table('green_tasks')
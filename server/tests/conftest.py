@@ -1,5 +1,6 @@
 import pytest
 import os
+from unittest.mock import MagicMock
 from app import create_app
 from app.database import db
 from app.models.user import User
@@ -37,6 +38,43 @@ def db_session(app):
         db.session.remove()
 
 
+@pytest.fixture(autouse=True)
+def ai_breaker(app):
+    """Start every test with a closed AI circuit breaker"""
+    from app.services.ai_gateway import ai_gateway
+    ai_gateway.breaker.reset()
+    return ai_gateway.breaker
+
+
+@pytest.fixture
+def llm(app):
+    """AIService with a mocked Groq client and an empty result cache"""
+    from app.services.ai_cache import ai_cache
+    from app.services.ai_service import AIService
+
+    ai_cache.clear()
+    service = AIService()
+    service.client = MagicMock()
+    yield service
+    ai_cache.clear()
+
+
+@pytest.fixture
+def llm_reply():
+    """Set the completions a mocked AIService client returns.
+
+    One content answers every call; several are returned in order, one per call.
+    """
+    def reply(service, *contents):
+        responses = [MagicMock(choices=[MagicMock(message=MagicMock(content=content))]) for content in contents]
+        create = service.client.chat.completions.create
+        if len(responses) == 1:
+            create.side_effect, create.return_value = None, responses[0]
+        else:
+            create.side_effect = responses
+    return reply
+
+
 @pytest.fixture
 def test_user(db_session):
     """Create a test user"""
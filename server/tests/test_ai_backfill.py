@@ -0,0 +1,91 @@
+import pytest
+from unittest.mock import patch, MagicMock
+
+
+class TestAIBackfill:
+    """Test bulk re-analysis of unprocessed and outdated reports"""
+
+    @pytest.fixture
+    def reports(self, db_session, test_user):
+        from app.models.report import Report
+        from app.services.ai_service import AIService, prompt_version_label
+
+        model = AIService().model
+        stored = [(None, None), ('old-model', prompt_version_label()), (model, prompt_version_label()),
+                  (model, 'advice:0,classify:1'), (None, None)]
+        reports = []
+        for index, (analysis_model, prompt_version) in enumerate(stored):
+            report = Report(title=f'Issue {index}', description='Oil in the river', user_id=test_user.id)
+            if analysis_model:
+                report.mark_ai_processed(category='general', confidence=0.5, model=analysis_model,
+                                         prompt_version=prompt_version)
+            db_session.add(report)
+            reports.append(report)
+        db_session.commit()
+        return reports
+
+    @pytest.fixture
+    def analyze(self):
+        from app.services.ai_service import AIService, prompt_version_label
+
+        def analysis(report):
+            return {'category': 'water-issues', 'confidence': 0.9, 'advice': 'Report it.', 'input_hash': 'x',
+                    'model': None if report.title == 'Issue 4' else AIService().model,
+                    'prompt_version': prompt_version_label()}
+
+        with patch('app.services.ai_service.AIService.analyze_report', side_effect=analysis) as mock:
+            yield mock
+
+    def test_stale_reports_backfilled_with_resume(self, app, reports, analyze, tmp_path):
+        """Test only outdated reports are analyzed and an interrupted run resumes"""
+        from app.services.ai_backfill import AIBackfill
+
+        checkpoint = str(tmp_path / 'backfill.json')
+        first = AIBackfill(app, concurrency=2, batch_size=2, checkpoint_path=checkpoint, limit=2).run()
+        assert (first['processed'], first['updated'], first['last_id']) == (2, 2, reports[1].id)
+
+        second = AIBackfill(app, concurrency=2, batch_size=2, checkpoint_path=checkpoint).run()
+        assert second['processed'] == 2
+        assert (second['updated'], second['failed']) == (3, 1)
+        assert sorted(call.args[0].id for call in analyze.call_args_list) == \
+            [reports[index].id for index in (0, 1, 3, 4)]
+
+        assert reports[1].ai_category == 'water-issues'
+        assert reports[2].ai_category == 'general'
+        # A fallback result never replaces the stored analysis
+        assert reports[4].ai_processed is False
+
+    def test_filters(self, app, reports, analyze, tmp_path):
+        """Test the model filter restricts candidates"""
+        from app.services.ai_backfill import AIBackfill
+
+        stats = AIBackfill(app, checkpoint_path=str(tmp_path / 'backfill.json'), model='old-model').run()
+        assert stats['updated'] == 1
+        assert [call.args[0].id for call in analyze.call_args_list] == [reports[1].id]
+
+    def test_advice_fallback_counts_as_failure(self, app, reports, tmp_path):
+        """Test a classified report whose advice fell back is left for a later run"""
+        from app.services.ai_backfill import AIBackfill
+        from app.services.ai_service import AIService
+
+        with patch.object(AIService, '_combined_analysis', return_value=None), \
+                patch.object(AIService, 'classify_environmental_issue',
+                             return_value={'category': 'pollution', 'confidence': 0.8}), \
+                patch.object(AIService, 'generate_advice', return_value=('Default advice.', True)):
+            stats = AIBackfill(app, checkpoint_path=str(tmp_path / 'backfill.json'), unprocessed_only=True).run()
+
+        assert (stats['updated'], stats['failed']) == (0, 2)
+        assert reports[0].ai_processed is False
+
+    def test_command_reports_progress(self, app, reports, analyze, tmp_path):
+        """Test the command prints throughput and error rates"""
+        from app.services.ai_client import ai_client
+
+        args = ['ai-backfill', '--unprocessed-only', '--checkpoint', str(tmp_path / 'backfill.json')]
+        assert 'not configured' in app.test_cli_runner().invoke(args=args).output
+
+        with patch.object(ai_client, 'get', return_value=MagicMock()):
+            result = app.test_cli_runner().invoke(args=args)
+        assert result.exit_code == 0, result.output
+        assert '1 updated, 1 failed (50.0% errors)' in result.output
+        assert 'reports/s' in result.output
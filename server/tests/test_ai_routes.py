@@ -1,3 +1,4 @@
+import json
 import pytest
 from unittest.mock import patch, MagicMock
 
@@ -122,3 +123,682 @@ class TestAIServiceIntegration:
             response = client.get(f'/api/ai/green-advice?category={category}')
             assert response.status_code == 200
             assert 'advice' in response.json
+
+
+class TestAIJobQueue:
+    """Test background AI analysis through the job queue"""
+
+    def _create(self, client, auth_headers, severity='medium'):
+        response = client.post('/api/reports', json={
+            'title': f'{severity.title()} river pollution',
+            'description': 'Oil spill spreading along the river bank',
+            'severity': severity
+        }, headers=auth_headers)
+        assert response.status_code == 201
+        return response.json['report']
+
+    def _worker(self, app):
+        from app.services.ai_worker import AIWorker
+        return AIWorker(app, concurrency=2, poll_interval=0.01)
+
+    @patch('app.services.ai_service.AIService.analyze_report')
+    def test_create_report_queues_analysis(self, mock_analyze, app, client, auth_headers):
+        """Test report creation only queues analysis and the worker completes it"""
+        mock_analyze.return_value = {'category': 'pollution', 'confidence': 0.9, 'advice': 'Report the spill'}
+
+        report = self._create(client, auth_headers)
+        assert report['ai_status'] == 'pending'
+        assert not report['ai_processed']
+        mock_analyze.assert_not_called()
+
+        assert self._worker(app).run(once=True) == 1
+
+        analyzed = client.get(f"/api/reports/{report['id']}").json['report']
+        assert analyzed['ai_status'] == 'done'
+        assert analyzed['ai_category'] == 'pollution'
+
+    def test_critical_reports_claimed_first(self, app, client, auth_headers):
+        """Test critical severity jobs are claimed before older ones"""
+        from app.models.ai_job import AIJob
+
+        low = self._create(client, auth_headers, 'low')
+        critical = self._create(client, auth_headers, 'critical')
+
+        claimed = AIJob.claim('test-worker', limit=2)
+        reports = [AIJob.query.get(job_id).report_id for job_id in claimed]
+        assert reports == [critical['id'], low['id']]
+
+    @patch('app.services.ai_service.AIService.analyze_report')
+    def test_failed_jobs_retry_with_backoff(self, mock_analyze, app, client, auth_headers, db_session):
+        """Test failures are rescheduled and the report fails after max attempts"""
+        from datetime import datetime
+        from app.database import db
+        from app.models.ai_job import AIJob
+        from app.models.report import Report
+
+        mock_analyze.side_effect = RuntimeError('upstream timeout')
+        report = self._create(client, auth_headers)
+        job = AIJob.query.filter_by(report_id=report['id']).one()
+        job.max_attempts = 2
+        db_session.commit()
+
+        self._worker(app).run(once=True)
+        job = db.session.get(AIJob, job.id)
+        assert (job.status, job.attempts, job.last_error) == ('queued', 1, 'upstream timeout')
+        assert job.run_at > datetime.utcnow()
+        assert db.session.get(Report, report['id']).ai_status == 'pending'
+
+        job.run_at = datetime.utcnow()
+        db_session.commit()
+        self._worker(app).run(once=True)
+        assert db.session.get(AIJob, job.id).status == 'failed'
+        assert db.session.get(Report, report['id']).ai_status == 'failed'
+
+    def test_provider_failure_retried_not_completed(self, app, client, auth_headers, db_session, llm):
+        """Test a fallback analysis from a failing provider is retried, and kept only on the last attempt"""
+        from datetime import datetime
+        from app.database import db
+        from app.models.ai_job import AIJob
+        from app.models.report import Report
+
+        llm.client.chat.completions.create.side_effect = RuntimeError('upstream timeout')
+        report = self._create(client, auth_headers)
+        job = AIJob.query.filter_by(report_id=report['id']).one()
+        job.max_attempts = 2
+        db_session.commit()
+
+        with patch('app.services.ai_worker.AIService', return_value=llm):
+            self._worker(app).run(once=True)
+            job = db.session.get(AIJob, job.id)
+            stored = db.session.get(Report, report['id'])
+            assert (job.status, job.attempts) == ('queued', 1)
+            assert (stored.ai_status, stored.ai_processed) == ('pending', False)
+
+            job.run_at = datetime.utcnow()
+            db_session.commit()
+            self._worker(app).run(once=True)
+
+        stored = db.session.get(Report, report['id'])
+        assert db.session.get(AIJob, job.id).status == 'done'
+        assert (stored.ai_status, stored.ai_model) == ('done', None)
+        assert stored.ai_category is not None
+
+    def test_stale_jobs_requeued(self, app, client, auth_headers, db_session):
+        """Test jobs abandoned by a dead worker return to the queue"""
+        from datetime import datetime, timedelta
+        from app.models.ai_job import AIJob
+
+        self._create(client, auth_headers)
+        job_id, = AIJob.claim('dead-worker')
+        AIJob.query.get(job_id).locked_at = datetime.utcnow() - timedelta(hours=1)
+        db_session.commit()
+
+        assert AIJob.requeue_stale(timeout=300) == 1
+        assert AIJob.claim('test-worker') == [job_id]
+
+
+class TestAIResultCache:
+    """Test the two-tier LLM result cache"""
+
+    @pytest.fixture
+    def llm(self, llm, llm_reply):
+        """AIService whose Groq client returns a fixed classification"""
+        llm_reply(llm, '{"category": "pollution", "confidence": 0.9}')
+        return llm
+
+    def test_identical_inputs_hit_cache(self, llm):
+        """Test normalized duplicate prompts are answered from memory"""
+        from app.services.ai_cache import ai_cache
+
+        first = llm.classify_environmental_issue('Oil spill', 'Near the  river')
+        second = llm.classify_environmental_issue('oil SPILL', 'near the river')
+
+        assert first == second == {'category': 'pollution', 'confidence': 0.9}
+        assert llm.client.chat.completions.create.call_count == 1
+        stats = ai_cache.get_stats()
+        assert (stats['misses'], stats['memory_hits']) == (1, 1)
+
+    def test_shared_tier_survives_process_cache(self, llm):
+        """Test entries are read back from the database after the LRU is cleared"""
+        from app.services.ai_cache import ai_cache
+
+        llm.classify_environmental_issue('Oil spill', 'Near the river')
+        ai_cache.clear()
+        llm.classify_environmental_issue('Oil spill', 'Near the river')
+
+        assert llm.client.chat.completions.create.call_count == 1
+        assert ai_cache.get_stats()['db_hits'] == 1
+
+    def test_model_and_prompt_version_in_key(self, llm):
+        """Test a different model or prompt version misses"""
+        from app.services import ai_service
+
+        llm.classify_environmental_issue('Oil spill', 'Near the river')
+        llm.model = 'another-model'
+        llm.classify_environmental_issue('Oil spill', 'Near the river')
+        with patch.dict(ai_service.PROMPT_VERSIONS, {'classify': 2}):
+            llm.classify_environmental_issue('Oil spill', 'Near the river')
+
+        assert llm.client.chat.completions.create.call_count == 3
+
+    def test_failures_not_cached(self, llm):
+        """Test fallback results are not stored"""
+        llm.client.chat.completions.create.side_effect = [RuntimeError('timeout'), llm.client.chat.completions.create.return_value]
+
+        assert llm.classify_environmental_issue('Oil spill', 'Near the river')['confidence'] < 0.9
+        assert llm.classify_environmental_issue('Oil spill', 'Near the river')['confidence'] == 0.9
+
+    def test_invalid_replies_not_cached(self, llm, llm_reply):
+        """Test unknown categories and non-numeric confidences fall back and are not stored"""
+        llm_reply(llm,
+                  '{"category": "volcanoes", "confidence": 0.9}',
+                  '{"category": "pollution", "confidence": "high"}',
+                  '```json\n{"category": "Water Issues", "confidence": "80%"}\n```')
+
+        for _ in range(2):
+            assert llm.classify_environmental_issue('Oil spill', 'Near the river')['source'] in ('local', 'keyword')
+        result = llm.classify_environmental_issue('Oil spill', 'Near the river')
+
+        assert result == {'category': 'water-issues', 'confidence': 0.8}
+        assert llm.classify_environmental_issue('Oil spill', 'Near the river') == result
+        assert llm.client.chat.completions.create.call_count == 3
+
+    def test_lru_and_database_eviction(self, app):
+        """Test both tiers are bounded in size"""
+        from app.database import db
+        from app.models.ai_cache import AICacheEntry
+        from app.services.ai_cache import AICache
+
+        cache = AICache(max_entries=2)
+        for text in ('one', 'two', 'three'):
+            cache.get_or_compute('classify', {'text': text}, lambda: {'category': text}, 'model', 1)
+        assert cache.get_stats()['memory_entries'] == 2
+        assert cache.get_stats()['evictions'] == 1
+
+        with db.engine.begin() as connection:
+            assert AICacheEntry.prune(connection, max_entries=1) == 2
+        assert AICacheEntry.query.count() == 1
+
+    @patch('app.services.ai_service.AIService.analyze_report')
+    def test_unchanged_report_not_reanalyzed(self, mock_analyze, client, auth_headers, test_report):
+        """Test re-analysis is skipped until the report changes"""
+        from app.services.ai_service import AIService
+
+        input_hash = AIService().report_input_hash(test_report)
+        mock_analyze.return_value = {'category': 'pollution', 'confidence': 0.9, 'advice': 'Report it',
+                                     'input_hash': input_hash, 'model': 'llama-3.1-70b-versatile'}
+        url = f'/api/ai/analyze-report/{test_report.id}'
+
+        assert client.post(url, headers=auth_headers).json['cached'] is False
+        repeat = client.post(url, headers=auth_headers).json
+        assert repeat['cached'] is True
+        assert repeat['analysis']['category'] == 'pollution'
+        assert mock_analyze.call_count == 1
+
+        client.put(f'/api/reports/{test_report.id}', json={'description': 'Updated description of the issue'},
+                   headers=auth_headers)
+        mock_analyze.return_value = dict(mock_analyze.return_value, input_hash='changed')
+        assert client.post(url, headers=auth_headers).json['cached'] is False
+        assert mock_analyze.call_count == 2
+
+    def test_fallback_analysis_never_current(self, llm, db_session, test_report):
+        """Test keyword-fallback results are not taken as an up-to-date analysis"""
+        llm.client.chat.completions.create.side_effect = RuntimeError('upstream timeout')
+
+        result = llm.analyze_report(test_report)
+        assert (result['model'], result['input_hash']) == (None, None)
+
+        test_report.mark_ai_processed(category=result['category'], advice=result['advice'],
+                                      input_hash=llm.report_input_hash(test_report), model=None)
+        db_session.commit()
+        assert not llm.is_analysis_current(test_report)
+
+
+class TestAIClient:
+    """Test the shared, pooled Groq client"""
+
+    @pytest.fixture
+    def configured(self, app):
+        from app.services.ai_client import ai_client
+
+        ai_client.config = dict(ai_client.config, GROQ_API_KEY='test-key', AI_CALL_TIMEOUT=12.0,
+                                GROQ_CONNECT_TIMEOUT=3.0)
+        ai_client.close()
+        yield ai_client
+        ai_client.init_app(app)
+
+    def test_client_shared_between_services(self, configured):
+        """Test every AIService in a process reuses one client and pool"""
+        from app.services.ai_service import AIService
+
+        first, second = AIService(), AIService()
+
+        assert first.client is not None
+        assert first.client is second.client
+        timeout = first.client._client.timeout
+        assert (timeout.read, timeout.connect) == (12.0, 3.0)
+
+    def test_client_rebuilt_after_fork(self, configured):
+        """Test a forked worker gets its own client instead of the parent's sockets"""
+        import os
+
+        parent = configured.get()
+        with patch('app.services.ai_client.os.getpid', return_value=os.getpid() + 1):
+            child = configured.get()
+
+        assert child is not None and child is not parent
+
+    def test_no_client_without_key(self, app):
+        """Test placeholder keys leave the service on its fallbacks"""
+        from app.services.ai_client import ai_client
+
+        ai_client.config = dict(ai_client.config, GROQ_API_KEY='your-groq-api-key-here')
+        try:
+            assert ai_client.get() is None
+        finally:
+            ai_client.init_app(app)
+
+
+class TestBatchCategorization:
+    """Test packing many texts into few LLM calls"""
+
+    TEXTS = [
+        'Factory smoke and fumes over the town',
+        'Garbage dumped next to the landfill road',
+        'Sewage flowing into the river',
+    ]
+
+    @pytest.fixture
+    def llm(self, llm):
+        with patch('app.routes.ai.AIService', return_value=llm):
+            yield llm
+
+    def test_results_in_input_order_with_fallback(self, client, auth_headers, llm, llm_reply):
+        """Test unparseable items fall back to keywords and order is kept"""
+        llm_reply(llm, json.dumps({'results': [
+            {'id': 2, 'category': 'water-issues', 'confidence': 0.95},
+            {'id': 0, 'category': 'not-a-category', 'confidence': 0.9},
+        ]}))
+
+        response = client.post('/api/ai/categorize-batch', json={'texts': self.TEXTS}, headers=auth_headers)
+
+        assert response.status_code == 200
+        results = response.json['results']
+        assert [result['index'] for result in results] == [0, 1, 2]
+        assert [(result['category'], result['source']) for result in results] == [
+            ('air-quality', 'keyword'), ('waste-management', 'keyword'), ('water-issues', 'ai')
+        ]
+        assert response.json['ai_calls'] == 1
+
+    def test_packs_by_token_budget(self, llm, llm_reply):
+        """Test texts are split across prompts only when the budget is exceeded"""
+        llm_reply(llm, json.dumps({'results': []}))
+        texts = [f'Report number {index} ' + 'x' * 400 for index in range(10)]
+
+        _, prompts = llm.categorize_batch(texts, token_budget=600)
+        assert prompts == 4  # ~134 tokens per item, 450 available per prompt
+
+        _, prompts = llm.categorize_batch(texts + texts, token_budget=100000)
+        assert prompts == 1  # duplicates are sent once
+        assert llm.client.chat.completions.create.call_count == 5
+
+    def test_unavailable_llm_uses_keywords(self, llm):
+        """Test a failed call still returns a result for every text"""
+        llm.client.chat.completions.create.side_effect = RuntimeError('timeout')
+
+        results, _ = llm.categorize_batch(self.TEXTS)
+
+        assert [result['source'] for result in results] == ['keyword'] * 3
+
+    def test_fenced_reply_parsed(self, llm, llm_reply):
+        """Test a reply wrapped in a code fence with prose around it is used"""
+        reply = json.dumps({'results': [{'id': 0, 'category': 'Air Quality', 'confidence': '90%'}]})
+        llm_reply(llm, f'Here are the results:\n```json\n{reply}\n```')
+
+        results, _ = llm.categorize_batch(self.TEXTS[:1])
+
+        assert (results[0]['category'], results[0]['confidence'], results[0]['source']) == ('air-quality', 0.9, 'ai')
+
+    def test_cached_items_not_sent_again(self, llm, llm_reply):
+        """Test answered texts are cached per item and only new texts are prompted"""
+        llm_reply(llm,
+                  json.dumps({'results': [{'id': 0, 'category': 'air-quality', 'confidence': 0.9}]}),
+                  json.dumps({'results': [{'id': 0, 'category': 'water-issues', 'confidence': 0.8}]}))
+
+        llm.categorize_batch(self.TEXTS[:1])
+        results, prompts = llm.categorize_batch([self.TEXTS[0], self.TEXTS[2]])
+
+        assert prompts == 1
+        _, kwargs = llm.client.chat.completions.create.call_args
+        assert self.TEXTS[0] not in kwargs['messages'][0]['content']
+        assert [(result['category'], result['source']) for result in results] == [
+            ('air-quality', 'ai'), ('water-issues', 'ai')
+        ]
+
+    def test_validation(self, app, client, auth_headers):
+        """Test missing, oversized and malformed batches are rejected"""
+        app.config['AI_BATCH_MAX_TEXTS'] = 2
+        try:
+            assert client.post('/api/ai/categorize-batch', json={}, headers=auth_headers).status_code == 400
+            assert client.post('/api/ai/categorize-batch', json={'texts': self.TEXTS},
+                               headers=auth_headers).status_code == 400
+            assert client.post('/api/ai/categorize-batch', json={'texts': ['ok', 3]},
+                               headers=auth_headers).status_code == 400
+        finally:
+            app.config['AI_BATCH_MAX_TEXTS'] = 500
+
+
+class TestAIGateway:
+    """Test timeouts, concurrency limits and the circuit breaker around LLM calls"""
+
+    @pytest.fixture
+    def failing(self, llm):
+        llm.client.chat.completions.create.side_effect = RuntimeError('upstream timeout')
+        return llm
+
+    def test_slow_call_abandoned_at_deadline(self, app, ai_breaker):
+        """Test a call still running at its deadline raises and frees its slot"""
+        import threading
+        import time
+        from app.services.ai_gateway import AITimeout, ai_gateway
+
+        release = threading.Event()
+        slow = MagicMock()
+        slow.chat.completions.create.side_effect = lambda **kwargs: release.wait(5)
+
+        started = time.monotonic()
+        try:
+            with pytest.raises(AITimeout):
+                ai_gateway.complete(slow, timeout=0.1, model='test')
+        finally:
+            release.set()
+        assert time.monotonic() - started < 1
+        assert ai_gateway.status()['concurrency']['in_flight'] == 0
+        assert ai_breaker.failures == 1
+
+    def test_slow_stream_closed_at_deadline(self, app, ai_breaker):
+        """Test a stream that outlasts its deadline is closed mid-way"""
+        import time
+        from app.services.ai_gateway import AITimeout, ai_gateway
+
+        closed = []
+
+        def chunks():
+            try:
+                for text in ('a', 'b', 'c'):
+                    yield MagicMock(choices=[MagicMock(delta=MagicMock(content=text))])
+                    time.sleep(0.1)
+            finally:
+                closed.append(True)
+
+        slow = MagicMock()
+        slow.chat.completions.create.return_value = chunks()
+        received = []
+        with pytest.raises(AITimeout):
+            for delta in ai_gateway.stream(slow, timeout=0.15, model='test'):
+                received.append(delta)
+
+        assert received == ['a', 'b']
+        assert closed == [True]
+        assert ai_gateway.status()['concurrency']['in_flight'] == 0
+        assert ai_breaker.failures == 1
+
+    def test_open_breaker_short_circuits_to_fallbacks(self, app, client, failing, ai_breaker):
+        """Test repeated failures open the breaker and later calls skip the provider"""
+        threshold = app.config['AI_BREAKER_FAILURE_THRESHOLD']
+        for attempt in range(threshold):
+            failing.classify_environmental_issue('Oil spill', f'Near the river {attempt}')
+        assert ai_breaker.state == 'open'
+
+        calls = failing.client.chat.completions.create.call_count
+        assert failing.generate_advice('pollution', 'Oil spill', 'Near the river') == (failing._default_advice('pollution'), True)
+        assert failing.generate_green_task('water', 'easy')['title']
+        assert failing.client.chat.completions.create.call_count == calls
+
+        health = client.get('/api/ai/health').json
+        assert health['breaker']['state'] == 'open'
+        assert health['breaker']['retry_in'] > 0
+
+    def test_half_open_probe_closes_breaker(self, failing, ai_breaker):
+        """Test one successful probe after the cool-down closes the breaker"""
+        message = MagicMock(content='{"category": "pollution", "confidence": 0.9}')
+        ai_breaker.state, ai_breaker.opened_at = 'open', 0
+        failing.client.chat.completions.create.side_effect = None
+        failing.client.chat.completions.create.return_value = MagicMock(choices=[MagicMock(message=message)])
+
+        assert failing.classify_environmental_issue('Oil spill', 'Near the river')['confidence'] == 0.9
+        assert ai_breaker.state == 'closed'
+
+    def test_request_errors_do_not_trip_breaker(self, app, ai_breaker):
+        """Test errors caused by the request itself are not provider failures"""
+        import groq
+        import httpx
+        from app.services.ai_gateway import ai_gateway
+
+        request = httpx.Request('POST', 'https://api.groq.com/openai/v1/chat/completions')
+        error = groq.BadRequestError('bad', response=httpx.Response(400, request=request), body=None)
+        llm = MagicMock()
+        llm.chat.completions.create.side_effect = error
+
+        for _ in range(app.config['AI_BREAKER_FAILURE_THRESHOLD'] + 1):
+            with pytest.raises(groq.BadRequestError):
+                ai_gateway.complete(llm, model='test')
+        assert ai_breaker.state == 'closed'
+
+    def test_concurrency_limit(self, app):
+        """Test calls beyond the per-process limit are refused instead of queued"""
+        import threading
+        from app.services.ai_gateway import AIGateway, AIUnavailable
+
+        gateway = AIGateway()
+        gateway.max_concurrent, gateway.queue_timeout = 1, 0.01
+        gateway._slots = threading.BoundedSemaphore(1)
+        release = threading.Event()
+        slow = MagicMock()
+        slow.chat.completions.create.side_effect = lambda **kwargs: release.wait(5)
+
+        worker = threading.Thread(target=gateway.complete, args=(slow,), kwargs={'model': 'test'})
+        worker.start()
+        while gateway.status()['concurrency']['in_flight'] == 0:
+            pass
+        try:
+            with pytest.raises(AIUnavailable):
+                gateway.complete(slow, model='test')
+        finally:
+            release.set()
+            worker.join()
+        assert gateway.status()['concurrency']['in_flight'] == 0
+
+
+class TestAIStreaming:
+    """Test Server-Sent Events variants of advice and task generation"""
+
+    @pytest.fixture
+    def llm(self, llm):
+        with patch('app.routes.ai.AIService', return_value=llm):
+            yield llm
+
+    def _stream(self, service, *deltas):
+        chunks = [MagicMock(choices=[MagicMock(delta=MagicMock(content=delta))]) for delta in deltas]
+        service.client.chat.completions.create.return_value = iter(chunks)
+
+    def _events(self, response):
+        events = []
+        for message in response.get_data(as_text=True).strip().split('\n\n'):
+            event, data = message.split('\n')
+            events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+        return events
+
+    def test_advice_tokens_then_final_payload(self, client, llm):
+        """Test advice tokens are forwarded as they arrive and the final event holds the full text"""
+        self._stream(llm, 'Report the ', 'spill to ', 'local authorities.')
+
+        response = client.get('/api/ai/green-advice/stream?category=pollution&title=Oil+spill')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        assert response.headers['Cache-Control'] == 'no-cache'
+
+        events = self._events(response)
+        assert events[0] == ('start', {'kind': 'advice', 'category': 'pollution', 'location': None})
+        assert [data['text'] for event, data in events if event == 'token'] == ['Report the ', 'spill to ', 'local authorities.']
+        assert events[-1] == ('done', {'advice': 'Report the spill to local authorities.', 'source': 'ai',
+                                       'category': 'pollution', 'location': None})
+        _, kwargs = llm.client.chat.completions.create.call_args
+        assert kwargs['stream'] is True
+
+        # A repeated request is answered from the cache without a new call
+        events = self._events(client.get('/api/ai/green-advice/stream?category=pollution&title=Oil+spill'))
+        assert events[-1][1]['source'] == 'cache'
+        assert llm.client.chat.completions.create.call_count == 1
+
+    def test_task_stream_parses_final_json(self, client, llm):
+        """Test task JSON is streamed raw and parsed once complete"""
+        self._stream(llm, '```json\n{"title": "Fix ', 'leaks", "difficulty": "Easy"}', '\n```')
+
+        response = client.post('/api/ai/generate-task/stream', json={'category': 'water', 'difficulty': 'easy'})
+        events = self._events(response)
+
+        assert ''.join(data['text'] for event, data in events if event == 'token').startswith('```json')
+        event, data = events[-1]
+        assert event == 'done'
+        assert data['task'] == {'title': 'Fix leaks', 'difficulty': 'Easy'}
+        assert data['source'] == 'ai'
+        assert data['difficulty'] == 'easy'
+
+    def test_failures_end_with_fallback(self, client, llm, ai_breaker):
+        """Test unparseable or failed streams finish with the fallback payload"""
+        self._stream(llm, 'Not JSON at all')
+        event, data = self._events(client.get('/api/ai/generate-task/stream?category=water&difficulty=easy'))[-1]
+        assert data['source'] == 'fallback'
+        assert data['task']['difficulty'] == 'Easy'
+
+        llm.client.chat.completions.create.side_effect = RuntimeError('upstream timeout')
+        events = self._events(client.get('/api/ai/green-advice/stream?category=energy'))
+        assert [event for event, _ in events] == ['start', 'done']
+        assert events[-1][1]['advice'] == llm._default_advice('energy')
+        assert ai_breaker.failures == 1
+
+    def test_abandoned_stream_releases_slot(self, app, ai_breaker):
+        """Test closing a stream early frees its call slot without counting a failure"""
+        from app.services.ai_gateway import ai_gateway
+
+        llm = MagicMock()
+        llm.chat.completions.create.return_value = iter(
+            [MagicMock(choices=[MagicMock(delta=MagicMock(content=text))]) for text in ('a', 'b')])
+        stream = ai_gateway.stream(llm, model='test')
+
+        assert next(stream) == 'a'
+        assert ai_gateway.status()['concurrency']['in_flight'] == 1
+        stream.close()
+        assert ai_gateway.status()['concurrency']['in_flight'] == 0
+        assert ai_breaker.failures == 0
+
+
+class TestGreenCatalog:
+    """Test the indexed green action and fallback task catalog"""
+
+    def test_advice_served_with_etag(self, client):
+        """Test advice bodies are pre-serialized and revalidate with their ETag"""
+        response = client.get('/api/ai/green-advice?category=Energy&location=Nairobi')
+        assert response.status_code == 200
+        assert response.json['category'] == 'Energy'
+        assert response.json['location'] == 'Nairobi'
+        assert {action['category'] for action in response.json['advice']['actions']} == {'Energy'}
+        assert response.json['advice']['total'] == len(response.json['advice']['actions'])
+
+        etag = response.headers['ETag']
+        cached = client.get('/api/ai/green-advice?category=Energy&location=Nairobi', headers={'If-None-Match': etag})
+        assert cached.status_code == 304
+        assert cached.headers['ETag'] == etag
+
+        everything = client.get('/api/ai/green-advice?category=general').json['advice']
+        easy = client.get('/api/ai/green-advice?category=all&difficulty=easy').json['advice']
+        assert everything['total'] > easy['total'] > 0
+        assert {action['difficulty'] for action in easy['actions']} == {'Easy'}
+        assert client.get('/api/ai/green-advice?category=unknown').json['advice'] == {'actions': [], 'total': 0}
+
+    def test_fallback_tasks_by_category_and_difficulty(self, app):
+        """Test fallback tasks honour difficulty and fall back to other entries"""
+        from app.services.ai_service import AIService
+
+        service = AIService()
+        service.client = None
+        assert service.generate_green_task('water', 'hard')['title'] == 'Create Rain Garden'
+        assert service.generate_green_task('unknown', 'medium')['title'] == 'Conduct Energy Audit'
+        # No 'extreme' water task exists, so any water task will do
+        assert service.generate_green_task('water', 'extreme')['category'] == 'Water'
+
+    def test_catalog_extended_from_data_file(self, app, tmp_path):
+        """Test a deployment data file adds actions and task categories"""
+        from app.services.green_catalog import DEFAULT_PATH, GreenCatalog
+
+        extra = tmp_path / 'catalog.json'
+        extra.write_text(json.dumps({
+            'actions': [{'title': 'Repair Bikes', 'category': 'Transport', 'difficulty': 'Easy',
+                         'description': 'Fix a neighbour\'s bike.', 'impact': 'Fewer car trips'}],
+            'tasks': {'transport': [{'title': 'Car-free Week', 'difficulty': 'Medium',
+                                     'description': 'Leave the car at home.', 'impact': 'Saves fuel'}]}
+        }))
+        catalog = GreenCatalog.load(DEFAULT_PATH, str(extra))
+
+        assert catalog.advice('transport').total == 1
+        assert catalog.random_task('transport')['title'] == 'Car-free Week'
+        with pytest.raises(TypeError):
+            catalog.tasks('transport')[0]['title'] = 'Changed'
+
+        extra.write_text(json.dumps({'actions': [{'title': 'Incomplete'}]}))
+        with pytest.raises(ValueError):
+            GreenCatalog.load(DEFAULT_PATH, str(extra))
+
+
+class TestCombinedAnalysis:
+    """Test classifying a report and advising on it in one LLM call"""
+
+    def test_one_call_with_tolerant_parsing(self, llm, llm_reply, test_report):
+        """Test a fenced reply with loose formatting is accepted in a single call"""
+        llm_reply(llm, 'Here you go:\n```json\n{"category": "Water Issues", "confidence": "80%", '
+                         '"advice": ["Avoid the water.", "Report it."]}\n```')
+
+        result = llm.analyze_report(test_report)
+        assert (result['category'], result['confidence']) == ('water-issues', 0.8)
+        assert result['advice'] == 'Avoid the water. Report it.'
+        assert result['model'] == llm.model
+        assert llm.client.chat.completions.create.call_count == 1
+
+    def test_invalid_reply_uses_two_calls(self, llm, llm_reply, test_report):
+        """Test a reply that fails validation falls back to the two-step flow"""
+        llm_reply(llm, '{"category": "volcanoes", "confidence": 0.9, "advice": "Run."}',
+                    '{"category": "pollution", "confidence": 0.7}', 'Document the issue.')
+
+        result = llm.analyze_report(test_report)
+        assert (result['category'], result['advice']) == ('pollution', 'Document the issue.')
+        assert llm.client.chat.completions.create.call_count == 3
+
+    def test_provider_failure_skips_two_calls(self, llm, test_report):
+        """Test a failed call goes straight to local fallbacks"""
+        llm.client.chat.completions.create.side_effect = RuntimeError('upstream timeout')
+
+        result = llm.analyze_report(test_report)
+        assert result['model'] is None
+        assert result['advice'] == llm._default_advice(result['category'])
+        assert llm.client.chat.completions.create.call_count == 1
+
+    def test_advice_fallback_not_attributed(self, llm, test_report):
+        """Test a result whose advice fell back carries no model"""
+        llm.combined_analysis = False
+        llm.client.chat.completions.create.side_effect = [
+            MagicMock(choices=[MagicMock(message=MagicMock(content='{"category": "pollution", "confidence": 0.7}'))]),
+            RuntimeError('upstream timeout')]
+
+        result = llm.analyze_report(test_report)
+        assert result['category'] == 'pollution'
+        assert result['advice'] == llm._default_advice('pollution')
+        assert (result['model'], result['input_hash']) == (None, None)
+
+    def test_switch_off_uses_two_calls(self, llm, llm_reply, test_report):
+        """Test the config switch restores separate classification and advice calls"""
+        llm.combined_analysis = False
+        llm_reply(llm, '{"category": "pollution", "confidence": 0.7}', 'Document the issue.')
+
+        assert llm.analyze_report(test_report)['category'] == 'pollution'
+        assert llm.client.chat.completions.create.call_count == 2
@@ -2,6 +2,7 @@ import pytest
 from app.models.user import User
 from app.models.report import Report
 from app.models.comment import Comment
+from app.database import db
 
 
 class TestEndToEndAuthentication:
@@ -326,3 +327,227 @@ class TestPaginationAndFiltering:
         # Test location filter
         response = client.get('/api/reports?location=River')
         assert response.status_code == 200
+
+
+class TestDenormalizedCounters:
+    """Counter columns stay in step with the rows they count"""
+
+    def test_counters_follow_writes(self, client, auth_headers, test_user, test_report):
+        """Test comment and tag writes update counters transactionally"""
+        from app.models.tag import Tag
+
+        comment = client.post('/api/comments', json={
+            'content': 'Parent comment',
+            'report_id': test_report.id
+        }, headers=auth_headers).json['comment']
+        client.post('/api/comments', json={
+            'content': 'Reply comment',
+            'report_id': test_report.id,
+            'parent_id': comment['id']
+        }, headers=auth_headers)
+
+        client.put(f'/api/reports/{test_report.id}', json={'tags': ['smog', 'river']}, headers=auth_headers)
+
+        report = client.get(f'/api/reports/{test_report.id}').json['report']
+        assert report['comments_count'] == 2
+        assert report['author']['reports_count'] == 1
+        assert report['author']['comments_count'] == 2
+        assert {tag['name']: tag['reports_count'] for tag in report['tags']} == {'smog': 1, 'river': 1}
+        assert client.get(f"/api/comments/{comment['id']}").json['comment']['replies_count'] == 1
+
+        client.put(f'/api/reports/{test_report.id}', json={'tags': ['river']}, headers=auth_headers)
+        assert Tag.query.filter_by(name='smog').first().reports_count == 0
+
+        client.delete(f'/api/reports/{test_report.id}', headers=auth_headers)
+        user = client.get(f'/api/users/{test_user.id}').json['user']
+        assert user['reports_count'] == 0
+        assert user['comments_count'] == 0
+        assert Tag.query.filter_by(name='river').first().reports_count == 0
+
+    def test_reconcile_counters(self, app, db_session, test_user, test_report):
+        """Test the reconcile command repairs drifted counters"""
+        from app.models.user import User
+
+        db_session.execute(db.text('UPDATE users SET reports_count = 42'))
+        db_session.commit()
+
+        result = app.test_cli_runner().invoke(args=['reconcile-counters'])
+
+        assert result.exit_code == 0
+        assert User.query.get(test_user.id).reports_count == 1
+
+
+class TestCommentThreads:
+    """Comment threads load by materialized path with thread pagination"""
+
+    def _comment(self, client, auth_headers, report_id, content, parent_id=None):
+        data = {'content': content, 'report_id': report_id}
+        if parent_id:
+            data['parent_id'] = parent_id
+        return client.post('/api/comments', json=data, headers=auth_headers)
+
+    def test_threads_nest_in_order(self, client, auth_headers, test_report):
+        """Test replies come back nested under their parents in thread order"""
+        root = self._comment(client, auth_headers, test_report.id, 'Root').json['comment']
+        first = self._comment(client, auth_headers, test_report.id, 'First', root['id']).json['comment']
+        self._comment(client, auth_headers, test_report.id, 'Second', root['id'])
+        self._comment(client, auth_headers, test_report.id, 'Nested', first['id'])
+
+        response = client.get(f'/api/comments/report/{test_report.id}')
+
+        assert response.status_code == 200
+        thread = response.json['comments'][0]
+        assert [reply['content'] for reply in thread['replies']] == ['First', 'Second']
+        assert thread['replies'][0]['replies'][0]['content'] == 'Nested'
+        assert thread['replies'][0]['replies'][0]['depth'] == 2
+        assert response.json['total_comments'] == 4
+
+        comment = client.get(f"/api/comments/{first['id']}").json['comment']
+        assert [reply['content'] for reply in comment['replies']] == ['Nested']
+
+    def test_thread_pagination(self, client, auth_headers, test_report):
+        """Test pages hold whole threads, newest first"""
+        for i in range(3):
+            root = self._comment(client, auth_headers, test_report.id, f'Thread {i}').json['comment']
+            self._comment(client, auth_headers, test_report.id, f'Reply {i}', root['id'])
+
+        page = client.get(f'/api/comments/report/{test_report.id}?per_page=2').json
+        assert [thread['content'] for thread in page['comments']] == ['Thread 2', 'Thread 1']
+        assert all(len(thread['replies']) == 1 for thread in page['comments'])
+        assert page['pagination']['has_next'] is True
+
+        page = client.get(f'/api/comments/report/{test_report.id}?per_page=2&page=2').json
+        assert [thread['content'] for thread in page['comments']] == ['Thread 0']
+        assert page['pagination']['has_next'] is False
+
+        report = client.get(f'/api/reports/{test_report.id}?comments_per_page=1').json['report']
+        assert [thread['content'] for thread in report['comments']] == ['Thread 2']
+        assert report['comments_pagination']['has_next'] is True
+
+    def test_thread_page_query_count(self, app, client, auth_headers, test_report):
+        """Test a thread page costs the same queries however deep the replies go"""
+        from sqlalchemy import event
+        from app.models.comment import Comment
+
+        parent_id = None
+        for i in range(4):
+            parent_id = self._comment(client, auth_headers, test_report.id, f'Level {i}', parent_id).json['comment']['id']
+
+        report_id = test_report.id
+        statements = []
+
+        def count(*args):
+            statements.append(args)
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            threads, _ = Comment.get_thread_page(report_id)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+
+        assert threads[0]['replies'][0]['replies'][0]['replies'][0]['content'] == 'Level 3'
+        assert len(statements) == 2
+
+    def test_reply_depth_cap(self, app, client, auth_headers, test_report):
+        """Test replies beyond the configured depth are rejected"""
+        app.config['COMMENT_MAX_DEPTH'] = 1
+        root = self._comment(client, auth_headers, test_report.id, 'Root').json['comment']
+        reply = self._comment(client, auth_headers, test_report.id, 'Reply', root['id']).json['comment']
+
+        response = self._comment(client, auth_headers, test_report.id, 'Too deep', reply['id'])
+
+        assert response.status_code == 400
+
+
+class TestConditionalGet:
+    """Read endpoints answer revalidation with 304 until their data changes"""
+
+    def _revalidate(self, client, url, response, headers=None):
+        headers = dict(headers or {})
+        headers['If-None-Match'] = response.headers['ETag']
+        return client.get(url, headers=headers)
+
+    def test_report_feed_etag(self, client, auth_headers, test_report):
+        """Test feeds revalidate to 304 and change after a comment"""
+        response = client.get('/api/reports')
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'] == 'public, no-cache'
+        assert 'Last-Modified' in response.headers
+
+        not_modified = self._revalidate(client, '/api/reports', response)
+        assert not_modified.status_code == 304
+        assert not_modified.data == b''
+        assert not_modified.headers['ETag'] == response.headers['ETag']
+
+        assert client.get('/api/reports?page=2').headers['ETag'] != response.headers['ETag']
+
+        client.post('/api/comments', json={'content': 'New', 'report_id': test_report.id}, headers=auth_headers)
+        assert self._revalidate(client, '/api/reports', response).status_code == 200
+
+    def test_report_detail_etag(self, client, auth_headers, test_report, db_session):
+        """Test a report's ETag changes with the report but not with other reports"""
+        other_user = User(username='otheruser', email='other@example.com')
+        other_user.set_password('OtherPass123')
+        db_session.add(other_user)
+        db_session.commit()
+
+        url = f'/api/reports/{test_report.id}'
+        response = client.get(url)
+        assert self._revalidate(client, url, response).status_code == 304
+
+        other = Report(title='Other report', description='Unrelated report', user_id=other_user.id)
+        db_session.add(other)
+        db_session.commit()
+        assert self._revalidate(client, url, response).status_code == 304
+
+        client.put(url, json={'title': 'Renamed report'}, headers=auth_headers)
+        assert self._revalidate(client, url, response).status_code == 200
+
+    def test_report_detail_etag_follows_author_counters(self, client, test_report, db_session):
+        """Test a report's ETag changes when its author's embedded counters do"""
+        url = f'/api/reports/{test_report.id}'
+        response = client.get(url)
+        reports_count = response.json['report']['author']['reports_count']
+
+        db_session.add(Report(title='Second report', description='Another report by the author',
+                              user_id=test_report.user_id))
+        db_session.commit()
+
+        refreshed = self._revalidate(client, url, response)
+        assert refreshed.status_code == 200
+        assert refreshed.json['report']['author']['reports_count'] == reports_count + 1
+
+    def test_versions_bumped_after_commit(self, test_user, db_session):
+        """Test writers leave the shared version rows alone until they commit, and rolled back writes bump nothing"""
+        from app.models.cache_version import get_versions
+
+        before = get_versions(['reports'])['reports'][0]
+        db_session.add(Report(title='Draft report', description='Not committed yet', user_id=test_user.id))
+        db_session.flush()
+        assert get_versions(['reports'])['reports'][0] == before
+        db_session.rollback()
+        assert get_versions(['reports'])['reports'][0] == before
+
+        db_session.add(Report(title='Kept report', description='Committed this time', user_id=test_user.id))
+        db_session.commit()
+        assert get_versions(['reports'])['reports'][0] == before + 1
+
+    def test_profile_is_private(self, client, auth_headers):
+        """Test the profile varies by user and changes after an update"""
+        response = client.get('/api/profile', headers=auth_headers)
+        assert response.headers['Cache-Control'] == 'private, no-cache'
+        assert 'Authorization' in response.headers['Vary']
+        assert self._revalidate(client, '/api/profile', response, auth_headers).status_code == 304
+
+        client.put('/api/profile', json={'username': 'renameduser'}, headers=auth_headers)
+        assert self._revalidate(client, '/api/profile', response, auth_headers).status_code == 200
+
+    def test_popular_tags_if_modified_since(self, client, auth_headers, test_report):
+        """Test Last-Modified revalidation on popular tags"""
+        client.put(f'/api/reports/{test_report.id}', json={'tags': ['smog']}, headers=auth_headers)
+        response = client.get('/api/tags/popular')
+        assert response.headers['Cache-Control'] == 'public, max-age=60'
+
+        not_modified = client.get('/api/tags/popular',
+                                  headers={'If-Modified-Since': response.headers['Last-Modified']})
+        assert not_modified.status_code == 304
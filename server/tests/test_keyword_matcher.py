@@ -0,0 +1,43 @@
+class TestKeywordMatcher:
+    """Test the compiled keyword fallback classifier"""
+
+    def test_every_category_counted_in_one_pass(self):
+        """Test the category with most hits wins regardless of table order"""
+        from app.services.ai_service import keyword_matcher
+
+        counts = keyword_matcher.count('Toxic smoke, dust and fumes from the burning landfill')
+
+        assert counts == {'pollution': 1, 'air-quality': 3, 'waste-management': 1}
+        assert keyword_matcher.classify('Toxic smoke, dust and fumes from the burning landfill')[0] == 'air-quality'
+
+    def test_word_boundaries(self):
+        """Test keywords match whole words and plurals only"""
+        from app.utils.keyword_matcher import KeywordMatcher
+
+        matcher = KeywordMatcher({'air': ['air'], 'nature': ['tree', 'habitat loss']})
+
+        assert matcher.count('Repair the chair near the airport') == {}
+        assert matcher.count('Air, AIR and airs') == {'air': 3}
+        assert matcher.count('Trees felled; tree-lined street') == {'nature': 2}
+        assert matcher.count('Severe habitat loss.') == {'nature': 1}
+
+    def test_overlapping_keywords(self):
+        """Test the longest of overlapping keywords wins"""
+        from app.utils.keyword_matcher import KeywordMatcher
+
+        matcher = KeywordMatcher({'a': ['global warming'], 'b': ['warming'], 'c': ['lob']})
+
+        assert matcher.count('global warming and more warming') == {'a': 1, 'b': 1}
+
+    def test_confidence_from_counts(self):
+        """Test confidence rises with hits and falls with competing categories"""
+        from app.services.ai_service import keyword_matcher
+
+        single = keyword_matcher.classify('Sewage in the street')
+        repeated = keyword_matcher.classify('Sewage from the river reached the lake')
+        mixed = keyword_matcher.classify('Smoke over the river')
+
+        assert single == ('water-issues', 0.7)
+        assert repeated[1] > single[1]
+        assert mixed[1] < single[1]
+        assert keyword_matcher.classify('Nothing relevant here') == ('general', 0.5)
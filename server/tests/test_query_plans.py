@@ -0,0 +1,107 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app.database import db
+from app.models.report import Report
+from app.models.comment import Comment
+from app.models.tag import Tag
+
+
+@contextmanager
+def recorded_statements():
+    """Collect the SQL statements and parameters executed inside the block"""
+    statements = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def explain(statements):
+    """Return SQLite's query plans for recorded statements, one line per step"""
+    connection = db.session.connection()
+    steps = []
+    for statement, parameters in statements:
+        if statement.lstrip().upper().startswith(('SELECT', 'UPDATE')):
+            rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+            steps.extend(row[-1] for row in rows)
+    db.session.rollback()
+    return ' | '.join(steps)
+
+
+class TestQueryPlans:
+    """Hot queries, as issued by the model and route helpers, are served by the composite indexes"""
+
+    def _paginate(self, app, query, **args):
+        from app.routes.reports import paginate_reports
+
+        with app.test_request_context(query_string=args), recorded_statements() as statements:
+            paginate_reports(query)
+        return explain(statements)
+
+    def test_public_feed_uses_index(self, app, test_report):
+        plan = self._paginate(app, Report.public_reports_query())
+        assert 'ix_reports_public_status_created' in plan
+
+    def test_public_feed_cursor_uses_index(self, app, test_report):
+        plan = self._paginate(app, Report.public_reports_query(), cursor='')
+        assert 'ix_reports_public_status_created' in plan
+
+    def test_user_feed_uses_index(self, app, test_report):
+        plan = self._paginate(app, Report.user_reports_query(test_report.user_id))
+        assert 'ix_reports_user_created' in plan
+
+    def test_profile_top_category_uses_index(self, client, auth_headers):
+        with recorded_statements() as statements:
+            assert client.get('/api/profile', headers=auth_headers).status_code == 200
+        assert 'ix_reports_user_category' in explain(statements)
+
+    def test_user_comments_use_index(self, client, auth_headers):
+        with recorded_statements() as statements:
+            assert client.get('/api/profile', headers=auth_headers).status_code == 200
+        assert 'ix_comments_user_created' in explain(statements)
+
+    def test_nearby_search_avoids_table_scan(self, client, test_report):
+        with recorded_statements() as statements:
+            response = client.get(f'/api/reports/nearby?lat={test_report.latitude}&lng={test_report.longitude}')
+            assert response.status_code == 200
+        plan = explain(statements)
+        assert 'SEARCH reports USING INDEX' in plan
+        assert 'SCAN reports' not in plan
+
+    def test_comment_threads_use_indexes(self, app, test_report, test_user):
+        comment = Comment(content='Root', user_id=test_user.id, report_id=test_report.id)
+        db.session.add(comment)
+        db.session.commit()
+
+        with recorded_statements() as statements:
+            Comment.get_thread_page(test_report.id)
+        plan = explain(statements)
+        assert 'ix_comments_report_parent_created' in plan
+        assert 'ix_comments_root_path' in plan
+
+    def test_popular_tags_use_index(self, app):
+        with recorded_statements() as statements:
+            Tag.get_popular_tags()
+        assert 'ix_tags_reports_count' in explain(statements)
+
+    def test_tag_reverse_lookup_uses_index(self, app):
+        from app.models.counters import reconcile_counters
+
+        with recorded_statements() as statements:
+            reconcile_counters()
+        assert 'ix_report_tags_tag_id' in explain(statements)
+
+    def test_reply_counts_use_index(self, app):
+        from app.models.counters import reconcile_counters
+
+        with recorded_statements() as statements:
+            reconcile_counters()
+        assert 'ix_comments_parent_created' in explain(statements)
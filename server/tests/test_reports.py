@@ -146,3 +146,390 @@ class TestReportFiltering:
         assert response.status_code == 200
         assert 'pagination' in response.json
         assert response.json['pagination']['page'] == 1
+
+
+class TestReportListQueries:
+    """Test that list endpoints serialize without N+1 queries"""
+
+    def _seed_reports(self, db_session, user, count):
+        from app.models.comment import Comment
+        from app.models.tag import Tag
+
+        tag = Tag.query.filter_by(name='pollution').first() or Tag(name='pollution')
+        for i in range(count):
+            report = Report(
+                title=f'Report number {i}',
+                description='Batch serialization test report',
+                user_id=user.id
+            )
+            report.tags.append(tag)
+            db_session.add(report)
+            db_session.flush()
+            db_session.add(Comment(content='A comment', user_id=user.id, report_id=report.id))
+        db_session.commit()
+
+    def _count_list_queries(self, client, url):
+        from sqlalchemy import event
+        from app.database import db
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            response = client.get(url)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+        assert response.status_code == 200
+        return len(statements), response.json
+
+    def test_query_count_independent_of_page_size(self, client, db_session, test_user):
+        """Test serializing 3 and 30 reports issues the same number of queries"""
+        self._seed_reports(db_session, test_user, 3)
+        small_count, small = self._count_list_queries(client, '/api/reports?per_page=100')
+
+        self._seed_reports(db_session, test_user, 27)
+        large_count, large = self._count_list_queries(client, '/api/reports?per_page=100')
+
+        assert len(small['reports']) == 3
+        assert len(large['reports']) == 30
+        assert small_count == large_count
+
+    def test_batched_counts_match_live_counts(self, client, db_session, test_user):
+        """Test precomputed counts agree with per-row serialization"""
+        self._seed_reports(db_session, test_user, 2)
+
+        response = client.get('/api/reports')
+        report = response.json['reports'][0]
+
+        assert report['comments_count'] == 1
+        assert report['tags'][0]['reports_count'] == 2
+        assert report['author']['reports_count'] == 2
+        assert report['author']['comments_count'] == 2
+
+
+class TestCursorPagination:
+    """Test keyset cursor pagination on report feeds"""
+
+    def _seed_reports(self, db_session, user, count):
+        from datetime import datetime, timedelta
+
+        base = datetime(2025, 1, 1)
+        for i in range(count):
+            report = Report(
+                title=f'Cursor report {i}',
+                description='Cursor pagination test report',
+                user_id=user.id
+            )
+            report.created_at = base + timedelta(minutes=i)
+            db_session.add(report)
+        db_session.commit()
+
+    def test_walk_forward_and_back(self, client, db_session, test_user):
+        """Test following next and prev cursors visits every report once"""
+        self._seed_reports(db_session, test_user, 5)
+
+        first = client.get('/api/reports?cursor=&per_page=2').json
+        assert [r['title'] for r in first['reports']] == ['Cursor report 4', 'Cursor report 3']
+        assert first['pagination']['has_prev'] is False
+        assert 'total' not in first['pagination']
+
+        second = client.get(f"/api/reports?cursor={first['pagination']['next_cursor']}&per_page=2").json
+        assert [r['title'] for r in second['reports']] == ['Cursor report 2', 'Cursor report 1']
+
+        third = client.get(f"/api/reports?cursor={second['pagination']['next_cursor']}&per_page=2").json
+        assert [r['title'] for r in third['reports']] == ['Cursor report 0']
+        assert third['pagination']['has_next'] is False
+        assert third['pagination']['next_cursor'] is None
+
+        back = client.get(f"/api/reports?cursor={third['pagination']['prev_cursor']}&per_page=2").json
+        assert [r['title'] for r in back['reports']] == ['Cursor report 2', 'Cursor report 1']
+
+    def test_include_total(self, client, db_session, test_user):
+        """Test the total count is only computed when requested"""
+        self._seed_reports(db_session, test_user, 3)
+
+        response = client.get('/api/reports?cursor=&include_total=true')
+        assert response.json['pagination']['total'] == 3
+
+    def test_user_reports_cursor(self, client, db_session, test_user, auth_headers):
+        """Test cursor mode on my-reports and user reports"""
+        self._seed_reports(db_session, test_user, 3)
+
+        mine = client.get('/api/reports/my-reports?cursor=&per_page=2', headers=auth_headers)
+        assert len(mine.json['reports']) == 2
+        assert mine.json['pagination']['has_next'] is True
+
+        theirs = client.get(f'/api/reports/user/{test_user.id}?cursor=&per_page=5')
+        assert len(theirs.json['reports']) == 3
+
+    def test_invalid_cursor(self, client):
+        """Test a malformed cursor is rejected"""
+        response = client.get('/api/reports?cursor=not-a-cursor')
+        assert response.status_code == 400
+
+
+class TestNearbyReports:
+    """Test geohash-backed nearby search"""
+
+    def _add_report(self, db_session, user, title, latitude, longitude):
+        report = Report(
+            title=title,
+            description='Nearby search test report',
+            user_id=user.id,
+            latitude=latitude,
+            longitude=longitude
+        )
+        db_session.add(report)
+        db_session.commit()
+        return report
+
+    def test_geohash_filled_on_write(self, db_session, test_report):
+        """Test the geohash cell is derived from the coordinates"""
+        assert test_report.geohash.startswith('dr5r')
+
+        test_report.latitude = None
+        db_session.commit()
+        assert test_report.geohash is None
+
+    def test_nearby_sorted_by_distance(self, client, db_session, test_user):
+        """Test results are exact-distance filtered and nearest first"""
+        self._add_report(db_session, test_user, 'Far away report', 40.90, -74.00)
+        self._add_report(db_session, test_user, 'Closest report', 40.7130, -74.0060)
+        self._add_report(db_session, test_user, 'Middle report', 40.75, -74.00)
+
+        response = client.get('/api/reports/nearby?lat=40.7128&lng=-74.0060&radius=10')
+
+        assert response.status_code == 200
+        titles = [r['title'] for r in response.json['reports']]
+        assert titles == ['Closest report', 'Middle report']
+        distances = [r['distance_km'] for r in response.json['reports']]
+        assert distances == sorted(distances)
+        assert distances[-1] <= 10
+
+    def test_nearby_cursor(self, client, db_session, test_user):
+        """Test limit and cursor page through results in distance order"""
+        for i in range(3):
+            self._add_report(db_session, test_user, f'Nearby report {i}', 40.7128 + i * 0.01, -74.0060)
+
+        first = client.get('/api/reports/nearby?lat=40.7128&lng=-74.0060&limit=2').json
+        assert [r['title'] for r in first['reports']] == ['Nearby report 0', 'Nearby report 1']
+        assert first['pagination']['has_next'] is True
+
+        cursor = first['pagination']['next_cursor']
+        second = client.get(f'/api/reports/nearby?lat=40.7128&lng=-74.0060&limit=2&cursor={cursor}').json
+        assert [r['title'] for r in second['reports']] == ['Nearby report 2']
+        assert second['pagination']['next_cursor'] is None
+
+    def test_sql_distance_matches_haversine(self, db_session, test_user):
+        """Test distances computed in SQL agree with the Python haversine, across the antimeridian"""
+        from app.utils.geo import haversine_km
+
+        east = self._add_report(db_session, test_user, 'East of the antimeridian', -16.50, 179.95)
+        west = self._add_report(db_session, test_user, 'West of the antimeridian', -16.55, -179.97)
+
+        results, has_more = Report.get_by_location(-16.52, 179.99, radius_km=20)
+
+        assert [report.id for report, _ in results] == [east.id, west.id]
+        for report, distance in results:
+            assert distance == pytest.approx(haversine_km(-16.52, 179.99, report.latitude, report.longitude))
+        assert has_more is False
+
+    def test_nearby_requires_coordinates(self, client):
+        """Test missing coordinates are rejected"""
+        response = client.get('/api/reports/nearby?lat=40.7')
+        assert response.status_code == 400
+
+
+class TestReportTiles:
+    """Test map tile cluster aggregation"""
+
+    @pytest.fixture(autouse=True)
+    def clear_tile_cache(self):
+        from app.utils.tile_cache import tile_cache
+        tile_cache.clear()
+
+    def _add_report(self, db_session, user, severity, category, latitude=40.7128, longitude=-74.0060):
+        report = Report(
+            title='Tile test report',
+            description='Map tile aggregation test report',
+            user_id=user.id,
+            latitude=latitude,
+            longitude=longitude,
+            severity=severity
+        )
+        report.ai_category = category
+        db_session.add(report)
+        db_session.commit()
+        return report
+
+    def test_low_zoom_returns_clusters(self, client, db_session, test_user):
+        """Test low zoom tiles aggregate counts, severity and top category"""
+        self._add_report(db_session, test_user, 'high', 'pollution')
+        self._add_report(db_session, test_user, 'high', 'pollution', 40.75, -73.99)
+        self._add_report(db_session, test_user, 'low', 'water-issues', 40.80, -73.95)
+
+        response = client.get('/api/reports/tiles/0/0/0')
+
+        assert response.status_code == 200
+        tile = response.json
+        assert tile['mode'] == 'clusters'
+        assert tile['count'] == 3
+        assert tile['severity'] == {'high': 2, 'low': 1}
+        assert tile['top_category'] == 'pollution'
+        assert 'points' not in tile
+
+    def test_high_zoom_returns_points(self, client, db_session, test_user):
+        """Test individual points come back above the zoom threshold"""
+        from app.utils.geo import tile_for_point
+
+        report = self._add_report(db_session, test_user, 'medium', 'pollution')
+        x, y = tile_for_point(report.latitude, report.longitude, 15)
+
+        tile = client.get(f'/api/reports/tiles/15/{x}/{y}').json
+
+        assert tile['mode'] == 'points'
+        assert [point['id'] for point in tile['points']] == [report.id]
+
+    def test_writes_invalidate_cached_tiles(self, client, db_session, test_user):
+        """Test a new report shows up in a previously cached tile"""
+        self._add_report(db_session, test_user, 'medium', 'pollution')
+        assert client.get('/api/reports/tiles/2/1/1').json['count'] == 1
+
+        self._add_report(db_session, test_user, 'critical', 'pollution', 40.72, -74.01)
+        assert client.get('/api/reports/tiles/2/1/1').json['count'] == 2
+
+    def test_rebuild_grid_matches_incremental_rollups(self, app, client, db_session, test_user):
+        """Test the rebuild command reproduces the incrementally maintained grid"""
+        self._add_report(db_session, test_user, 'high', 'pollution')
+        self._add_report(db_session, test_user, 'low', 'wildlife', -33.86, 151.21)
+        before = client.get('/api/reports/tiles/0/0/0').json
+
+        result = app.test_cli_runner().invoke(args=['rebuild-grid'])
+
+        assert result.exit_code == 0
+        assert client.get('/api/reports/tiles/0/0/0').json == before
+
+    def test_grid_follows_updates_and_deletes(self, app, client, db_session, test_user):
+        """Test incremental rollups match a rebuild after moves, edits and deletes"""
+        from app.models.grid import ReportGridCell
+
+        moved = self._add_report(db_session, test_user, 'high', 'pollution')
+        hidden = self._add_report(db_session, test_user, 'low', 'wildlife', -33.86, 151.21)
+        deleted = self._add_report(db_session, test_user, 'medium', 'energy', 51.5, -0.12)
+        moved.latitude, moved.longitude, moved.severity = 48.85, 2.35, 'critical'
+        hidden.is_public = False
+        db_session.delete(deleted)
+        db_session.commit()
+
+        def snapshot():
+            return {cell.cell: (cell.reports_count, round(cell.latitude_sum, 6), cell.severity_counts,
+                                cell.category_counts) for cell in ReportGridCell.query}
+
+        incremental = snapshot()
+        assert app.test_cli_runner().invoke(args=['rebuild-grid']).exit_code == 0
+        assert snapshot() == incremental
+        assert {cell.reports_count for cell in ReportGridCell.query} == {1}
+        assert ReportGridCell.query.filter_by(cell='u').one().severity_counts == {'critical': 1}
+
+    def test_cell_deltas_add_up(self, db_session):
+        """Test deltas are added to stored cells, not written over them"""
+        from collections import Counter
+        from app.models.grid import ReportGridCell, apply_cell_deltas
+
+        def delta(count, severity):
+            return {'dr': {'reports_count': count, 'latitude_sum': 40.0 * count, 'longitude_sum': -74.0 * count,
+                           'severity_counts': Counter({severity: count}), 'category_counts': Counter()}}
+
+        connection = db_session.connection()
+        apply_cell_deltas(connection, delta(1, 'high'))
+        apply_cell_deltas(connection, delta(2, 'low'))
+        apply_cell_deltas(connection, delta(-1, 'high'))
+        cell = db_session.get(ReportGridCell, 'dr')
+        assert (cell.reports_count, cell.severity_counts) == (2, {'low': 2})
+
+        apply_cell_deltas(connection, delta(-2, 'low'))
+        db_session.expire_all()
+        assert db_session.get(ReportGridCell, 'dr') is None
+
+    def test_cell_deltas_compile_for_postgresql(self):
+        """Test the JSON count increments render for PostgreSQL"""
+        from sqlalchemy.dialects import postgresql
+        from app.models.grid import ReportGridCell, _increment_counts
+
+        expression = _increment_counts(ReportGridCell.__table__.c.severity_counts, {'high': 1}, 'postgresql')
+        sql = str(expression.compile(dialect=postgresql.dialect()))
+        assert 'jsonb_strip_nulls' in sql and 'CAST(report_grid_cells.severity_counts AS JSONB)' in sql
+
+    def test_invalid_tile(self, client):
+        """Test out of range tile coordinates are rejected"""
+        response = client.get('/api/reports/tiles/2/4/0')
+        assert response.status_code == 400
+
+
+class TestReportSearch:
+    """Test full-text report search"""
+
+    def _add_report(self, db_session, user, title, description, is_public=True):
+        report = Report(title=title, description=description, user_id=user.id, is_public=is_public)
+        db_session.add(report)
+        db_session.commit()
+        return report
+
+    def test_search_ranks_and_highlights(self, client, db_session, test_user):
+        """Test title matches rank first and snippets mark matched terms"""
+        self._add_report(db_session, test_user, 'Broken fence in the park', 'Plastic bottles piled near the river')
+        self._add_report(db_session, test_user, 'Plastic waste on the beach', 'Bags and wrappers along the shore')
+        self._add_report(db_session, test_user, 'Noisy generator', 'Runs all night next to the school')
+
+        response = client.get('/api/reports/search?q=plastic')
+
+        assert response.status_code == 200
+        results = response.json['reports']
+        assert [r['title'] for r in results] == ['Plastic waste on the beach', 'Broken fence in the park']
+        assert results[0]['highlights']['title'].startswith('<mark>Plastic</mark>')
+        assert '<mark>Plastic</mark>' in results[1]['highlights']['description']
+        assert results[0]['score'] >= results[1]['score']
+
+    def test_search_follows_updates_and_deletes(self, client, db_session, test_user):
+        """Test the index stays in sync with report writes"""
+        report = self._add_report(db_session, test_user, 'Oil spill', 'Slick in the harbour')
+
+        report.title = 'Chemical leak'
+        db_session.commit()
+        assert client.get('/api/reports/search?q=oil').json['reports'] == []
+        assert len(client.get('/api/reports/search?q=chemical').json['reports']) == 1
+
+        db_session.delete(report)
+        db_session.commit()
+        assert client.get('/api/reports/search?q=chemical').json['reports'] == []
+
+    def test_search_excludes_private_reports_and_escapes_html(self, client, db_session, test_user):
+        """Test private reports are hidden and snippet text is escaped"""
+        self._add_report(db_session, test_user, 'Hidden smog', 'Private report', is_public=False)
+        self._add_report(db_session, test_user, 'Smog <script>', 'Thick smog downtown')
+
+        results = client.get('/api/reports/search?q=smog').json['reports']
+
+        assert len(results) == 1
+        assert '&lt;script&gt;' in results[0]['highlights']['title']
+
+    def test_search_prefix_and_pagination(self, client, db_session, test_user):
+        """Test the last term matches as a prefix and pages are bounded"""
+        for i in range(3):
+            self._add_report(db_session, test_user, f'Deforestation site {i}', 'Trees cut down')
+
+        response = client.get('/api/reports/search?q=defor&per_page=2')
+        assert len(response.json['reports']) == 2
+        assert response.json['pagination']['has_next'] is True
+
+        response = client.get('/api/reports/search?q=defor&per_page=2&page=2')
+        assert len(response.json['reports']) == 1
+        assert response.json['pagination']['has_next'] is False
+
+    def test_search_requires_query(self, client):
+        """Test search without terms is rejected"""
+        assert client.get('/api/reports/search').status_code == 400
@@ -0,0 +1,114 @@
+import json
+import pytest
+from unittest.mock import patch
+
+
+class TestGreenTaskPool:
+    """Test pre-generated task pools and their background refill"""
+
+    def _tasks(self, titles):
+        """A task batch reply with one task per title"""
+        return json.dumps({'tasks': [{'title': title, 'description': f'Do: {title}', 'impact': 'Less waste'}
+                                     for title in titles]})
+
+    def test_refill_dedupes_near_identical_titles(self, app, llm, llm_reply):
+        """Test a refill stops at the pool size and skips repeated titles"""
+        from app.models.green_task import GreenTask
+        from app.services.task_pool import task_pool
+
+        llm_reply(llm, self._tasks(['Start a Compost Bin', 'Start compost bins', 'Fix a Leaky Tap', 'Repair Bikes',
+                                    'Swap Clothes']),
+                  self._tasks(['Fix leaky taps', 'Plant Herbs', 'Cycle to Work', 'Carpool Once']))
+        with patch.multiple(task_pool, size=6, low_water=2):
+            added = task_pool.refill(llm, pools=[('waste', 'easy')])
+
+        assert added == {('waste', 'easy'): 6}
+        titles = {task.title for task in GreenTask.query.filter_by(category='waste', difficulty='easy')}
+        assert titles == {'Start a Compost Bin', 'Fix a Leaky Tap', 'Repair Bikes', 'Swap Clothes',
+                          'Plant Herbs', 'Cycle to Work'}
+        # Pools at or above the low-water mark are left alone
+        with patch.multiple(task_pool, size=6, low_water=2):
+            assert task_pool.refill(llm, pools=[('waste', 'easy')]) == {}
+        assert llm.client.chat.completions.create.call_count == 2
+
+    def test_requests_rotate_through_pool(self, client, app, llm, llm_reply):
+        """Test task requests are answered from the pool, least recently served first"""
+        from app.services.task_pool import task_pool
+
+        llm_reply(llm, self._tasks(['Start a Compost Bin', 'Repair Bikes']))
+        with patch.multiple(task_pool, size=2, low_water=1):
+            task_pool.refill(llm, pools=[('waste', 'easy')])
+
+        with patch('app.services.ai_service.ai_gateway.complete') as live:
+            served = [client.get('/api/ai/generate-task?category=Waste&difficulty=easy').json['task']['title']
+                      for _ in range(3)]
+            assert client.get('/api/ai/generate-task?category=waste').json['task']['title'] == served[1]
+        live.assert_not_called()
+        assert served[0] != served[1] and served[2] == served[0]
+
+        events = client.get('/api/ai/generate-task/stream?category=waste&difficulty=easy').get_data(as_text=True)
+        assert '"source": "pool"' in events
+
+    def test_worn_out_tasks_replaced(self, app, llm, llm_reply, db_session):
+        """Test tasks served often enough stop counting as fresh and are retired by a refill"""
+        from app.models.green_task import GreenTask
+        from app.services.task_pool import task_pool
+
+        llm_reply(llm, self._tasks(['Start a Compost Bin', 'Repair Bikes']), self._tasks(['Plant Herbs', 'Swap Clothes']))
+        with patch.multiple(task_pool, size=2, low_water=1, max_serves=2):
+            task_pool.refill(llm, pools=[('waste', 'easy')])
+            for _ in range(4):
+                task_pool.serve('waste', 'easy')
+            assert task_pool.levels()[('waste', 'easy')] == 0
+
+            task_pool.refill(llm, pools=[('waste', 'easy')])
+        assert {task.title for task in GreenTask.query.all()} == {'Plant Herbs', 'Swap Clothes'}
+
+    def test_concurrent_duplicate_skipped(self, app, llm, llm_reply):
+        """Test a title another refill inserted meanwhile is skipped without losing the batch"""
+        from app.database import db
+        from app.models.green_task import GreenTask
+        from app.services.task_pool import task_pool, title_key
+
+        llm_reply(llm, self._tasks(['Start a Compost Bin', 'Repair Bikes', 'Plant Herbs']))
+        titles = GreenTask.titles
+
+        def titles_then_concurrent_insert(category, difficulty):
+            rows = titles(category, difficulty)
+            # Committed by another refill after this one read the pool
+            with db.engine.begin() as connection:
+                connection.execute(GreenTask.__table__.insert().values(
+                    category=category, difficulty=difficulty, title='Repair bikes', title_key=title_key('Repair bikes'),
+                    task={'title': 'Repair bikes'}, served_count=0))
+            return rows
+
+        with patch.multiple(task_pool, size=3, low_water=1), \
+                patch.object(GreenTask, 'titles', side_effect=titles_then_concurrent_insert):
+            added = task_pool.refill(llm, pools=[('waste', 'easy')])
+
+        assert added == {('waste', 'easy'): 2}
+        assert GreenTask.query.filter_by(category='waste', difficulty='easy').count() == 3
+
+    def test_serve_leaves_caller_session_alone(self, app, llm, llm_reply, db_session, test_user):
+        """Test serving a task neither commits nor rolls back the caller's pending changes"""
+        from app.services.task_pool import task_pool
+
+        llm_reply(llm, self._tasks(['Start a Compost Bin']))
+        with patch.multiple(task_pool, size=1, low_water=1):
+            task_pool.refill(llm, pools=[('waste', 'easy')])
+
+        test_user.bio = 'Pending change'
+        assert task_pool.serve('waste', 'easy')['title'] == 'Start a Compost Bin'
+        assert test_user in db_session.dirty
+
+        db_session.rollback()
+        assert db_session.get(type(test_user), test_user.id).bio != 'Pending change'
+
+    def test_worker_schedules_refill(self, app):
+        """Test the AI worker refills pools in the background while polling"""
+        from app.services.ai_worker import AIWorker
+
+        worker = AIWorker(app, concurrency=2, poll_interval=0.01)
+        with patch('app.services.ai_worker.task_pool.refill', side_effect=lambda service: worker.stop()) as refill:
+            worker.run()
+        refill.assert_called_once()
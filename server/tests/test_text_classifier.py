@@ -0,0 +1,93 @@
+import pytest
+
+
+class TestLocalClassifier:
+    """Test the trained offline fallback classifier"""
+
+    TRAINING = [
+        ('Thick smog over the city', 'Drivers idling engines all morning', 'air-quality'),
+        ('Smoke from factory chimney', 'Black smoke drifting over homes', 'air-quality'),
+        ('Bad air near the highway', 'Exhaust fumes every rush hour', 'air-quality'),
+        ('Plastic bags in the park', 'Litter and bottles left after the weekend', 'waste-management'),
+        ('Illegal dumping behind shops', 'Bags of rubbish and old mattresses', 'waste-management'),
+        ('Overflowing bins on main street', 'Rubbish spilling onto the pavement', 'waste-management'),
+    ]
+
+    @pytest.fixture
+    def trained(self, app, db_session, test_user, tmp_path):
+        from app.models.report import Report
+        from app.services.text_classifier import local_classifier
+
+        for title, description, category in self.TRAINING:
+            report = Report(title=title, description=description, user_id=test_user.id)
+            report.mark_ai_processed(category=category, confidence=0.9, model='llama-3.1-70b-versatile')
+            db_session.add(report)
+        # Categorized by a fallback, so never learned from
+        fallback = Report(title='Smog and rubbish', description='Fumes over the bins', user_id=test_user.id)
+        fallback.mark_ai_processed(category='energy', confidence=0.9)
+        db_session.add(fallback)
+        db_session.commit()
+
+        path = tmp_path / 'classifier.json.gz'
+        result = app.test_cli_runner().invoke(args=['train-classifier', '--output', str(path)])
+        assert result.exit_code == 0, result.output
+        assert f'Trained on {len(self.TRAINING)} reports across 2 categories' in result.output
+
+        default_path = app.config['AI_LOCAL_MODEL_PATH']
+        app.config['AI_LOCAL_MODEL_PATH'] = str(path)
+        local_classifier.init_app(app)
+        yield local_classifier
+        app.config['AI_LOCAL_MODEL_PATH'] = default_path
+        local_classifier.init_app(app)
+
+    def test_trained_model_used_when_llm_unavailable(self, trained):
+        """Test the local model replaces keyword matching without a client"""
+        from app.services.ai_service import AIService
+
+        service = AIService()
+        service.client = None
+
+        result = service.classify_environmental_issue('Rubbish everywhere', 'Mattresses and bottles by the road')
+        assert (result['category'], result['source']) == ('waste-management', 'local')
+        assert result['confidence'] <= 0.95
+
+    def test_llm_failure_uses_local_model(self, trained, llm):
+        """Test an LLM error falls back to the local model"""
+        llm.client.chat.completions.create.side_effect = RuntimeError('timeout')
+
+        result = llm.classify_environmental_issue('Exhaust fumes', 'Idling engines near the school')
+        assert (result['category'], result['source']) == ('air-quality', 'local')
+
+    def test_confident_local_prediction_skips_llm(self, trained, llm):
+        """Test the LLM call is skipped for confident local predictions when enabled"""
+        trained.skip_llm_confidence = 0.5
+
+        result = llm.classify_environmental_issue('Smog and smoke', 'Fumes over the highway')
+        assert result['source'] == 'local'
+        llm.client.chat.completions.create.assert_not_called()
+
+    def test_unknown_text_uses_keywords(self, trained):
+        """Test texts sharing no features with the model fall back to keywords"""
+        from app.services.ai_service import AIService
+
+        service = AIService()
+        service.client = None
+
+        assert service.classify_environmental_issue('', 'Zzz qqq')['source'] == 'keyword'
+
+    def test_model_round_trip(self, tmp_path):
+        """Test a saved model predicts identically after loading"""
+        from app.services.text_classifier import TextClassifier
+
+        texts = [f'{title}. {description}' for title, description, _ in self.TRAINING]
+        model = TextClassifier.train(texts, [category for _, _, category in self.TRAINING], n_features=2 ** 12)
+        model.save(str(tmp_path / 'model.json.gz'))
+        loaded = TextClassifier.load(str(tmp_path / 'model.json.gz'))
+
+        assert [loaded.predict(text) for text in texts] == [model.predict(text) for text in texts]
+
+    def test_training_needs_two_categories(self, app, db_session):
+        """Test the command refuses to train on too little data"""
+        result = app.test_cli_runner().invoke(args=['train-classifier', '--output', '/tmp/unused.json.gz'])
+        assert result.exit_code != 0
+        assert 'at least two categories' in result.output
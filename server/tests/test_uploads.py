@@ -0,0 +1,390 @@
+import pytest
+from app.database import db
+from app.models.report import Report
+
+
+@pytest.fixture
+def upload(app, tmp_path):
+    """Write an uploaded file into a temporary upload folder"""
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    (tmp_path / 'photo.png').write_bytes(b'0123456789' * 100)
+    return 'photo.png'
+
+
+class TestUploadDelivery:
+    """Test static delivery of uploaded files"""
+
+    def test_immutable_cache_headers(self, client, upload):
+        """Test uploads are served with long-lived immutable caching"""
+        response = client.get(f'/uploads/{upload}')
+
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+        assert response.headers['Accept-Ranges'] == 'bytes'
+        assert len(response.data) == 1000
+
+    def test_byte_range(self, client, upload):
+        """Test a Range request returns only the requested bytes"""
+        response = client.get(f'/uploads/{upload}', headers={'Range': 'bytes=10-19'})
+
+        assert response.status_code == 206
+        assert response.data == b'0123456789'
+        assert response.headers['Content-Range'] == 'bytes 10-19/1000'
+
+    def test_accel_redirect(self, app, client, upload):
+        """Test delivery can be handed to the front proxy"""
+        app.config['UPLOADS_ACCEL_REDIRECT'] = '/protected-uploads/'
+
+        response = client.get(f'/uploads/{upload}')
+
+        assert response.headers['X-Accel-Redirect'] == '/protected-uploads/photo.png'
+        assert response.headers['Content-Type'] == 'image/png'
+        assert response.data == b''
+
+    def test_missing_and_traversal(self, app, client, upload):
+        """Test missing files and paths outside the folder are not found"""
+        assert client.get('/uploads/missing.png').status_code == 404
+
+        app.config['UPLOADS_ACCEL_REDIRECT'] = '/protected-uploads/'
+        assert client.get('/uploads/missing.png').status_code == 404
+        assert client.get('/uploads/../app/config.py').status_code == 404
+
+
+class TestImagePipeline:
+    """Test derivative rendering and WebP negotiation"""
+
+    @pytest.fixture
+    def photo(self, app, tmp_path, db_session, test_user):
+        Image = pytest.importorskip('PIL.Image')
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        app.config['IMAGE_VARIANT_WIDTHS'] = (320, 640)
+
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera maker'
+        Image.new('RGB', (800, 600), 'green').save(tmp_path / 'photo.jpg', 'JPEG', exif=exif)
+
+        report = Report(title='Photo report', description='Report with a photo',
+                        user_id=test_user.id, image_url='/uploads/photo.jpg')
+        db_session.add(report)
+        db_session.commit()
+        return report
+
+    def test_variants_recorded(self, app, tmp_path, photo):
+        """Test resized and WebP copies are written and recorded on the report"""
+        from PIL import Image
+        from app.services.image_service import image_pipeline
+
+        image_pipeline.submit('photo.jpg')
+
+        variants = db.session.get(Report, photo.id).image_variants
+        assert (variants['width'], variants['height']) == (800, 600)
+        assert [size['width'] for size in variants['sizes']] == [320, 640, 800]
+        assert variants['sizes'][0] == {
+            'width': 320, 'height': 240,
+            'url': '/uploads/photo-320.jpg', 'webp_url': '/uploads/photo-320.webp'
+        }
+        assert variants['sizes'][-1]['url'] == '/uploads/photo-800.jpg'
+        with Image.open(tmp_path / 'photo-800.jpg') as stripped:
+            assert not stripped.getexif()
+        assert (tmp_path / 'photo-800.webp').exists()
+
+    def test_original_left_unchanged(self, tmp_path, photo):
+        """Test processing never rewrites the bytes behind the original's immutable URL"""
+        from app.services.image_service import image_pipeline
+
+        original = (tmp_path / 'photo.jpg').read_bytes()
+        image_pipeline.submit('photo.jpg')
+
+        assert (tmp_path / 'photo.jpg').read_bytes() == original
+        assert not (tmp_path / 'photo.webp').exists()
+
+    def test_webp_negotiation(self, client, photo):
+        """Test clients that accept WebP get it and responses vary on Accept"""
+        from app.services.image_service import image_pipeline
+
+        image_pipeline.submit('photo.jpg')
+
+        webp = client.get('/uploads/photo-320.jpg', headers={'Accept': 'image/webp,image/*,*/*;q=0.8'})
+        assert webp.headers['Content-Type'] == 'image/webp'
+        assert 'Accept' in webp.headers['Vary']
+
+        jpeg = client.get('/uploads/photo-320.jpg', headers={'Accept': '*/*'})
+        assert jpeg.headers['Content-Type'] == 'image/jpeg'
+
+    def test_vary_before_processing(self, client, photo):
+        """Test images vary on Accept before any WebP sibling exists"""
+        response = client.get('/uploads/photo.jpg', headers={'Accept': 'image/webp'})
+
+        assert response.headers['Content-Type'] == 'image/jpeg'
+        assert 'Accept' in response.headers['Vary']
+
+    def test_changed_image_not_overwritten(self, db_session, photo):
+        """Test variants for a replaced image are discarded"""
+        photo.image_url = '/uploads/other.jpg'
+        db_session.commit()
+
+        assert Report.record_image_variants('/uploads/photo.jpg', {'sizes': []}) == 0
+        assert db.session.get(Report, photo.id).image_variants is None
+
+
+PNG_BYTES = b'\x89PNG\r\n\x1a\n' + b'\x00' * 200
+
+
+class TestUploadIngest:
+    """Test streaming upload ingest through report creation"""
+
+    @pytest.fixture
+    def folder(self, app, tmp_path):
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        return tmp_path
+
+    def _post(self, client, auth_headers, content, filename='photo.png'):
+        import io
+        return client.post('/api/reports', data={
+            'title': 'Upload test report',
+            'description': 'Report created with an image upload',
+            'image': (io.BytesIO(content), filename)
+        }, headers=auth_headers, content_type='multipart/form-data')
+
+    def _incoming(self, folder):
+        incoming = folder.parent / f'{folder.name}.incoming'
+        return list(incoming.iterdir()) if incoming.exists() else []
+
+    def test_upload_stored_by_detected_type(self, client, auth_headers, folder):
+        """Test an upload is moved into place under its detected extension"""
+        response = self._post(client, auth_headers, PNG_BYTES, filename='photo.jpg')
+
+        assert response.status_code == 201
+        image_url = response.json['report']['image_url']
+        assert image_url.endswith('.png')
+        assert (folder / image_url[len('/uploads/'):]).read_bytes() == PNG_BYTES
+        assert self._incoming(folder) == []
+
+    def test_rejects_content_that_is_not_an_image(self, client, auth_headers, folder):
+        """Test magic bytes are checked regardless of the file name"""
+        response = self._post(client, auth_headers, b'<?php echo 1; ?>', filename='shell.jpg')
+
+        assert response.status_code == 400
+        assert self._incoming(folder) == []
+
+    def test_rejects_oversized_stream(self, app, client, auth_headers, folder, monkeypatch):
+        """Test the running byte count stops an oversized file"""
+        monkeypatch.setitem(app.config, 'MAX_FILE_SIZE', 1024)
+
+        response = self._post(client, auth_headers, PNG_BYTES + b'\x00' * 2048)
+
+        assert response.status_code == 413
+        assert self._incoming(folder) == []
+
+    def test_rejects_oversized_content_length(self, app, client, auth_headers, folder, monkeypatch):
+        """Test requests over the declared limit are refused before parsing"""
+        monkeypatch.setitem(app.config, 'MAX_CONTENT_LENGTH', 1024)
+
+        response = self._post(client, auth_headers, PNG_BYTES + b'\x00' * 2048)
+
+        assert response.status_code == 413
+        assert self._incoming(folder) == []
+
+    def test_partial_uploads_kept_outside_served_folder(self, app, folder):
+        """Test upload temp files are never written under UPLOAD_FOLDER"""
+        from app.utils.file_upload import HashingFileStream, incoming_folder
+
+        with app.app_context():
+            stream = HashingFileStream(incoming_folder(str(folder)))
+        try:
+            assert not stream.path.startswith(str(folder) + '/')
+        finally:
+            stream.close()
+        assert list(folder.iterdir()) == []
+
+    def test_hash_computed_while_streaming(self, folder):
+        """Test files copied outside a request are hashed in chunks"""
+        import hashlib
+        import io
+        from werkzeug.datastructures import FileStorage
+        from app.utils.file_upload import save_uploaded_file
+
+        content = PNG_BYTES * 1000
+        result, _ = save_uploaded_file(FileStorage(io.BytesIO(content), 'photo.png'), str(folder))
+
+        assert result['sha256'] == hashlib.sha256(content).hexdigest()
+        assert result['size'] == len(content)
+
+    def test_metadata_stripped_before_storing(self, client, auth_headers, folder):
+        """Test the stored original keeps its pixels and orientation but loses GPS and camera details"""
+        import hashlib
+        import io
+        Image = pytest.importorskip('PIL.Image')
+
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera maker'
+        exif[0x0112] = 6
+        exif[0x8825] = {1: 'N', 2: (40.0, 42.0, 51.0), 3: 'W', 4: (74.0, 0.0, 21.0)}
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 48), 'green').save(buffer, 'JPEG', exif=exif, comment=b'Home address')
+        content = buffer.getvalue()
+
+        response = self._post(client, auth_headers, content, filename='photo.jpg')
+
+        assert response.status_code == 201
+        stored = (folder / response.json['report']['image_url'][len('/uploads/'):]).read_bytes()
+        assert b'Camera maker' not in stored and b'Home address' not in stored
+        assert hashlib.sha256(stored).hexdigest() in response.json['report']['image_url']
+        with Image.open(io.BytesIO(stored)) as image, Image.open(io.BytesIO(content)) as original:
+            assert dict(image.getexif()) == {0x0112: 6}
+            assert image.tobytes() == original.tobytes()
+
+    def test_png_text_chunks_stripped(self, folder):
+        """Test PNG text chunks are dropped while image chunks are kept byte for byte"""
+        import io
+        from werkzeug.datastructures import FileStorage
+        from app.utils.file_upload import save_uploaded_file
+        PngImagePlugin = pytest.importorskip('PIL.PngImagePlugin')
+        from PIL import Image
+
+        info = PngImagePlugin.PngInfo()
+        info.add_text('Location', '40.7128,-74.0060')
+        buffer = io.BytesIO()
+        Image.new('RGB', (32, 32), 'blue').save(buffer, 'PNG', pnginfo=info)
+        content = buffer.getvalue()
+
+        result, _ = save_uploaded_file(FileStorage(io.BytesIO(content), 'photo.png'), str(folder))
+
+        stored = (folder / result['filename']).read_bytes()
+        assert b'40.7128' not in stored
+        assert result['size'] == len(stored) < len(content)
+        with Image.open(io.BytesIO(stored)) as image:
+            assert image.getpixel((0, 0)) == (0, 0, 255)
+
+
+class TestStoredFiles:
+    """Test content-addressed upload deduplication"""
+
+    @pytest.fixture
+    def folder(self, app, tmp_path):
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        return tmp_path
+
+    def _post(self, client, auth_headers, content=PNG_BYTES):
+        import io
+        return client.post('/api/reports', data={
+            'title': 'Upload test report',
+            'description': 'Report created with an image upload',
+            'image': (io.BytesIO(content), 'photo.png')
+        }, headers=auth_headers, content_type='multipart/form-data')
+
+    def test_duplicate_upload_shares_file(self, client, auth_headers, folder):
+        """Test identical uploads are stored once under a sharded content path"""
+        import hashlib
+        from app.models.stored_file import StoredFile
+
+        first = self._post(client, auth_headers).json['report']
+        second = self._post(client, auth_headers).json['report']
+
+        sha256 = hashlib.sha256(PNG_BYTES).hexdigest()
+        assert first['image_url'] == second['image_url'] == f'/uploads/{sha256[:2]}/{sha256[2:4]}/{sha256}.png'
+        assert len([path for path in folder.rglob('*.png')]) == 1
+        assert db.session.get(StoredFile, sha256).ref_count == 2
+
+    def test_reference_count_follows_reports(self, client, auth_headers, folder, db_session):
+        """Test deleting or re-pointing reports releases their file"""
+        import hashlib
+        from app.models.stored_file import StoredFile
+
+        report_ids = [self._post(client, auth_headers).json['report']['id'] for _ in range(2)]
+        sha256 = hashlib.sha256(PNG_BYTES).hexdigest()
+
+        db_session.delete(db_session.get(Report, report_ids[0]))
+        db_session.commit()
+        assert db.session.get(StoredFile, sha256).ref_count == 1
+
+        db_session.get(Report, report_ids[1]).image_url = None
+        db_session.commit()
+        assert db.session.get(StoredFile, sha256).ref_count == 0
+
+    def test_prune_removes_unreferenced_files(self, client, auth_headers, folder, db_session):
+        """Test pruning deletes only unreferenced files past the grace period"""
+        from datetime import timedelta
+        from app.models.stored_file import StoredFile, prune_stored_files
+
+        kept = self._post(client, auth_headers).json['report']
+        released = self._post(client, auth_headers, PNG_BYTES + b'\x01').json['report']
+        db_session.delete(db_session.get(Report, released['id']))
+        db_session.commit()
+
+        assert prune_stored_files(str(folder)) == 0
+        assert prune_stored_files(str(folder), grace=timedelta(0)) == 1
+        assert (folder / kept['image_url'][len('/uploads/'):]).exists()
+        assert not (folder / released['image_url'][len('/uploads/'):]).exists()
+        assert StoredFile.query.count() == 1
+
+    def test_register_reports_new_rows(self, db_session):
+        """Test registering content reports whether its row was created"""
+        from app.models.stored_file import StoredFile
+
+        assert StoredFile.register('a' * 64, 'aa/aa/x.png', 10)[1] is True
+        assert StoredFile.register('a' * 64, 'aa/aa/x.png', 10)[1] is False
+
+    def test_processing_retried_until_variants_recorded(self, client, auth_headers, folder, monkeypatch):
+        """Test every upload of content without variants is queued for processing"""
+        from app.services.image_service import image_pipeline
+
+        submitted = []
+        monkeypatch.setattr(image_pipeline, 'submit', submitted.append)
+
+        self._post(client, auth_headers)
+        self._post(client, auth_headers)
+
+        assert len(submitted) == 2
+
+    def test_rolled_back_upload_recovered(self, client, auth_headers, folder, monkeypatch):
+        """Test content left on disk by a failed report is registered and processed on re-upload"""
+        import hashlib
+        from app.models.stored_file import StoredFile
+        from app.services.image_service import image_pipeline
+
+        submitted = []
+        monkeypatch.setattr(image_pipeline, 'submit', submitted.append)
+
+        save = Report.save
+
+        def fail(report):
+            raise RuntimeError('database unavailable')
+        monkeypatch.setattr(Report, 'save', fail)
+        assert self._post(client, auth_headers).status_code == 500
+        monkeypatch.setattr(Report, 'save', save)
+
+        sha256 = hashlib.sha256(PNG_BYTES).hexdigest()
+        assert db.session.get(StoredFile, sha256) is None
+        assert len(list(folder.rglob('*.png'))) == 1
+
+        assert self._post(client, auth_headers).status_code == 201
+        assert db.session.get(StoredFile, sha256).ref_count == 1
+        assert len(submitted) == 1
+
+    def test_prune_removes_files_without_rows(self, folder, db_session):
+        """Test content on disk with no stored file row is pruned after the grace period"""
+        import os
+        import time
+        from datetime import timedelta
+        from app.models.stored_file import StoredFile, prune_stored_files
+
+        orphan = folder / 'bb' / 'bb' / f"{'b' * 64}.png"
+        orphan.parent.mkdir(parents=True)
+        orphan.write_bytes(PNG_BYTES)
+        (orphan.parent / f"{'b' * 64}-320.png").write_bytes(PNG_BYTES)
+        kept = folder / 'cc' / 'cc' / f"{'c' * 64}.png"
+        kept.parent.mkdir(parents=True)
+        kept.write_bytes(PNG_BYTES)
+        StoredFile.register('c' * 64, 'cc/cc/' + kept.name, len(PNG_BYTES))
+        StoredFile.query.filter_by(sha256='c' * 64).update({'ref_count': 1})
+        db_session.commit()
+
+        assert prune_stored_files(str(folder)) == 0
+        past = time.time() - 3600
+        for path in (orphan, orphan.parent / f"{'b' * 64}-320.png", kept):
+            os.utime(path, (past, past))
+
+        assert prune_stored_files(str(folder), grace=timedelta(minutes=30)) == 1
+        assert list(orphan.parent.iterdir()) == []
+        assert kept.exists()
@@ -0,0 +1,23 @@
+import os
+import sys
+import signal
+import logging
+from dotenv import load_dotenv
+
+load_dotenv()
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.services.ai_worker import AIWorker
+
+# Standalone AI job worker, deployed next to the gunicorn web processes
+app = create_app()
+
+if __name__ == "__main__":
+    worker = AIWorker(app, concurrency=int(os.environ.get("AI_WORKER_CONCURRENCY", 0)) or None)
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda signum, frame: worker.stop())
+
+    logging.getLogger(__name__).info(f"AI worker {worker.worker_id} started with {worker.concurrency} slots")
+    worker.run()